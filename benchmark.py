@@ -0,0 +1,334 @@
+# Copyright (C) 2019 - UMons
+# 
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+# 
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+# 
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+import argparse
+import json
+import os
+import tempfile
+import time
+import numpy as np
+
+from pathfinding.core.diagonal_movement import DiagonalMovement
+from pathfinding.core.grid import Grid
+from pathfinding.finder.a_star import AStarFinder
+
+from simulation.board import Board
+from simulation.logic.astar import AStar
+from simulation.logic.gatherer import Gatherer
+from simulation.logic.hpa_star import HPAStar
+from simulation.logic.sensing_scouter import SensingScouter
+
+DEFAULT_BOARD = "data/output-examples/example-detect.board"
+EXAMPLE_BOARDS = ["data/output-examples/example-detect.board",
+                  "data/output-examples/simulation/10_loops/10_loops.board",
+                  "data/output-examples/simulation/100_loops/100_loops.board"]
+
+
+def timed(function, repeat):
+    """
+    :param function: a function without parameters to time
+    :param repeat: number of calls to do
+    :return: the mean time in seconds of one call
+    """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat
+
+
+def loop_manage_blob(board, value, min_food_value=Board.MIN_BLOB):
+    """
+    Reference square by square evaporation, as done before the vectorized Board.manage_blob
+    (with the update_blob arithmetic of that time, without the running totals and versions kept since)
+    """
+    for x in range(board.width):
+        for y in range(board.height):
+            if board.touched[x, y]:
+                if not (board.foods[x, y] > 0 and board.dropped_blob[x, y] <= min_food_value):
+                    board.dropped_blob[x, y] = max(Board.MIN_BLOB, min(board.dropped_blob[x, y] - value,
+                                                                       Board.MAX_BLOB))
+
+
+def bench_manage_blob(args):
+    """
+    Compare the square by square evaporation with the vectorized one on the same board
+    """
+    reference = Board(0, 0)
+    reference.load(args.input)
+    vectorized = Board(0, 0)
+    vectorized.load(args.input)
+
+    print("Board: {} ({}x{}, {} touched squares)".format(args.input, reference.width, reference.height,
+                                                        np.sum(reference.touched)))
+
+    loop_time = timed(lambda: loop_manage_blob(reference, args.decrease, args.remaining), args.repeat)
+    numpy_time = timed(lambda: vectorized.manage_blob(args.decrease, args.remaining), args.repeat)
+
+    same = np.array_equal(reference.dropped_blob, vectorized.dropped_blob) \
+        and np.array_equal(reference.touched, vectorized.touched)
+
+    print("Loop manage_blob      : {:.6f}s per call".format(loop_time))
+    print("Vectorized manage_blob: {:.6f}s per call".format(numpy_time))
+    print("Speedup: x{:.1f} - Same results after {} calls: {}".format(loop_time / numpy_time, args.repeat, same))
+
+
+def bench_board_io(args):
+    """
+    Compare saving and loading a board with the text format and with the binary format
+    """
+    board = Board(0, 0)
+    board.load(args.input)
+    print("Board: {} ({}x{})".format(args.input, board.width, board.height))
+
+    with tempfile.TemporaryDirectory() as directory:
+        text_file = os.path.join(directory, "bench.board")
+        binary_file = os.path.join(directory, "bench.bin.board")
+
+        def save_text():
+            with open(text_file, 'w') as file:
+                file.write(board.save())
+
+        def load(filename, lazy=True):
+            loaded = Board(0, 0)
+            loaded.load(filename, lazy)
+            return loaded
+
+        timings = [("Text save", timed(save_text, args.repeat)),
+                   ("Binary save", timed(lambda: board.save_binary(binary_file), args.repeat)),
+                   ("Text load", timed(lambda: load(text_file), args.repeat)),
+                   ("Binary load (read)", timed(lambda: load(binary_file, False), args.repeat)),
+                   ("Binary load (mapped)", timed(lambda: load(binary_file), args.repeat))]
+
+        loaded = load(binary_file)
+        same = np.array_equal(board.touched, loaded.touched) and np.array_equal(board.foods, loaded.foods) \
+            and np.array_equal(board.dropped_blob, loaded.dropped_blob)
+
+        for label, timing in timings:
+            print("{:<21}: {:.6f}s per call".format(label, timing))
+        print("File sizes: text {} bytes, binary {} bytes".format(os.path.getsize(text_file),
+                                                                  os.path.getsize(binary_file)))
+        print("Same board after binary round trip: {}".format(same))
+
+
+def path_cost(matrix, path):
+    """
+    :param matrix: a pathfinding matrix, indexed by [y, x]
+    :param path: a list of x,y tuple coordinates
+    :return: the cost of the path, with pathfinding library cost model
+    """
+    cost = 0
+    for (x0, y0), (x1, y1) in zip(path[:-1], path[1:]):
+        cost += (1 if x0 == x1 or y0 == y1 else AStar.SQRT2) * int(matrix[y1, x1])
+    return cost
+
+
+def library_find_path(matrix, start, end, use_diagonal):
+    """
+    Path search as done before AStar, with pathfinding library
+    """
+    grid = Grid(matrix=matrix)
+    diagonal_movement = DiagonalMovement.always if use_diagonal else DiagonalMovement.never
+    path, runs = AStarFinder(diagonal_movement=diagonal_movement).find_path(grid.node(*start), grid.node(*end), grid)
+    return path
+
+
+def bench_astar(args):
+    """
+    Compare pathfinding library with AStar on full board searches between random touched squares
+    """
+    random_state = np.random.RandomState(args.seed)
+    for filename in args.input:
+        board = Board(0, 0)
+        board.load(filename)
+        touched = np.argwhere(board.touched)
+        print("Board: {} ({}x{}, {} touched squares)".format(filename, board.width, board.height, len(touched)))
+
+        for name, costs, use_diagonal in (("Scouting", SensingScouter.costs, False),
+                                          ("Gathering", Gatherer.costs, True)):
+            matrix = np.transpose(costs(board.dropped_blob, board.touched)).astype(float)
+            pairs = [(tuple(touched[i]), tuple(touched[j]))
+                     for i, j in random_state.randint(len(touched), size=(args.searches, 2))]
+
+            library_paths, astar_paths = [], []
+            library_time = timed(lambda: library_paths.extend(library_find_path(matrix, start, end, use_diagonal)
+                                                              for start, end in pairs), 1)
+            astar_time = timed(lambda: astar_paths.extend(AStar(use_diagonal).find_path(matrix, start, end)
+                                                          for start, end in pairs), 1)
+
+            same = all(len(library_path) == len(astar_path) == 0
+                       or (len(library_path) > 0 and len(astar_path) > 0
+                           and abs(path_cost(matrix, library_path) - path_cost(matrix, astar_path)) < 1e-6)
+                       for library_path, astar_path in zip(library_paths, astar_paths))
+
+            print("  {} costs, {} searches:".format(name, len(pairs)))
+            print("    pathfinding library: {:.6f}s per search".format(library_time / len(pairs)))
+            print("    AStar              : {:.6f}s per search".format(astar_time / len(pairs)))
+            print("    Speedup: x{:.1f} - Same path costs: {}".format(library_time / astar_time, same))
+
+
+def bench_hpa(args):
+    """
+    Compare AStar with HPAStar on full board gathering searches between random touched squares
+    """
+    random_state = np.random.RandomState(args.seed)
+    for filename in args.input:
+        board = Board(0, 0)
+        board.load(filename)
+        touched = np.argwhere(board.touched)
+        print("Board: {} ({}x{}, {} touched squares)".format(filename, board.width, board.height, len(touched)))
+
+        matrix = np.transpose(Gatherer.costs(board.dropped_blob, board.touched)).astype(float)
+        pairs = [(tuple(touched[i]), tuple(touched[j]))
+                 for i, j in random_state.randint(len(touched), size=(args.searches, 2))]
+
+        search = HPAStar(board, Gatherer.costs, True, args.tile_size)
+
+        astar_paths, hpa_paths = [], []
+        astar_time = timed(lambda: astar_paths.extend(AStar(True).find_path(matrix, start, end)
+                                                      for start, end in pairs), 1)
+        first_time = timed(lambda: hpa_paths.extend(search.find_path(start, end, args.quality)
+                                                    for start, end in pairs), 1)
+        hpa_time = timed(lambda: [search.find_path(start, end, args.quality) for start, end in pairs], 1)
+
+        overheads = [path_cost(matrix, hpa_path) / path_cost(matrix, astar_path) - 1
+                     for astar_path, hpa_path in zip(astar_paths, hpa_paths) if len(astar_path) > 1]
+        found = all((len(astar_path) > 0) == (len(hpa_path) > 0)
+                    for astar_path, hpa_path in zip(astar_paths, hpa_paths))
+
+        print("  {} searches, tiles of {} squares, quality {}:".format(len(pairs), args.tile_size, args.quality))
+        print("    AStar                     : {:.6f}s per search".format(astar_time / len(pairs)))
+        print("    HPAStar (building tiles)  : {:.6f}s per search".format(first_time / len(pairs)))
+        print("    HPAStar (tiles up to date): {:.6f}s per search".format(hpa_time / len(pairs)))
+        print("    Speedup: x{:.1f} - Same reachability: {} - Path cost overhead: {:.1%} mean, {:.1%} max"
+              .format(astar_time / hpa_time, found, np.mean(overheads) if overheads else 0,
+                      np.max(overheads) if overheads else 0))
+
+
+def masked_choose_goal(scouter):
+    """
+    Goal choice of one scouter with a masked array, as done before SensingScouter.minimal_squares
+    """
+    x0, y0 = max(0, scouter.x - scouter.sightline), max(0, scouter.y - scouter.sightline)
+    x1, y1 = min(scouter.board.width, scouter.x + scouter.sightline + 1), \
+        min(scouter.board.height, scouter.y + scouter.sightline + 1)
+
+    mask = np.zeros((x1 - x0, y1 - y0), dtype=bool)
+    mask[scouter.x - x0, scouter.y - y0] = True
+    see = np.ma.masked_where(mask, scouter.board.dropped_blob[x0:x1, y0:y1])
+    min_indices = np.ma.where(see == np.min(see))
+
+    if len(min_indices[0]) == 0:
+        return None
+    else:
+        i = np.random.randint(len(min_indices[0]))
+        return min_indices[0][i] + x0, min_indices[1][i] + y0
+
+
+def bench_goals(args):
+    """
+    Compare goal choices of scouters one by one with masked arrays and batched for all scouters
+    """
+    board = Board(0, 0)
+    board.load(args.input)
+    with open("simulation/default/blob.json", 'r') as file:
+        knowledge = json.load(file)
+
+    random_state = np.random.RandomState(args.seed)
+    touched = np.argwhere(board.touched)
+    xs, ys = touched[random_state.randint(len(touched), size=args.scouters)].T
+    scouter = SensingScouter(board, knowledge, 0, 0, sightline=args.sightline)
+    print("Board: {} ({}x{}), {} scouters, sightline {}".format(args.input, board.width, board.height, args.scouters,
+                                                                args.sightline))
+
+    def choose_goals(batched):
+        goals = []
+        squares = scouter.minimal_squares(xs, ys) if batched else None
+        for i, (x, y) in enumerate(zip(xs.tolist(), ys.tolist())):
+            scouter.x, scouter.y = x, y
+            scouter.batch = squares + (i,) if batched else None
+            goals.append(scouter.choose_goal() if batched else masked_choose_goal(scouter))
+        scouter.batch = None
+        return goals
+
+    goals = dict()
+
+    def timed_choices(batched):
+        np.random.seed(args.seed)
+        goals[batched] = choose_goals(batched)
+
+    masked_time = timed(lambda: timed_choices(False), args.repeat)
+    batched_time = timed(lambda: timed_choices(True), args.repeat)
+
+    print("Masked arrays, one scouter at a time: {:.6f}s per tick".format(masked_time))
+    print("Batched for all scouters            : {:.6f}s per tick".format(batched_time))
+    print("Speedup: x{:.1f} - Same goals: {}".format(masked_time / batched_time, goals[False] == goals[True]))
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Time critical parts of the simulation on a saved board.")
+    subparsers = ap.add_subparsers(dest="target")
+    subparsers.required = True
+
+    manage = subparsers.add_parser("manage_blob", help="time the global blob decrease done on every loop")
+    manage.add_argument("input", metavar="INPUT", nargs='?', default=DEFAULT_BOARD,
+                        help="board file to use (default: {})".format(DEFAULT_BOARD))
+    manage.add_argument("-r", "--repeat", type=int, default=20, help="number of timed calls (default: 20)")
+    manage.add_argument("--decrease", type=float, default=0.1,
+                        help="blob decrease used on each call (default: 0.1)")
+    manage.add_argument("--remaining", type=float, default=50,
+                        help="minimal blob value kept on food squares (default: 50)")
+    manage.set_defaults(function=bench_manage_blob)
+
+    board_io = subparsers.add_parser("board_io", help="time board save and load with text and binary formats")
+    board_io.add_argument("input", metavar="INPUT", nargs='?', default=DEFAULT_BOARD,
+                          help="board file to use (default: {})".format(DEFAULT_BOARD))
+    board_io.add_argument("-r", "--repeat", type=int, default=5, help="number of timed calls (default: 5)")
+    board_io.set_defaults(function=bench_board_io)
+
+    astar = subparsers.add_parser("astar", help="time full board path searches with pathfinding library and AStar")
+    astar.add_argument("input", metavar="INPUT", nargs='*', default=EXAMPLE_BOARDS,
+                       help="board files to use (default: the example boards)")
+    astar.add_argument("-s", "--searches", type=int, default=5,
+                       help="number of searches for each board and costs (default: 5)")
+    astar.add_argument("--seed", type=int, default=0, help="seed used to draw searches (default: 0)")
+    astar.set_defaults(function=bench_astar)
+
+    hpa = subparsers.add_parser("hpa", help="time full board gathering searches with AStar and HPAStar")
+    hpa.add_argument("input", metavar="INPUT", nargs='*', default=EXAMPLE_BOARDS,
+                     help="board files to use (default: the example boards)")
+    hpa.add_argument("-s", "--searches", type=int, default=20,
+                     help="number of searches for each board (default: 20)")
+    hpa.add_argument("-t", "--tile_size", type=int, default=16, help="tile width and height (default: 16)")
+    hpa.add_argument("-q", "--quality", type=int, default=1,
+                     help="number of tiles added around the abstract path to refine it (default: 1)")
+    hpa.add_argument("--seed", type=int, default=0, help="seed used to draw searches (default: 0)")
+    hpa.set_defaults(function=bench_hpa)
+
+    goals = subparsers.add_parser("goals", help="time local goal choices of scouters, one by one and batched")
+    goals.add_argument("input", metavar="INPUT", nargs='?', default=DEFAULT_BOARD,
+                       help="board file to use (default: {})".format(DEFAULT_BOARD))
+    goals.add_argument("-n", "--scouters", type=int, default=300, help="number of scouters (default: 300)")
+    goals.add_argument("--sightline", type=int, default=3, help="sightline of scouters (default: 3)")
+    goals.add_argument("-r", "--repeat", type=int, default=5, help="number of timed ticks (default: 5)")
+    goals.add_argument("--seed", type=int, default=0, help="seed used to place scouters (default: 0)")
+    goals.set_defaults(function=bench_goals)
+
+    args = ap.parse_args()
+    args.function(args)
+
+
+if __name__ == "__main__":
+    main()
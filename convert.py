@@ -0,0 +1,56 @@
+# Copyright (C) 2019 - UMons
+# 
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+# 
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+# 
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+import argparse
+from simulation.board import Board
+
+TEXT_FORMAT = "text"
+BINARY_FORMAT = "binary"
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Convert a board file between text and binary formats.")
+    ap.add_argument("input", metavar="INPUT", help="board file to convert")
+    ap.add_argument("output", metavar="OUTPUT", help="name of the converted board file")
+    ap.add_argument("-t", "--to", type=str, choices=[TEXT_FORMAT, BINARY_FORMAT], default=None,
+                    help="Format of the output file (default: the opposite of the input format)")
+    ap.add_argument("--dtype", type=str, choices=Board.STORAGE_DTYPES, default=None,
+                    help="Dtype used to store blob and food quantities in binary output (default: input dtype)")
+    ap.add_argument("--pack_touched", action='store_true',
+                    help="Store touched squares as bits in binary output (smaller file, touched read at once)")
+    args = ap.parse_args()
+
+    input_format = BINARY_FORMAT if Board.is_binary(args.input) else TEXT_FORMAT
+    if args.to is None:
+        args.to = TEXT_FORMAT if input_format == BINARY_FORMAT else BINARY_FORMAT
+
+    board = Board(0, 0)
+    board.load(args.input, lazy=False)
+    if args.dtype is not None:
+        board.set_dtype(args.dtype)
+
+    if args.to == BINARY_FORMAT:
+        board.save_binary(args.output, args.pack_touched)
+    else:
+        with open(args.output, 'w') as file:
+            file.write(board.save())
+
+    print("Board {} ({}x{}) converted from {} to {} format in {}".format(args.input, board.width, board.height,
+                                                                         input_format, args.to, args.output))
+
+
+if __name__ == "__main__":
+    main()
@@ -17,23 +17,25 @@
 import pygame
 import argparse
 import time
-from os.path import exists, join, splitext
 import os
 import json
 
 from pygame.locals import QUIT, KEYDOWN, K_ESCAPE
 from simulation.interface import Interface
 from simulation.board import Board
-from simulation.player import Player
-from simulation.logic.blob_manager import BlobManager
+from simulation.simulation import Simulation
+from simulation.profiler import Profiler
 
 HIDE_GUI = 0
 WINDOW_GUI = 1
 BORDERLESS_GUI = 2
 FULLSCREEN_GUI = 3
 
+OBJECTS_ENGINE = Simulation.OBJECTS_ENGINE
+ARRAYS_ENGINE = Simulation.ARRAYS_ENGINE
+
 SCREEN_RESOLUTION = (1920, 1080)
-DEFAULT_DIR = "simulation/default"
+DEFAULT_DIR = Simulation.DEFAULT_DIR
 
 
 def main():
@@ -50,8 +52,13 @@ def main():
     parser.add_argument('--save', type=str, default="save/",
                         help="Pass the directory where saves are stored. (default: save/)")
 
-    parser.add_argument('--computing_ratio', type=int, default=1,
-                        help='how many times computing loop is done before drawing GUI')
+    parser.add_argument('--computing_ratio', type=int, default=0,
+                        help='Maximum number of computing loops done between two drawings of the GUI '
+                             '(default: 0, as many as fit between two frames)')
+    parser.add_argument('--fps', type=float, default=30,
+                        help='Number of GUI drawings per second targeted (default: 30)')
+    parser.add_argument('--poll_rate', type=float, default=60,
+                        help='Number of times per second user events are checked (default: 60)')
     parser.add_argument('--auto_loops', type=int, default=-1,
                         help='set number of loops needed before saving and closing automatically')
     parser.add_argument('--display', type=int, default=WINDOW_GUI,
@@ -62,37 +69,54 @@ def main():
                         .format(WINDOW_GUI, BORDERLESS_GUI, FULLSCREEN_GUI, HIDE_GUI))
     parser.add_argument('--init_foods', type=int, default=0,
                         help='Starts the game by initializing a certain quantity of foods in one of the half-board')
+    parser.add_argument('--binary', action='store_true',
+                        help='Saves the board with the binary format (faster to save and load on large boards)')
+    parser.add_argument('--dtype', type=str, choices=Board.STORAGE_DTYPES, default=None,
+                        help='Dtype used to store blob and food quantities (default: the one of the input board '
+                             'or float64), float32 halves the board memory')
+    parser.add_argument('--engine', type=str, choices=[OBJECTS_ENGINE, ARRAYS_ENGINE], default=OBJECTS_ENGINE,
+                        help="Ants colony engine: '{}' moves ant objects one by one, "
+                             "'{}' stores the colony as arrays and moves it at once (default: {})"
+                        .format(OBJECTS_ENGINE, ARRAYS_ENGINE, OBJECTS_ENGINE))
+    parser.add_argument('--check_board', action='store_true',
+                        help='Debug mode checking board running totals against a full recount each time they are used')
+    parser.add_argument('--checkpoint', type=int, default=0,
+                        help='Saves the whole simulation state every CHECKPOINT loops in the "checkpoints" folder of '
+                             'the save directory (default: 0, no checkpoint)')
+    parser.add_argument('--keep_checkpoints', type=int, default=3,
+                        help='Number of last checkpoints kept (default: 3)')
+    parser.add_argument('--profile', type=str, default=None,
+                        help='Times each phase of the simulation loops, drawings and saves, and writes their totals, '
+                             'means and percentiles in the given file when closing (.csv extension for csv, '
+                             'json otherwise)')
+    parser.add_argument('--resume', type=str, default=None,
+                        help='Resumes a simulation from a checkpoint file or from the last checkpoint of a folder. '
+                             'Overwrite input, dtype, engine and init_foods parameters, auto_loops then includes the '
+                             'loops done before the checkpoint')
 
     args = parser.parse_args()
 
-    player_file = join(DEFAULT_DIR, "player.json")
-    blob_file = join(DEFAULT_DIR, "blob.json")
-    gui_file = join(DEFAULT_DIR, "interface.json")
-
-    results = dict()
-
-    if args.input is not None:
-        assert exists(args.input)
-        root_name = splitext(args.input)[0]
-
-        results['From'] = root_name
+    if args.profile is not None:
+        Profiler.enable()
 
-        board = Board(args.width, args.height)
-        board.load(args.input)
+    gui_file = os.path.join(DEFAULT_DIR, "interface.json")
 
-        if exists(root_name + ".player.json"):
-            player_file = root_name + ".player.json"
-
-        if exists(root_name + ".blob.json"):
-            blob_file = root_name + ".blob.json"
+    if args.resume is not None:
+        checkpoint = args.resume
+        if os.path.isdir(checkpoint):
+            checkpoint = Simulation.list_checkpoints(checkpoint)[-1]
+        simulation = Simulation.load_checkpoint(checkpoint, args.check_board)
+        if args.auto_loops > 0:
+            args.auto_loops = max(0, args.auto_loops - simulation.loops)
     else:
-        board = Board(args.width, args.height)
-
-    blob = BlobManager(board, blob_file)
-    player = Player(board, blob, player_file)
+        simulation = Simulation.load(args.input, args.width, args.height, args.engine, args.check_board, args.dtype,
+                                     DEFAULT_DIR)
+        if args.init_foods > 0:
+            simulation.init_foods(args.init_foods)
+    board = simulation.board
 
-    if args.init_foods > 0:
-        results['Init_foods'] = player.set_random_food(args.init_foods, not player.clean_top)
+    if args.checkpoint > 0:
+        simulation.checkpoint_every(os.path.join(args.save, "checkpoints"), args.checkpoint, args.keep_checkpoints)
 
     mode = 0
     window_x = int((SCREEN_RESOLUTION[0] - board.width * args.scale) / 2)
@@ -107,26 +131,59 @@ def main():
         if args.auto_loops <= 0:
             args.display = WINDOW_GUI
 
-    gui = Interface(board, player, blob, args.scale, args.save, mode, args.display == HIDE_GUI, gui_file)
+    gui = Interface(simulation, args.scale, args.save, mode, args.display == HIDE_GUI, gui_file, args.binary)
+    if args.display == HIDE_GUI:
+        # Nothing to show nor to listen to, run all loops at once
+        timer = time.perf_counter()
+        simulation.step(args.auto_loops)
+        timing = time.perf_counter() - timer
+        print("Loop mean time : {:.3f}s per iteration ({:.1f} ticks/s)".format(timing / args.auto_loops,
+                                                                             args.auto_loops / timing))
+        args.auto_loops = 0
+    else:
+        run_gui(gui, simulation, args)
+
+    if args.auto_loops == 0:
+        name = gui.save()
+
+        results = simulation.results()
+        results['To'] = args.save + name
+
+        with open(os.path.join(args.save, name + ".results.json"), 'w') as file:
+            json.dump(results, file, indent=4, sort_keys=True)
+
+    if args.profile is not None:
+        Profiler.ACTIVE.save(args.profile)
+        print("Profile saved at " + args.profile)
+
+
+def run_gui(gui, simulation, args):
+    """
+    Compute and draw the simulation until the user quits or the automatic loops are done.
+    Drawings and event checks are scheduled at fixed rates (args.fps and args.poll_rate), the time left in between
+    is used to compute as many loops as possible, and the loop only sleeps when the simulation is paused.
+    :param gui: an Interface instance
+    :param simulation: a Simulation instance
+    :param args: the parsed arguments of play.py, args.auto_loops is decreased along automatic loops
+    """
     if args.auto_loops > 0:
-        results['Loops'] = args.auto_loops
         gui.play = True
 
-    init_counter = 100
-    timer = time.time()
-    counter = init_counter
+    frame_period = 1 / args.fps
+    poll_period = 1 / args.poll_rate
+    next_frame = next_poll = time.perf_counter()
+    frame_loops = 0  # Loops computed since last drawing
+
+    report_period = 5
+    report_time = time.perf_counter()
+    ticks = frames = 0
 
-    init_computing_ratio = args.computing_ratio
     ended = False
     while not ended and args.auto_loops != 0:
-        computing_ratio = init_computing_ratio
-        while computing_ratio > 0 and args.auto_loops != 0:
-            if gui.play or gui.do_step:
-                blob.move()
-                gui.do_step = False
-                if args.auto_loops > 0:
-                    args.auto_loops -= 1
+        now = time.perf_counter()
 
+        if now >= next_poll:
+            next_poll = max(next_poll + poll_period, now)
             for event in pygame.event.get():
                 if event.type == QUIT or event.type == KEYDOWN and event.key == K_ESCAPE:
                     ended = True
@@ -138,32 +195,30 @@ def main():
                         args.auto_loops = -1
                         print("User interaction detected ! \n\t --- Automatic mode stopped.")
 
-            computing_ratio -= 1
-
-        if args.display != HIDE_GUI:
+        if now >= next_frame:
+            # Late frames are skipped instead of being drawn one after the other
+            next_frame = max(next_frame + frame_period, now)
             gui.draw()
-
-        pygame.time.wait(10)
-
-        counter -= 1
-        if counter == 0:
-            timing = time.time() - timer
-            print("Loop mean time : {:.3f}s per iteration".format(timing / init_counter))
-            counter = init_counter
-            timer = time.time()
-
-    if args.auto_loops == 0:
-        name = gui.save()
-
-        up_size_percent, down_size_percent = player.check_blob_cover()
-        results['Covering'] = dict()
-        results['Covering']['Total'] = (up_size_percent + down_size_percent)/2
-        results['Covering']['Top'] = up_size_percent
-        results['Covering']['Bottom'] = down_size_percent
-        results['To'] = args.save + name
-
-        with open(args.save + name + ".results.json", 'w') as file:
-            json.dump(results, file, indent=4, sort_keys=True)
+            frames += 1
+            frame_loops = 0
+
+        if (gui.play or gui.do_step) and (args.computing_ratio <= 0 or frame_loops < args.computing_ratio):
+            simulation.step()
+            gui.do_step = False
+            frame_loops += 1
+            ticks += 1
+            if args.auto_loops > 0:
+                args.auto_loops -= 1
+        else:
+            pygame.time.wait(max(0, int((min(next_frame, next_poll) - time.perf_counter()) * 1000)))
+
+        if now - report_time >= report_period:
+            timing = now - report_time
+            if ticks > 0:
+                print("Loop mean time : {:.3f}s per iteration ({:.1f} ticks/s, {:.1f} frames/s)"
+                      .format(timing / ticks, ticks / timing, frames / timing))
+            report_time = now
+            ticks = frames = 0
 
 
 if __name__ == "__main__":
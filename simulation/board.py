@@ -14,6 +14,9 @@
 # License along with this library; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
 
+import itertools
+import os
+import struct
 import numpy as np
 
 
@@ -24,42 +27,114 @@ class Board:
     MIN_BLOB = 0.0  # Blob lowest possible value
     INIT_FOOD = 100  # Highest and initial food value
 
-    def __init__(self, width, height):
+    # Board versions are taken from one shared counter, so a version number is never reused (even by a reloaded board)
+    VERSIONS = itertools.count(1)
+
+    STORAGE_DTYPES = ('float64', 'float32')  # Available dtypes to store blob and food quantities
+
+    BINARY_MAGIC = b'BLOBBRD\x00'  # First bytes of a binary board file
+    BINARY_VERSION = 2  # Version of the binary board format written by save_binary
+    # Magic, version, width, height, foods and blob dtypes (index in STORAGE_DTYPES) and packed touched flag,
+    # padded to 32 bytes. Version 1 only had the four first fields, its zero padding reads as float64 and unpacked
+    BINARY_HEADER = '<8sIIIBBB9x'
+    MAX_LOGGED_CHANGES = 4096  # Modified squares remembered before considering that the whole board has changed
+    REGION_SIZE = 16  # Width and height of the board regions having their own version
+
+    def __init__(self, width, height, check_totals=False, dtype='float64'):
         """
         :param width: number of squares for board width
         :param height: number of squares for board height
+        :param check_totals: debug mode, set to True to compare running totals with a full recount on each query
+        :param dtype: the dtype used to store blob and food quantities, one of Board.STORAGE_DTYPES
+            ('float32' halves their memory footprint)
         """
+        if dtype not in Board.STORAGE_DTYPES:
+            raise ValueError("Unsupported board dtype " + str(dtype) + ", use one of " + str(Board.STORAGE_DTYPES))
+
         self.width = width
         self.height = height
+        self.check_totals = check_totals
+        self.dtype = dtype
 
-        self.dropped_blob = np.zeros(shape=(width, height), dtype=float)
-        self.foods = np.zeros(shape=(width, height), dtype=float)
+        self.dropped_blob = np.zeros(shape=(width, height), dtype=dtype)
+        self.foods = np.zeros(shape=(width, height), dtype=dtype)
         self.touched = np.zeros(shape=(width, height), dtype=bool)
 
+        # Running totals kept up to date by every board modification
+        self.blob_sum = 0.0
+        self.touched_count = 0
+        self.touched_top_count = 0
+
+        self.version = next(Board.VERSIONS)
+        # Squares modified since the version 'changes_start', the whole board may have changed at that version
+        self.changes_start = self.version
+        self.changes = []
+        # Version of the last modification inside each region of REGION_SIZE x REGION_SIZE squares
+        self.region_versions = np.full(self.regions_shape(), self.version)
+        # Version of the last modification of touched flags inside each region
+        self.touched_versions = np.full(self.regions_shape(), self.version)
+
     def save(self):
         """
         :return: a string value containing all information to save board current state
         """
-        stream = str(self.width) + ' ' + str(self.height) + '\n'
+        lines = [str(self.width) + ' ' + str(self.height)]
         for y in range(self.height):
-            for x in range(self.width):
-                saved_node = "{:d},{},{} ".format(self.touched[x, y], self.foods[x, y], self.dropped_blob[x, y])
-                stream += saved_node
-            stream = stream.rstrip(' ')
-            stream += '\n'
+            lines.append(' '.join("{:d},{},{}".format(self.touched[x, y], self.foods[x, y], self.dropped_blob[x, y])
+                                  for x in range(self.width)))
+
+        return '\n'.join(lines)
+
+    def save_binary(self, filename, pack_touched=False):
+        """
+        Store board current state in the binary format: a fixed size header followed by raw foods, dropped_blob
+        and touched arrays. The file is written aside and then moved, so a board still mapped on the previous file
+        remains valid.
+        :param filename: the name of the file to write
+        :param pack_touched: set to True to store touched squares as bits instead of bytes
+            (smaller file but touched squares can't be mapped anymore and are read at once when loading)
+        """
+        dtype_code = Board.STORAGE_DTYPES.index(self.dtype)
+        disk_dtype = np.dtype(self.dtype).newbyteorder('<')
+
+        tmp_filename = filename + ".tmp"
+        with open(tmp_filename, 'wb') as file:
+            file.write(struct.pack(Board.BINARY_HEADER, Board.BINARY_MAGIC, Board.BINARY_VERSION,
+                                   self.width, self.height, dtype_code, dtype_code, pack_touched))
+            np.ascontiguousarray(self.foods, dtype=disk_dtype).tofile(file)
+            np.ascontiguousarray(self.dropped_blob, dtype=disk_dtype).tofile(file)
+            if pack_touched:
+                np.packbits(self.touched).tofile(file)
+            else:
+                np.ascontiguousarray(self.touched, dtype=np.uint8).tofile(file)
 
-        return stream.rstrip('\n')
+        os.replace(tmp_filename, filename)
 
-    def load(self, filename):
+    @staticmethod
+    def is_binary(filename):
         """
-        Restore from file the board state
+        :param filename: the name of a board file
+        :return: True if the file uses the binary board format
+        """
+        with open(filename, 'rb') as file:
+            return file.read(len(Board.BINARY_MAGIC)) == Board.BINARY_MAGIC
+
+    def load(self, filename, lazy=True):
+        """
+        Restore from file the board state, text and binary formats are both accepted
         :param filename: the name of a file which contains the board saved data
+        :param lazy: for binary files, map the arrays on the file instead of reading them
+            (squares are only read from disk when used and changes are never written back)
         """
+        if Board.is_binary(filename):
+            self.load_binary(filename, lazy)
+            return
+
         with open(filename, 'r') as file:
             dim = file.readline()
             dims = dim.split(' ')
             if dims[0] != self.width and dims[1] != self.height:
-                self.__init__(int(dims[0]), int(dims[1]))
+                self.__init__(int(dims[0]), int(dims[1]), self.check_totals, self.dtype)
 
             y = 0
             for line in file:
@@ -81,6 +156,166 @@ class Board:
 
                 y += 1
 
+        self.recount()
+
+    def load_binary(self, filename, lazy=True):
+        """
+        Restore from a binary file the board state, including the dtype used to store blob and food quantities
+        :param filename: the name of a file saved with save_binary
+        :param lazy: set to True to map arrays on the file (copy-on-write) instead of reading them
+        """
+        with open(filename, 'rb') as file:
+            header = file.read(struct.calcsize(Board.BINARY_HEADER))
+
+        magic, version, width, height, foods_code, blob_code, packed = struct.unpack(Board.BINARY_HEADER, header)
+        if magic != Board.BINARY_MAGIC:
+            raise ValueError(filename + " is not a binary board file")
+        if not 1 <= version <= Board.BINARY_VERSION:
+            raise ValueError("Unsupported binary board version " + str(version) + " in " + filename)
+        if foods_code != blob_code or blob_code >= len(Board.STORAGE_DTYPES):
+            raise ValueError("Unsupported board dtypes in " + filename)
+
+        self.__init__(width, height, self.check_totals, Board.STORAGE_DTYPES[blob_code])
+        disk_dtype = np.dtype(self.dtype).newbyteorder('<')
+        squares = width * height
+
+        offset = len(header)
+        arrays = []
+        for dtype, count in ((disk_dtype, squares), (disk_dtype, squares),
+                             (np.uint8, (squares + 7) // 8 if packed else squares)):
+            if lazy and count > 0:
+                array = np.memmap(filename, dtype=dtype, mode='c', offset=offset, shape=(count,))
+            else:
+                with open(filename, 'rb') as file:
+                    file.seek(offset)
+                    array = np.fromfile(file, dtype=dtype, count=count)
+            offset += count * np.dtype(dtype).itemsize
+            arrays.append(array)
+
+        self.foods = arrays[0].reshape((width, height))
+        self.dropped_blob = arrays[1].reshape((width, height))
+        if packed:
+            self.touched = np.unpackbits(arrays[2])[:squares].astype(bool).reshape((width, height))
+        else:
+            self.touched = arrays[2].view(bool).reshape((width, height))
+        self.recount()
+
+    def set_dtype(self, dtype):
+        """
+        Convert the storage of blob and food quantities to another dtype
+        :param dtype: the new dtype, one of Board.STORAGE_DTYPES
+        """
+        if dtype not in Board.STORAGE_DTYPES:
+            raise ValueError("Unsupported board dtype " + str(dtype) + ", use one of " + str(Board.STORAGE_DTYPES))
+
+        if dtype != self.dtype:
+            self.dtype = dtype
+            self.dropped_blob = self.dropped_blob.astype(dtype)
+            self.foods = self.foods.astype(dtype)
+            self.recount()
+
+    def changed(self, x=None, y=None, mask=None, touched=False):
+        """
+        Give a new version number to the board and to the modified regions, and log modified squares
+        Called by all board modifications, to be called as well after any direct modification of board arrays
+        :param x: horizontal position (or array of positions) of the modified squares, None if any square may have
+            changed
+        :param y: vertical position (or array of positions) of the modified squares, None if any square may have
+            changed
+        :param mask: boolean array set to True on modified squares, to be given instead of positions
+            when many squares have changed
+        :param touched: True if touched flags of modified squares may have changed (or boolean array set to True
+            for such squares among given positions)
+        """
+        self.version = next(Board.VERSIONS)
+        if x is None or len(self.changes) >= Board.MAX_LOGGED_CHANGES:
+            self.changes_start = self.version
+            self.changes = []
+        elif np.ndim(x) == 0:
+            self.changes.append((x, y))
+        else:
+            self.changes.extend(zip(np.asarray(x).tolist(), np.asarray(y).tolist()))
+
+        if mask is not None:
+            self.region_versions[self.regions_of(mask)] = self.version
+        elif x is None or self.region_versions.shape != self.regions_shape():
+            self.region_versions = np.full(self.regions_shape(), self.version)
+        else:
+            self.region_versions[np.asarray(x) // Board.REGION_SIZE, np.asarray(y) // Board.REGION_SIZE] = self.version
+
+        if (x is None and mask is None) or self.touched_versions.shape != self.regions_shape():
+            self.touched_versions = np.full(self.regions_shape(), self.version)
+        elif mask is not None and np.any(touched):
+            self.touched_versions[self.regions_of(mask & touched)] = self.version
+        elif mask is None and np.any(touched):
+            xs, ys = (np.asarray(x), np.asarray(y)) if np.ndim(touched) == 0 \
+                else (np.asarray(x)[touched], np.asarray(y)[touched])
+            self.touched_versions[xs // Board.REGION_SIZE, ys // Board.REGION_SIZE] = self.version
+
+    def regions_shape(self):
+        """
+        :return: the number of regions along board width and height
+        """
+        return -(-self.width // Board.REGION_SIZE), -(-self.height // Board.REGION_SIZE)
+
+    def regions_of(self, mask):
+        """
+        :param mask: a boolean array with board shape
+        :return: a boolean array set to True on regions having at least one True square in mask
+        """
+        if mask.size == 0:
+            return np.zeros(self.regions_shape(), dtype=bool)
+
+        regions = np.logical_or.reduceat(mask, np.arange(0, self.width, Board.REGION_SIZE), axis=0)
+        return np.logical_or.reduceat(regions, np.arange(0, self.height, Board.REGION_SIZE), axis=1)
+
+    def region_version(self, x0, y0, x1, y1):
+        """
+        :param x0: the x coordinate of the up left corner of the rectangle
+        :param y0: the y coordinate of the up left corner of the rectangle
+        :param x1: the x coordinate of the bottom right corner of the rectangle (excluded)
+        :param y1: the y coordinate of the bottom right corner of the rectangle (excluded)
+        :return: the version of the last modification of a region overlapping the rectangle
+        """
+        return int(np.max(self.region_versions[x0 // Board.REGION_SIZE:(x1 - 1) // Board.REGION_SIZE + 1,
+                                               y0 // Board.REGION_SIZE:(y1 - 1) // Board.REGION_SIZE + 1]))
+
+    def touched_version(self, x0, y0, x1, y1):
+        """
+        :param x0: the x coordinate of the up left corner of the rectangle
+        :param y0: the y coordinate of the up left corner of the rectangle
+        :param x1: the x coordinate of the bottom right corner of the rectangle (excluded)
+        :param y1: the y coordinate of the bottom right corner of the rectangle (excluded)
+        :return: the version of the last modification of touched flags in a region overlapping the rectangle
+        """
+        return int(np.max(self.touched_versions[x0 // Board.REGION_SIZE:(x1 - 1) // Board.REGION_SIZE + 1,
+                                                y0 // Board.REGION_SIZE:(y1 - 1) // Board.REGION_SIZE + 1]))
+
+    def recount(self):
+        """
+        Compute again running totals from all board squares
+        """
+        self.changed()
+        self.blob_sum = float(np.sum(self.dropped_blob, dtype=float))
+        self.touched_count = int(np.count_nonzero(self.touched))
+        self.touched_top_count = int(np.count_nonzero(self.touched[:, 0:int(self.height/2)]))
+
+    def check_aggregates(self):
+        """
+        Compare running totals with a full recount of the board
+        Raise an AssertionError if they don't match
+        """
+        blob_sum = float(np.sum(self.dropped_blob, dtype=float))
+        touched_count = int(np.count_nonzero(self.touched))
+        touched_top_count = int(np.count_nonzero(self.touched[:, 0:int(self.height/2)]))
+
+        if abs(blob_sum - self.blob_sum) > 1e-6 * max(1.0, blob_sum):
+            raise AssertionError("Blob total is {} but {} is recounted".format(self.blob_sum, blob_sum))
+        if touched_count != self.touched_count or touched_top_count != self.touched_top_count:
+            raise AssertionError("Touched squares are {} ({} on top) but {} ({} on top) are recounted"
+                                 .format(self.touched_count, self.touched_top_count, touched_count,
+                                         touched_top_count))
+
     def has_food(self, x, y):
         """
         :param x: horizontal square position
@@ -98,6 +333,7 @@ class Board:
         """
         if not self.foods[x, y] > 0:
             self.foods[x, y] = value
+            self.changed(x, y)
 
     def remove_food(self, x, y):
         """
@@ -107,6 +343,7 @@ class Board:
         """
         if self.foods[x, y] > 0:
             self.foods[x, y] = 0
+            self.changed(x, y)
 
     def update_blob(self, x, y, change_value):
         """
@@ -116,8 +353,17 @@ class Board:
         :param change_value: the blob value to add on this square
         """
         if self.inside(x, y):
-            self.touched[x, y] = True
-            self.dropped_blob[x, y] = max(Board.MIN_BLOB, min(self.dropped_blob[x, y] + change_value, Board.MAX_BLOB))
+            new_touched = not self.touched[x, y]
+            if new_touched:
+                self.touched[x, y] = True
+                self.touched_count += 1
+                if y < int(self.height/2):
+                    self.touched_top_count += 1
+
+            old_value = self.dropped_blob[x, y]
+            self.dropped_blob[x, y] = max(Board.MIN_BLOB, min(old_value + change_value, Board.MAX_BLOB))
+            self.blob_sum += float(self.dropped_blob[x, y]) - float(old_value)
+            self.changed(x, y, touched=new_touched)
 
     def eat_food(self, x, y, change_value):
         """
@@ -134,11 +380,91 @@ class Board:
             else:
                 change_value = self.foods[x, y]
                 self.foods[x, y] = 0
+            self.changed(x, y)
         else:
             change_value = 0
 
         return change_value, self.foods[x, y] <= 0
 
+    def group_squares(self, xs, ys):
+        """
+        Keep only positions inside the board and group them by square
+        :param xs: array of horizontal square positions
+        :param ys: array of vertical square positions
+        :return: a tuple with the indices of kept positions, the horizontal and vertical positions of each distinct
+            square and, for each kept position, the index of its square
+        """
+        xs = np.asarray(xs, dtype=int)
+        ys = np.asarray(ys, dtype=int)
+        kept = np.flatnonzero((0 <= xs) & (xs < self.width) & (0 <= ys) & (ys < self.height))
+
+        squares, groups = np.unique(xs[kept] * self.height + ys[kept], return_inverse=True)
+        return kept, squares // self.height, squares % self.height, groups.reshape(-1)
+
+    def update_blob_many(self, xs, ys, change_values):
+        """
+        Batched version of update_blob: changes on a same square are added together and then clamped once
+        :param xs: array of horizontal square positions
+        :param ys: array of vertical square positions
+        :param change_values: array of blob values to add on each position (or a single value for all of them)
+        """
+        change_values = np.broadcast_to(np.asarray(change_values, dtype=float), np.shape(xs))
+        kept, squares_x, squares_y, groups = self.group_squares(xs, ys)
+        if len(kept) == 0:
+            return
+
+        changes = np.bincount(groups, weights=change_values[kept], minlength=len(squares_x))
+
+        new_touched = ~self.touched[squares_x, squares_y]
+        self.touched_count += int(np.count_nonzero(new_touched))
+        self.touched_top_count += int(np.count_nonzero(new_touched & (squares_y < int(self.height/2))))
+        self.touched[squares_x, squares_y] = True
+
+        old_values = self.dropped_blob[squares_x, squares_y]
+        self.dropped_blob[squares_x, squares_y] = np.clip(old_values + changes, Board.MIN_BLOB, Board.MAX_BLOB)
+        self.blob_sum += float(np.sum(self.dropped_blob[squares_x, squares_y], dtype=float)) \
+            - float(np.sum(old_values, dtype=float))
+        self.changed(squares_x, squares_y, touched=new_touched)
+
+    def eat_food_many(self, xs, ys, change_values):
+        """
+        Batched version of eat_food: ants sharing a square are served in the given order,
+        each one receiving what remains of the food until it is finished
+        :param xs: array of horizontal square positions
+        :param ys: array of vertical square positions
+        :param change_values: array of (positive) food values wanted on each position
+            (or a single value for all of them)
+        :return: a tuple with an array of food actually received on each position
+            and a boolean array set to True where the food square is finished once the position has been served
+        """
+        change_values = np.broadcast_to(np.asarray(change_values, dtype=float), np.shape(xs))
+        received = np.zeros(np.shape(xs), dtype=float)
+        finished = np.zeros(np.shape(xs), dtype=bool)
+
+        kept, squares_x, squares_y, groups = self.group_squares(xs, ys)
+        if len(kept) == 0:
+            return received, finished
+
+        # Sort positions by square (keeping given order inside a square) to know what was wanted before each one
+        order = np.argsort(groups, kind='stable')
+        wanted = change_values[kept][order]
+        wanted_before = np.cumsum(wanted) - wanted
+        first_of_square = np.searchsorted(groups[order], np.arange(len(squares_x)))
+        wanted_before -= wanted_before[first_of_square][groups[order]]
+
+        available = self.foods[squares_x, squares_y].astype(float)
+        sorted_available = available[groups[order]]
+        sorted_received = np.clip(sorted_available - wanted_before, 0, wanted)
+        sorted_received[sorted_available <= 0] = 0
+
+        received[kept[order]] = sorted_received
+        finished[kept[order]] = (sorted_available <= 0) | (sorted_available - wanted_before - wanted <= 0)
+        totals = np.bincount(groups, weights=change_values[kept], minlength=len(squares_x))
+        self.foods[squares_x, squares_y] = np.where(available > 0, np.maximum(available - totals, 0), available)
+        self.changed(squares_x, squares_y)
+
+        return received, finished
+
     def get_blob(self, x, y):
         """
         :param x: horizontal square position
@@ -176,12 +502,15 @@ class Board:
             or 0 to return cover from all the board
         :return: the covering percentage (number of touched square) on the complete board or given half-board
         """
+        if self.check_totals:
+            self.check_aggregates()
+
         if half_board == 1:
-            val = np.sum(self.touched[:, 0:int(self.height/2)]) * 2
+            val = self.touched_top_count * 2
         elif half_board == 2:
-            val = np.sum(self.touched[:, int(self.height/2):self.height]) * 2
+            val = (self.touched_count - self.touched_top_count) * 2
         else:
-            val = np.sum(self.touched)
+            val = self.touched_count
 
         return val / self.height / self.width * 100
 
@@ -189,12 +518,10 @@ class Board:
         """
         :return: the total quantity of blob on the board
         """
-        total = 0
-        for x in range(self.width):
-            for y in range(self.height):
-                total += self.dropped_blob[x, y]
+        if self.check_totals:
+            self.check_aggregates()
 
-        return total / self.height / self.width / self.MAX_BLOB * 100
+        return self.blob_sum / self.height / self.width / self.MAX_BLOB * 100
 
     def manage_blob(self, value, min_food_value=MIN_BLOB):
         """
@@ -203,11 +530,12 @@ class Board:
         :param value: use to decrease all blob squares
         :param min_food_value: minimal remaining blob value when it's a food square as well
         """
-        for x in range(self.width):
-            for y in range(self.height):
-                if self.touched[x, y]:
-                    if not (self.foods[x, y] > 0 and self.dropped_blob[x, y] <= min_food_value):
-                        self.update_blob(x, y, -value)
+        mask = self.touched & ~((self.foods > 0) & (self.dropped_blob <= min_food_value))
+        self.dropped_blob[mask] = np.clip(self.dropped_blob[mask] - value, Board.MIN_BLOB, Board.MAX_BLOB)
+
+        # Whole board is already visited, so blob total is summed again to avoid drifting
+        self.blob_sum = float(np.sum(self.dropped_blob, dtype=float))
+        self.changed(mask=mask)
 
     def reset(self, x, y):
         """
@@ -216,9 +544,39 @@ class Board:
         :param y: vertical square position
         """
         if self.inside(x, y):
-            self.touched[x, y] = False
+            old_touched = self.touched[x, y]
+            if old_touched:
+                self.touched[x, y] = False
+                self.touched_count -= 1
+                if y < int(self.height/2):
+                    self.touched_top_count -= 1
+
+            self.blob_sum -= float(self.dropped_blob[x, y])
             self.dropped_blob[x, y] = 0
             self.foods[x, y] = 0
+            self.changed(x, y, touched=old_touched)
+
+    def reset_region(self, x0, y0, x1, y1):
+        """
+        Reset all squares inside a rectangle region, meaning non-touched, no blob and no food
+        :param x0: the x coordinate of the up left corner of the region
+        :param y0: the y coordinate of the up left corner of the region
+        :param x1: the x coordinate following the bottom right corner of the region (excluded)
+        :param y1: the y coordinate following the bottom right corner of the region (excluded)
+        """
+        x0, y0 = max(0, x0), max(0, y0)
+        x1, y1 = min(self.width, x1), min(self.height, y1)
+        if x0 >= x1 or y0 >= y1:
+            return
+
+        self.touched_count -= int(np.count_nonzero(self.touched[x0:x1, y0:y1]))
+        self.touched_top_count -= int(np.count_nonzero(self.touched[x0:x1, y0:min(y1, int(self.height/2))]))
+        self.blob_sum -= float(np.sum(self.dropped_blob[x0:x1, y0:y1], dtype=float))
+
+        self.touched[x0:x1, y0:y1] = False
+        self.dropped_blob[x0:x1, y0:y1] = 0
+        self.foods[x0:x1, y0:y1] = 0
+        self.changed()
 
     def compare(self, board):
         """
@@ -240,4 +598,5 @@ class Board:
                 board_comp.touched[x, y] = self.touched[x, y] == board.touched[x, y]
                 board_comp.dropped_blob[x, y] = board.dropped_blob[x, y] - self.dropped_blob[x, y]
 
+        board_comp.recount()
         return board_comp
@@ -15,13 +15,13 @@
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
 
 import pygame
-import time
-import datetime
 import os.path
 import json
+import numpy as np
 
 from pygame.locals import *
 from simulation.board import Board
+from simulation.profiler import Profiler
 
 
 class Interface:
@@ -34,16 +34,15 @@ class Interface:
     BACKGROUND = (0, 0, 0)
     BOARD_SEPARATOR = (120, 120, 120)
 
-    def __init__(self, board, player, blob, scale, save_dir, mode, hidden=False, colors_file=None):
+    def __init__(self, simulation, scale, save_dir, mode, hidden=False, colors_file=None, binary_board=False):
         """
-        :param board: A board instance
-        :param player: A player instance
-        :param blob: A blob manager instance
+        :param simulation: A Simulation instance, giving the board, the player and the blob manager
         :param scale: the scale to apply from board resolution to window resolution
         :param save_dir: the save directory to use to save games
         :param mode: a pygame mode flags
         :param hidden: set to True if you want to keep interface hidden from user
         :param colors_file: a color config file to modify interface colors
+        :param binary_board: set to True to save board files with the binary format instead of the text one
         """
         pygame.init()
         # pygame.key.set_repeat(5, 50)
@@ -60,12 +59,14 @@ class Interface:
             Interface.BACKGROUND = tuple(colors['BACKGROUND'])
             Interface.BOARD_SEPARATOR = tuple(colors['BOARD_SEPARATOR'])
 
-        self.board = board
-        self.player = player
-        self.blob = blob
+        self.simulation = simulation
+        self.board = simulation.board
+        self.player = simulation.player
+        self.blob = simulation.blob
         self.scale = scale
 
         self.save_dir = save_dir
+        self.binary_board = binary_board
 
         self.debug_mode = False
         self.play = False
@@ -93,75 +94,52 @@ class Interface:
         """
         Update interface and draw it again on the window
         """
-        width = self.board.width * self.scale
-        height = self.board.height * self.scale
+        with Profiler.phase("draw"):
+            width = self.board.width * self.scale
+            height = self.board.height * self.scale
 
-        game_surface = pygame.Surface((self.board.width, self.board.height))
-        pixel_array = pygame.PixelArray(game_surface)
+            colors = np.empty((self.board.width, self.board.height, 3), dtype=np.uint8)
+            colors[:] = Interface.BACKGROUND
+            colors[self.board.foods > 0] = Interface.FOOD_COLOR
+            colors[self.board.touched] = Interface.TOUCHED_COLOR
 
-        for x in range(self.board.width):
-            for y in range(self.board.height):
-                pixel_array[x, y] = Interface.BACKGROUND
+            blob = np.asarray(self.board.dropped_blob)
+            with_blob = blob != Board.MIN_BLOB
+            val = ((blob[with_blob] - Board.MIN_BLOB) / (Board.MAX_BLOB - Board.MIN_BLOB))[:, np.newaxis]
+            lower = np.array(Interface.BLOB_LOWER_COLOR, dtype=float)
+            higher = np.array(Interface.BLOB_HIGHER_COLOR, dtype=float)
+            colors[with_blob] = (higher - lower) * val + lower
 
-                if self.board.has_food(x, y):
-                    pixel_array[x, y] = Interface.FOOD_COLOR
+            if self.show_ants:
+                for scouter in self.blob.scouters:
+                    colors[scouter.x, scouter.y] = (255, 255, 255)
 
-                if self.board.is_touched(x, y):
-                    pixel_array[x, y] = Interface.TOUCHED_COLOR
+            game_surface = pygame.Surface((self.board.width, self.board.height))
+            pygame.surfarray.blit_array(game_surface, colors)
 
-                val = self.board.get_blob(x, y)
-                if val != Board.MIN_BLOB:
-                    val = (val - Board.MIN_BLOB) / (Board.MAX_BLOB - Board.MIN_BLOB)
-                    red = (Interface.BLOB_HIGHER_COLOR[0] - Interface.BLOB_LOWER_COLOR[0]) * val + \
-                          Interface.BLOB_LOWER_COLOR[0]
-                    green = (Interface.BLOB_HIGHER_COLOR[1] - Interface.BLOB_LOWER_COLOR[1]) * val + \
-                          Interface.BLOB_LOWER_COLOR[1]
-                    blue = (Interface.BLOB_HIGHER_COLOR[2] - Interface.BLOB_LOWER_COLOR[2]) * val + \
-                          Interface.BLOB_LOWER_COLOR[2]
-                    pixel_array[x, y] = (red, green, blue)
+            game_window = pygame.transform.scale(game_surface, (width, height))
 
-        if self.show_ants:
-            for scouter in self.blob.scouters:
-                pixel_array[scouter.x, scouter.y] = (255, 255, 255)
+            pygame.draw.line(game_window, Interface.BOARD_SEPARATOR, (0, height / 2), (width, height / 2))
 
-        del pixel_array
+            self.window_surface.blit(game_window, (0, 0))
+            for food in self.blob.knowledge['food']:
+                self.window_surface.blit(self.discovered_food, (food[0] * self.scale, food[1] * self.scale))
 
-        game_window = pygame.transform.scale(game_surface, (width, height))
-
-        pygame.draw.line(game_window, Interface.BOARD_SEPARATOR, (0, height / 2), (width, height / 2))
-
-        self.window_surface.blit(game_window, (0, 0))
-        for food in self.blob.knowledge['food']:
-            self.window_surface.blit(self.discovered_food, (food[0] * self.scale, food[1] * self.scale))
-
-        if not self.hidden:
-            self.window.blit(self.window_surface, (0, 0))
-            pygame.display.flip()
+            if not self.hidden:
+                self.window.blit(self.window_surface, (0, 0))
+                pygame.display.flip()
 
     def save(self, name=None):
         """
-        Store save files of the current state in given save directory
+        Store save files of the current state in given save directory, with a picture of the board
         :param name: name used to save file, if none, use timestamp
         """
-        if name is None:
-            name = datetime.datetime.fromtimestamp(time.time()).strftime('%Y-%m-%d_%H.%M.%S')
-
-        print("Data saved at " + name)
-        f = open(self.save_dir + name + ".board", 'w')
-        f.write(self.board.save())
-        f.close()
-
-        f = open(self.save_dir + name + ".blob.json", 'w')
-        f.write(self.blob.save())
-        f.close()
-
-        f = open(self.save_dir + name + ".player.json", 'w')
-        f.write(self.player.save())
-        f.close()
+        name = self.simulation.save(self.save_dir, name, self.binary_board)
 
         if self.hidden:
             self.draw()
-        pygame.image.save(self.window_surface, self.save_dir + name + ".jpg")
+        with Profiler.phase("save_image"):
+            pygame.image.save(self.window_surface, os.path.join(self.save_dir, name + ".jpg"))
 
         return name
 
@@ -18,6 +18,8 @@ import random
 import numpy as np
 
 from simulation.logic.sensing_scouter import SensingScouter
+from simulation.logic.summed_area import SummedArea
+from simulation.logic.unreachable_goals import UnreachableGoals
 
 
 class AdvancedScouter(SensingScouter):
@@ -30,7 +32,8 @@ class AdvancedScouter(SensingScouter):
         - See "SensingScouter" for remaining knowledge used
     """
 
-    def __init__(self, board, knowledge, x, y, use_diagonal=False, sightline=3, light_compute=True):
+    def __init__(self, board, knowledge, x, y, use_diagonal=False, sightline=3, light_compute=True,
+                 incremental=False):
         """
         :param board: A board class instance
         :param knowledge: a dict containing all blob knowledge and set up
@@ -39,8 +42,10 @@ class AdvancedScouter(SensingScouter):
         :param use_diagonal: boolean set to true if diagonal moves are available
         :param sightline: size of the ant sightline, used to compute goal decision
         :param light_compute: boolean set to true if path is computing only once and then memorized until reaching goal
+        :param incremental: boolean set to true if the ant keeps an incremental planner (see DStarLite) for its goal
+            and repairs it instead of searching again its path from scratch
         """
-        SensingScouter.__init__(self, board, knowledge, x, y, use_diagonal, sightline, light_compute)
+        SensingScouter.__init__(self, board, knowledge, x, y, use_diagonal, sightline, light_compute, incremental)
         self.state = 0
 
     def choose_goal(self):
@@ -66,21 +71,50 @@ class AdvancedScouter(SensingScouter):
 
     def choose_global_goal(self):
         """
-        Special goal based on minimizing the average blob seen by the ant (with respect to sight see)
+        Special goal based on minimizing the average blob seen by the ant (with respect to sight see),
+        using summed-area tables of the board (see SummedArea)
         :return:
         """
         x0, y0 = max(0, self.x - self.sightline), max(0, self.y - self.sightline)
         x1, y1 = min(self.board.width, self.x + self.sightline + 1), min(self.board.height, self.y + self.sightline + 1)
 
-        scores = np.zeros((x1 - x0, y1 - y0), dtype=float)
-        for x in range(x1 - x0):
-            for y in range(y1 - y0):
-                local_x0, local_y0 = max(x0, x0 + x - self.sightline), max(y0, y0 + y - self.sightline)
-                local_x1, local_y1 = min(x1, x0 + x + self.sightline + 1), min(y1, y0 + y + self.sightline + 1)
+        xs, ys = np.arange(x0, x1), np.arange(y0, y1)
+        local_x0 = np.maximum(x0, xs - self.sightline)[:, None]
+        local_x1 = np.minimum(x1, xs + self.sightline + 1)[:, None]
+        local_y0 = np.maximum(y0, ys - self.sightline)[None, :]
+        local_y1 = np.minimum(y1, ys + self.sightline + 1)[None, :]
 
-                scores[x, y] = np.sum(self.board.dropped_blob[local_x0:local_x1, local_y0:local_y1])
-                total_area = (y1-y0) * (x1-x0)
-                scores[x, y] = scores[x, y] / total_area
+        tables = SummedArea.of(self.board, x0, y0, x1, y1)
+        sums = tables.lookup(tables.sums, local_x0, local_y0, local_x1, local_y1)
+        counts = tables.lookup(tables.counts, local_x0, local_y0, local_x1, local_y1)
+
+        # Goals known as unreachable from the ant are never chosen
+        unreachable = [(x - x0, y - y0) for x, y in
+                       UnreachableGoals.of(self.board, self.costs, self.use_diagonal).from_square(self.x, self.y)
+                       if x0 <= x < x1 and y0 <= y < y1]
+        if len(unreachable) != 0:
+            sums = np.array(sums, dtype=float)
+            sums[tuple(np.transpose(unreachable))] = np.inf
+            if np.all(np.isinf(sums)):
+                return None
+
+        # Table sums may be rounded differently from the square by square sums, so windows close to the minimum
+        # are scored again as before to keep the same ties
+        window = self.board.dropped_blob[x0:x1, y0:y1]
+        tolerance = 2 * (tables.max_error + window.size * np.finfo(window.dtype).eps
+                         * float(np.sum(np.abs(window), dtype=float)))
+        candidates = (sums <= np.min(sums) + tolerance) & ~np.isinf(sums)
+
+        total_area = (y1-y0) * (x1-x0)
+        scores = np.full((x1 - x0, y1 - y0), np.inf)
+        scores[candidates & (counts == 0)] = 0
+        blob_sums = dict()  # Windows clipped by the sightline rectangle can be the same for several squares
+        for x, y in np.argwhere(candidates & (counts > 0)):
+            local = (local_x0[x, 0], local_x1[x, 0], local_y0[0, y], local_y1[0, y])
+            if local not in blob_sums:
+                blob_sums[local] = np.sum(self.board.dropped_blob[local[0]:local[1], local[2]:local[3]])
+            scores[x, y] = blob_sums[local]
+            scores[x, y] = scores[x, y] / total_area
 
         min_indices = np.where(scores == np.min(scores))
 
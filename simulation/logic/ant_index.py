@@ -0,0 +1,94 @@
+# Copyright (C) 2019 - UMons
+# 
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+# 
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+# 
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+
+class AntIndex:
+    """
+    Spatial index of ant objects: the board is split into square buckets and each bucket keeps the set of ants
+    standing in it. It has to be told about every ant added, removed or moved.
+    """
+
+    BUCKET_SIZE = 8  # Width and height of a bucket, in board squares
+
+    def __init__(self, bucket_size=BUCKET_SIZE):
+        """
+        :param bucket_size: width and height of a bucket, in board squares
+        """
+        self.bucket_size = bucket_size
+        self.buckets = dict()
+
+    def bucket(self, x, y):
+        """
+        :return: the key of the bucket containing (x, y) square
+        """
+        return x // self.bucket_size, y // self.bucket_size
+
+    def add(self, ant):
+        """
+        :param ant: an ant object with x and y attributes
+        """
+        self.buckets.setdefault(self.bucket(ant.x, ant.y), set()).add(ant)
+
+    def remove(self, ant, x=None, y=None):
+        """
+        :param ant: an indexed ant object
+        :param x: horizontal position where the ant was indexed if it has moved since then
+        :param y: vertical position where the ant was indexed if it has moved since then
+        """
+        key = self.bucket(ant.x if x is None else x, ant.y if y is None else y)
+        bucket = self.buckets[key]
+        bucket.discard(ant)
+        if len(bucket) == 0:
+            del self.buckets[key]
+
+    def moved(self, ant, old_x, old_y):
+        """
+        Update the index after an ant move
+        :param ant: an indexed ant object, at its new position
+        :param old_x: horizontal position of the ant before the move
+        :param old_y: vertical position of the ant before the move
+        """
+        if self.bucket(old_x, old_y) != self.bucket(ant.x, ant.y):
+            self.remove(ant, old_x, old_y)
+            self.add(ant)
+
+    def clear(self):
+        """
+        Remove all ants from the index
+        """
+        self.buckets = dict()
+
+    def in_region(self, x0, y0, x1, y1):
+        """
+        :param x0: the x coordinate of the up left corner of the region
+        :param y0: the y coordinate of the up left corner of the region
+        :param x1: the x coordinate following the bottom right corner of the region (excluded)
+        :param y1: the y coordinate following the bottom right corner of the region (excluded)
+        :return: the list of ants standing inside the region
+        """
+        ants = []
+        if x0 >= x1 or y0 >= y1:
+            return ants
+
+        bx0, by0 = self.bucket(x0, y0)
+        bx1, by1 = self.bucket(x1 - 1, y1 - 1)
+        for bx in range(bx0, bx1 + 1):
+            for by in range(by0, by1 + 1):
+                for ant in self.buckets.get((bx, by), ()):
+                    if x0 <= ant.x < x1 and y0 <= ant.y < y1:
+                        ants.append(ant)
+
+        return ants
@@ -0,0 +1,124 @@
+# Copyright (C) 2019 - UMons
+# 
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+# 
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+# 
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+import heapq
+import math
+import numpy as np
+
+
+class AStar:
+    """
+    Weighted grid A* working directly on a pathfinding matrix, with the same cost model as pathfinding library:
+    a square is walkable if the integer part of its weight is at least 1, entering it costs this weight
+    (multiplied by sqrt(2) for a diagonal move) and the heuristic is the manhattan distance without diagonal moves,
+    the octile distance otherwise.
+    """
+
+    SQRT2 = math.sqrt(2)
+    STRAIGHT_MOVES = ((0, -1, 1), (1, 0, 1), (0, 1, 1), (-1, 0, 1))
+    DIAGONAL_MOVES = ((-1, -1, SQRT2), (1, -1, SQRT2), (1, 1, SQRT2), (-1, 1, SQRT2))
+
+    def __init__(self, use_diagonal=False):
+        """
+        :param use_diagonal: boolean set to true if diagonal moves are available (even between two obstacles)
+        """
+        self.use_diagonal = use_diagonal
+        self.moves = AStar.STRAIGHT_MOVES + AStar.DIAGONAL_MOVES if use_diagonal else AStar.STRAIGHT_MOVES
+        self.runs = 0  # Number of squares expanded by the last search
+
+    def heuristic(self, dx, dy):
+        """
+        :param dx: absolute horizontal distance
+        :param dy: absolute vertical distance
+        :return: the estimated cost between two squares
+        """
+        if not self.use_diagonal:
+            return dx + dy
+        elif dx < dy:
+            return (AStar.SQRT2 - 1) * dx + dy
+        else:
+            return (AStar.SQRT2 - 1) * dy + dx
+
+    def find_path(self, matrix, start, end):
+        """
+        :param matrix: a pathfinding matrix, indexed by [y, x]
+        :param start: the x,y tuple coordinate of the start square
+        :param end: the x,y tuple coordinate of the end square
+        :return: the list of x,y tuple coordinates from start to end (both included), empty if end can't be reached
+            or is outside the matrix
+        """
+        height, width = np.shape(matrix)
+        # Numpy integers would make every step of the search much slower
+        start, end = (int(start[0]), int(start[1])), (int(end[0]), int(end[1]))
+        if not (0 <= end[0] < width and 0 <= end[1] < height):
+            self.runs = 0
+            return []
+
+        weights = np.asarray(matrix).astype(int).ravel().tolist()
+        start_index = start[1] * width + start[0]
+        end_index = end[1] * width + end[0]
+        end_x, end_y = end
+
+        self.runs = 0
+        if start_index == end_index:
+            return [tuple(start)]
+        if weights[end_index] < 1:
+            return []
+
+        g_scores = [math.inf] * (width * height)
+        parents = [-1] * (width * height)
+        closed = bytearray(width * height)
+        g_scores[start_index] = 0
+
+        # Entries are (f score, insertion order, flat index), outdated entries are skipped when popped
+        frontier = [(0, 0, start_index)]
+        pushed = 1
+        while len(frontier) > 0:
+            index = heapq.heappop(frontier)[2]
+            if closed[index]:
+                continue
+
+            closed[index] = 1
+            self.runs += 1
+            if index == end_index:
+                break
+
+            y, x = divmod(index, width)
+            g_score = g_scores[index]
+            for dx, dy, step in self.moves:
+                nx, ny = x + dx, y + dy
+                if 0 <= nx < width and 0 <= ny < height:
+                    neighbor = ny * width + nx
+                    weight = weights[neighbor]
+                    if weight >= 1 and not closed[neighbor]:
+                        score = g_score + step * weight
+                        if score < g_scores[neighbor]:
+                            g_scores[neighbor] = score
+                            parents[neighbor] = index
+                            f_score = score + self.heuristic(abs(nx - end_x), abs(ny - end_y))
+                            heapq.heappush(frontier, (f_score, pushed, neighbor))
+                            pushed += 1
+        else:
+            return []
+
+        path = []
+        index = end_index
+        while index != -1:
+            y, x = divmod(index, width)
+            path.append((x, y))
+            index = parents[index]
+        path.reverse()
+        return path
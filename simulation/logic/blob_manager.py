@@ -16,9 +16,20 @@
 
 import random
 import json
+import numpy as np
 
+from simulation.logic.ant_index import AntIndex
+from simulation.logic.colony import Colony
+from simulation.logic.dstar_lite import DStarLite
+from simulation.logic.flow_field import FlowField
 from simulation.logic.fsm_ant import FSMAnt
+from simulation.logic.food_registry import FoodRegistry
+from simulation.logic.planning_budget import PlanningBudget
+from simulation.logic.gatherer import Gatherer
+from simulation.logic.sensing_scouter import SensingScouter
+from simulation.logic.unreachable_goals import UnreachableGoals
 from simulation.board import Board
+from simulation.profiler import Profiler
 
 
 class BlobManager:
@@ -26,12 +37,15 @@ class BlobManager:
     Top-level class to manage blob and therefore ants colony numbering and moving, manage also foods known
     Knowledge used:
         - ["max_scouters"] to keep in memory maximum number of scouters
-        - ["food"] for known food positions
+        - ["food"] for known food positions (see FoodRegistry)
         - ["Global Decrease"] to globally decrease blob on every board square
         - ["Remaining Blob on Food"] to set a minimum blob value to keep on food sqaure
         - ["Computing"] values : ["Blob Size Factor"]["Covering Factor"]["Known Foods Factor"]["Global Factor"]
             as different factors to compute maximum scouters number
         - ["Scouters"]["Min"] to ensure blob keeps a minimal number of scouters
+        - ["Planning"]["Max Searches"]["Max Milliseconds"] (optional, 0 for no limit) to bound path searches done
+            in a loop, ants without search left wait for the next loop (see PlanningBudget)
+        - ["planning_budget"] for the path searches budget shared by ants
         - See "FSMAnt" class for remaining knowledge used
     """
 
@@ -42,50 +56,211 @@ class BlobManager:
         """
         self.board = board
         self.knowledge = dict()
-        self.scouters = []
+        self.scouters = self.new_colony()
+        self.ants_index = AntIndex()  # Spatial index of the ant objects in self.scouters
+        self.spawn_weights = None  # Cached (board version, touched squares, cumulated weights) used to spawn ants
 
         with open(knowledge, 'r') as file:
             self.knowledge.update(json.load(file))
 
-        self.knowledge['food'] = []
-        for x in range(self.board.width):
-            for y in range(self.board.height):
-                if self.board.has_food(x, y) and self.board.is_touched(x, y):
-                    self.knowledge['food'].append((x, y))
+        self.knowledge['food'] = FoodRegistry(
+            (x, y) for x, y in np.argwhere((self.board.foods > 0) & self.board.touched).tolist())
+        planning = self.knowledge.get("Planning", {})
+        self.knowledge['planning_budget'] = PlanningBudget(planning.get("Max Searches", 0),
+                                                           planning.get("Max Milliseconds", 0))
 
         # TODO Refactor ['max_scouters'] as ['Scouters']['Max'] for consistency with minimum scouters
         self.knowledge['max_scouters'] = self.compute_max_scouters()
-        while len(self.scouters) < self.knowledge['max_scouters']:
-            self.add_scouter()
+        self.add_scouters(self.knowledge['max_scouters'] - len(self.scouters))
 
         print("Scouters: " + str(len(self.scouters)))
 
+    def new_colony(self):
+        """
+        :return: an empty container for the colony ants
+        """
+        return []
+
     def save(self):
         """
-        Return a json structure to save all knowledge (except food and max_scouters which are computed on the fly)
+        Return a json structure to save all knowledge
+        (except food, max_scouters and planning_budget which are computed on the fly)
         """
         d = self.knowledge.copy()
         del d["food"]
         del d["max_scouters"]
+        del d["planning_budget"]
         return json.dumps(d, indent=4, sort_keys=True)
 
+    def colony_state(self):
+        """
+        :return: a dict of arrays with the state of every ant (including its incremental planners)
+            and of the knowledge computed on the fly, restored with restore_colony
+        """
+        state = {'x': [], 'y': [], 'stored': [], 'starving': [], 'state': []}
+        planners = {"gathering_": [], "scouting_": []}
+        for prefix in planners:
+            state.update({prefix + 'goal_x': [], prefix + 'goal_y': [], prefix + 'path_len': [], prefix + 'paths': [],
+                          prefix + 'denied': [], prefix + 'planner': []})
+
+        denied = self.knowledge['planning_budget'].denied
+        for scouter in self.scouters:
+            state['x'].append(scouter.x)
+            state['y'].append(scouter.y)
+            state['stored'].append(scouter.stored)
+            state['starving'].append(scouter.starving)
+            state['state'].append(scouter.scouting_logic.state)
+            for prefix, logic in (("gathering_", scouter.gatherer_logic), ("scouting_", scouter.scouting_logic)):
+                goal = logic.goal if logic.goal is not None else (Colony.NO_GOAL, Colony.NO_GOAL)
+                state[prefix + 'goal_x'].append(goal[0])
+                state[prefix + 'goal_y'].append(goal[1])
+                state[prefix + 'path_len'].append(len(logic.path))
+                state[prefix + 'paths'].extend(logic.path)
+                state[prefix + 'denied'].append(logic in denied)
+                state[prefix + 'planner'].append(logic.planner is not None)
+                if logic.planner is not None:
+                    planners[prefix].append(logic.planner)
+
+        state = {key: np.array(values, dtype=float if key == 'stored' else int) for key, values in state.items()}
+        for prefix in planners:
+            state[prefix + 'paths'] = state[prefix + 'paths'].reshape(-1, 2)
+            state.update({prefix + key: value for key, value in DStarLite.pack(planners[prefix]).items()})
+        return self.knowledge_state(state)
+
+    def knowledge_state(self, state):
+        """
+        Add to a colony state the knowledge computed on the fly: known foods, max_scouters, unreachable goals
+        and the flow field of gatherers
+        :param state: a dict of arrays
+        :return: the same dict
+        """
+        state['foods'] = self.knowledge['food'].to_array()
+        state['max_scouters'] = np.array(self.knowledge['max_scouters'])
+        gathering, scouting = self.unreachable_goals()
+        state['gathering_unreachable'] = gathering.to_array()
+        state['scouting_unreachable'] = scouting.to_array()
+
+        use_diagonal = self.knowledge["Gathering"]["Diagonal Moves"]
+        field = FlowField.existing(self.knowledge['food'], Gatherer.costs, use_diagonal)
+        if field is not None and field.weights is not None:
+            for key, value in field.to_arrays(self.board, self.knowledge['food']).items():
+                state['flow_' + key] = value
+        return state
+
+    def restore_colony(self, state):
+        """
+        Replace the colony and the knowledge computed on the fly by the ones of a colony state
+        :param state: a dict of arrays given by colony_state
+        """
+        self.scouters = self.new_colony()
+        self.ants_index.clear()
+        starts = {prefix: 0 for prefix in ("gathering_", "scouting_")}
+        planners = self.restore_planners(state)
+        for i in range(len(state['x'])):
+            scouter = FSMAnt(self.board, self.knowledge, int(state['x'][i]), int(state['y'][i]))
+            scouter.stored = float(state['stored'][i])
+            scouter.starving = bool(state['starving'][i])
+            scouter.scouting_logic.state = int(state['state'][i])
+            for prefix, logic in (("gathering_", scouter.gatherer_logic), ("scouting_", scouter.scouting_logic)):
+                logic.x, logic.y = scouter.x, scouter.y
+                if state[prefix + 'goal_x'][i] != Colony.NO_GOAL:
+                    logic.goal = (int(state[prefix + 'goal_x'][i]), int(state[prefix + 'goal_y'][i]))
+                end = starts[prefix] + int(state[prefix + 'path_len'][i])
+                logic.path = [tuple(step) for step in state[prefix + 'paths'][starts[prefix]:end].tolist()]
+                starts[prefix] = end
+                if state[prefix + 'denied'][i]:
+                    self.knowledge['planning_budget'].denied.add(logic)
+                if prefix + 'planner' in state and state[prefix + 'planner'][i]:
+                    logic.planner = planners[prefix].pop(0)
+
+            self.scouters.append(scouter)
+            self.ants_index.add(scouter)
+
+        self.restore_knowledge(state)
+
+    def restore_planners(self, state):
+        """
+        :param state: a dict of arrays given by colony_state
+        :return: the lists of incremental planners saved for gathering and for scouting, by prefix of their arrays
+            (empty for states saved without planners)
+        """
+        planners = dict()
+        for prefix, costs, knowledge in (("gathering_", Gatherer.costs, self.knowledge["Gathering"]),
+                                         ("scouting_", SensingScouter.costs, self.knowledge["Scouting"])):
+            packed = {key: state[prefix + key] for key in ('planners', 'planner_lengths') if prefix + key in state}
+            planners[prefix] = DStarLite.unpack(packed, self.board, costs, knowledge["Diagonal Moves"]) \
+                if len(packed) > 0 else []
+        return planners
+
+    def restore_knowledge(self, state):
+        """
+        Replace the knowledge computed on the fly by the one of a colony state
+        :param state: a dict of arrays given by colony_state
+        """
+        self.knowledge['food'] = FoodRegistry(state['foods'].tolist())
+        self.knowledge['max_scouters'] = int(state['max_scouters'])
+        gathering, scouting = self.unreachable_goals()
+        gathering.restore(state['gathering_unreachable'])
+        scouting.restore(state['scouting_unreachable'])
+
+        # Foods found or eaten only update the field, which depends on the squares weights of its last computation
+        if 'flow_weights' in state:
+            use_diagonal = self.knowledge["Gathering"]["Diagonal Moves"]
+            field = FlowField(Gatherer.costs, use_diagonal)
+            field.restore({key[len('flow_'):]: value for key, value in state.items() if key.startswith('flow_')},
+                          self.board, self.knowledge['food'])
+            FlowField.FIELDS.setdefault(self.knowledge['food'], dict())[(Gatherer.costs, use_diagonal)] = field
+
+    def unreachable_goals(self):
+        """
+        :return: the unreachable goals shared by gathering ants and the ones shared by scouting ants
+        """
+        return (UnreachableGoals.of(self.board, Gatherer.costs, self.knowledge["Gathering"]["Diagonal Moves"]),
+                UnreachableGoals.of(self.board, SensingScouter.costs, self.knowledge["Scouting"]["Diagonal Moves"]))
+
     def move(self):
         """
         Update all ants position, remove possible trapped ants and remove or add ants based on max_scouters capability
         Finally decrease blob all over the board
         """
+        budget = self.knowledge['planning_budget']
+        budget.new_tick()
         deads = []
-        for scouter in self.scouters:
+        for scouter in budget.prioritized(self.scouters,
+                                          lambda ant: ant.gatherer_logic if ant.starving else ant.scouting_logic):
             old = (scouter.x, scouter.y)
-            scouter.move()
-            if old == (scouter.x, scouter.y):
+            with Profiler.phase("move_gathering" if scouter.starving else "move_scouting"):
+                scouter.move()
+            if scouter.waiting:
+                continue  # Not trapped, only waiting for a path search
+            elif old == (scouter.x, scouter.y):
                 deads.append(scouter)
             else:
-                if self.board.has_food(scouter.x, scouter.y) and (scouter.x, scouter.y) not in self.knowledge['food']:
-                    self.food_discovered(scouter.x, scouter.y)
+                self.ants_index.moved(scouter, old[0], old[1])
+                with Profiler.phase("food_discovery"):
+                    if self.board.has_food(scouter.x, scouter.y) \
+                            and (scouter.x, scouter.y) not in self.knowledge['food']:
+                        self.food_discovered(scouter.x, scouter.y)
+
+                with Profiler.phase("update"):
+                    scouter.update()
+
+        with Profiler.phase("max_scouters"):
+            self.update_max_scouters()
+
+        with Profiler.phase("respawn"):
+            for dead in deads:
+                self.scouters.remove(dead)
+                self.ants_index.remove(dead)
+                self.add_scouter()
 
-                scouter.update()
+        with Profiler.phase("manage_blob"):
+            self.board.manage_blob(self.knowledge["Global Decrease"], self.knowledge["Remaining Blob on Food"])
 
+    def update_max_scouters(self):
+        """
+        Compute again max_scouters and add or remove ants to reach it
+        """
         new_max = self.compute_max_scouters()
         if new_max != self.knowledge['max_scouters']:
             print("Scouters: " + str(new_max))
@@ -95,39 +270,48 @@ class BlobManager:
         diff = self.knowledge['max_scouters'] - scouters_qt
 
         if diff > 0:
-            for _ in range(diff):
-                self.add_scouter()
+            self.add_scouters(diff)
 
         elif diff < 0:
             for _ in range(-diff):
                 self.remove_scouter()
 
-        for dead in deads:
-            self.scouters.remove(dead)
-            self.add_scouter()
-
-        self.board.manage_blob(self.knowledge["Global Decrease"], self.knowledge["Remaining Blob on Food"])
-
     def add_scouter(self):
         """
         Add a new scouter inside blob squares except if max has already been reached
         """
         if len(self.scouters) < self.knowledge['max_scouters']:
-            if len(self.knowledge['food']) != 0:
-                index = random.randrange(len(self.knowledge['food']))
-                (x, y) = self.knowledge['food'][index]
-            else:
-                x, y = self.find_blob_square()
-
-            self.scouters.append(FSMAnt(self.board, self.knowledge, x, y))
+            x, y = self.choose_spawn_square()
+            scouter = FSMAnt(self.board, self.knowledge, x, y)
+            self.scouters.append(scouter)
+            self.ants_index.add(scouter)
         else:
             print("Max scouters already reached !")
 
+    def add_scouters(self, count):
+        """
+        Add new scouters one after the other (see add_scouter)
+        :param count: number of scouters to add
+        """
+        for _ in range(count):
+            self.add_scouter()
+
+    def choose_spawn_square(self):
+        """
+        :return: a random known food position or, if no food is known, a random blob square
+        """
+        if len(self.knowledge['food']) != 0:
+            index = random.randrange(len(self.knowledge['food']))
+            return self.knowledge['food'][index]
+        else:
+            return self.find_blob_square()
+
     def remove_scouter(self):
         """
         Remove randomly a scouter
         """
         nbr = random.randrange(len(self.scouters))
+        self.ants_index.remove(self.scouters[nbr])
         del self.scouters[nbr]
 
     def compute_max_scouters(self):
@@ -147,26 +331,21 @@ class BlobManager:
         Return a random position where there is blob.
         Random selection is weighted with blob quantity on each square
         """
-        availables = []
-        total_blob = 0
-        for x in range(self.board.width):
-            for y in range(self.board.height):
-                if self.board.is_touched(x, y):
-                    qt = self.board.get_blob(x, y) + 1
-                    total_blob += qt
-                    availables.append(((x, y), qt))
-
-        if len(availables) == 0:
+        # Weights are computed again only when board has changed since last call
+        if self.spawn_weights is None or self.spawn_weights[0] != self.board.version:
+            squares = np.flatnonzero(self.board.touched)
+            weights = np.cumsum(self.board.dropped_blob.ravel()[squares] + 1, dtype=float)
+            self.spawn_weights = (self.board.version, squares, weights)
+
+        version, squares, weights = self.spawn_weights
+        if len(squares) == 0:
             return 0, 0
 
         # Random need cast to integer
         # Floor cast will make sure a solution is found
-        index_pond = random.randrange(int(total_blob))
-        acc = 0
-        for square, qt in availables:
-            acc += qt
-            if acc >= index_pond:
-                return square
+        index_pond = random.randrange(int(weights[-1]))
+        index = int(np.searchsorted(weights, index_pond))
+        return divmod(int(squares[index]), self.board.height)
 
     def reset(self, x, y):
         """
@@ -174,14 +353,51 @@ class BlobManager:
         :param x: current horizontal position to reset
         :param y: current vertical position to reset
         """
-        for scouter in self.scouters.copy():
-            if scouter.x == x and scouter.y == y:
-                self.scouters.remove(scouter)
+        self.reset_region(x, y, x + 1, y + 1)
+
+    def reset_region(self, x0, y0, x1, y1):
+        """
+        Reset all information and potential ants inside a rectangle region
+        :param x0: the x coordinate of the up left corner of the region
+        :param y0: the y coordinate of the up left corner of the region
+        :param x1: the x coordinate following the bottom right corner of the region (excluded)
+        :param y1: the y coordinate following the bottom right corner of the region (excluded)
+        """
+        removed = set(self.ants_index.in_region(x0, y0, x1, y1))
+        if len(removed) != 0:
+            for scouter in removed:
+                self.ants_index.remove(scouter)
+            self.scouters = [scouter for scouter in self.scouters if scouter not in removed]
+
+        self.forget_foods(x0, y0, x1, y1)
+
+    def forget_foods(self, x0, y0, x1, y1):
+        """
+        Remove foods inside a rectangle region from the blob knowledge
+        :param x0: the x coordinate of the up left corner of the region
+        :param y0: the y coordinate of the up left corner of the region
+        :param x1: the x coordinate following the bottom right corner of the region (excluded)
+        :param y1: the y coordinate following the bottom right corner of the region (excluded)
+        """
+        if (x1 - x0) * (y1 - y0) <= len(self.knowledge['food']):
+            for x in range(x0, x1):
+                for y in range(y0, y1):
+                    self.forget_food(x, y)
+        else:
+            # Same order as the square by square scan, as it changes the food registry order
+            for x, y in sorted(square for square in self.knowledge['food']
+                               if x0 <= square[0] < x1 and y0 <= square[1] < y1):
+                self.forget_food(x, y)
 
-        for food in self.knowledge['food'].copy():
-            if food == (x, y):
-                self.knowledge['food'].remove(food)
-                self.knowledge['max_scouters'] -= 1
+    def forget_food(self, x, y):
+        """
+        Remove a food from the blob knowledge when its square is reset
+        :param x: horizontal position of the reset square
+        :param y: vertical position of the reset square
+        """
+        if (x, y) in self.knowledge['food']:
+            self.knowledge['food'].remove((x, y))
+            self.knowledge['max_scouters'] -= 1
 
     def food_discovered(self, x, y):
         """
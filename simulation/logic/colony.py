@@ -0,0 +1,155 @@
+# Copyright (C) 2019 - UMons
+# 
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+# 
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+# 
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+from collections import namedtuple
+import numpy as np
+
+AntPosition = namedtuple('AntPosition', ['x', 'y'])
+
+
+class Colony:
+    """
+    Ants colony stored as a structure of arrays, one entry per ant:
+        - ids: unique number of each ant
+        - x, y: current positions
+        - stored: food stored by each ant
+        - starving: True if the ant is gathering food, False if it is scouting
+        - state: scouting state (see AdvancedScouter), 0 for local search and 1 for global search
+        - goal_x, goal_y: current goal or Colony.NO_GOAL
+        - path_start, path_len, path_pos: path of each ant inside the shared paths buffer and cursor on next move
+    """
+
+    NO_GOAL = -1
+    FIELDS = {'ids': np.int64, 'x': int, 'y': int, 'stored': float, 'starving': bool, 'state': np.int8,
+              'goal_x': int, 'goal_y': int, 'path_start': int, 'path_len': int, 'path_pos': int}
+
+    def __init__(self):
+        for field, dtype in Colony.FIELDS.items():
+            setattr(self, field, np.zeros(0, dtype=dtype))
+
+        self.paths = np.zeros((0, 2), dtype=int)
+        self.next_id = 0
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        """
+        Iterate over ants positions, as it is done with a list of ant objects
+        """
+        for x, y in zip(self.x.tolist(), self.y.tolist()):
+            yield AntPosition(x, y)
+
+    def __delitem__(self, index):
+        """
+        Remove the ant at the given index
+        """
+        kept = np.ones(len(self), dtype=bool)
+        kept[index] = False
+        self.keep(kept)
+
+    def add(self, x, y, stored):
+        """
+        Add a new scouting ant without goal
+        :param x: horizontal position of the new ant
+        :param y: vertical position of the new ant
+        :param stored: food stored by the new ant
+        """
+        self.add_many([x], [y], stored)
+
+    def add_many(self, xs, ys, stored):
+        """
+        Batched version of add: arrays are extended once for all new ants
+        :param xs: array of horizontal positions of the new ants
+        :param ys: array of vertical positions of the new ants
+        :param stored: array of food stored by each new ant (or a single value for all of them)
+        """
+        count = len(xs)
+        values = {'ids': np.arange(self.next_id, self.next_id + count), 'x': xs, 'y': ys, 'stored': stored,
+                  'starving': False, 'state': 0, 'goal_x': Colony.NO_GOAL, 'goal_y': Colony.NO_GOAL,
+                  'path_start': 0, 'path_len': 0, 'path_pos': 0}
+        for field, dtype in Colony.FIELDS.items():
+            added = np.broadcast_to(np.asarray(values[field], dtype=dtype), (count,))
+            setattr(self, field, np.concatenate((getattr(self, field), added)))
+
+        self.next_id += count
+
+    def keep(self, kept):
+        """
+        Keep only some ants
+        :param kept: a boolean array set to True for ants to keep
+        """
+        for field in Colony.FIELDS:
+            setattr(self, field, getattr(self, field)[kept])
+
+    def has_goal(self):
+        """
+        :return: a boolean array set to True for ants having a goal
+        """
+        return self.goal_x != Colony.NO_GOAL
+
+    def remaining(self):
+        """
+        :return: an array with the number of moves left on each ant path
+        """
+        return self.path_len - self.path_pos
+
+    def clear_goals(self, ants):
+        """
+        Forget goal and path of some ants
+        :param ants: a boolean array (or indices) of ants to modify
+        """
+        self.goal_x[ants] = Colony.NO_GOAL
+        self.goal_y[ants] = Colony.NO_GOAL
+        self.path_len[ants] = 0
+        self.path_pos[ants] = 0
+
+    def set_path(self, index, path):
+        """
+        Store a new path for an ant
+        :param index: the index of the ant
+        :param path: a list of (x, y) positions, next move first
+        """
+        if len(self.paths) > 4 * (np.sum(self.remaining()) + len(path)) + 1024:
+            self.compact_paths()
+
+        self.path_start[index] = len(self.paths)
+        self.path_len[index] = len(path)
+        self.path_pos[index] = 0
+        self.paths = np.concatenate((self.paths, np.array(path, dtype=int).reshape(-1, 2)))
+
+    def compact_paths(self):
+        """
+        Rebuild the paths buffer with only the moves left on each ant path
+        """
+        remaining = self.remaining()
+        parts = [self.paths[start:start + length] for start, length
+                 in zip((self.path_start + self.path_pos).tolist(), remaining.tolist())]
+
+        self.path_start = np.cumsum(remaining) - remaining
+        self.path_len = remaining
+        self.path_pos = np.zeros(len(self), dtype=int)
+        self.paths = np.concatenate(parts).reshape(-1, 2) if len(parts) != 0 else np.zeros((0, 2), dtype=int)
+
+    def step(self, ants):
+        """
+        Move some ants by one square along their paths
+        :param ants: a boolean array of ants to move, they must have moves left on their paths
+        """
+        moves = self.paths[self.path_start[ants] + self.path_pos[ants]]
+        self.x[ants] = moves[:, 0]
+        self.y[ants] = moves[:, 1]
+        self.path_pos[ants] += 1
@@ -0,0 +1,327 @@
+# Copyright (C) 2019 - UMons
+# 
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+# 
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+# 
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+import random
+import numpy as np
+
+from simulation.board import Board
+from simulation.logic.blob_manager import BlobManager
+from simulation.logic.colony import Colony
+from simulation.logic.dstar_lite import DStarLite
+from simulation.logic.gatherer import Gatherer
+from simulation.logic.advanced_scouter import AdvancedScouter
+from simulation.profiler import Profiler
+
+
+class ColonyManager(BlobManager):
+    """
+    BlobManager engine keeping the ants colony in arrays (see Colony) instead of FSMAnt objects.
+    Ants follow the FSMAnt logic but moves along paths, food discovery, blob dropping, food eating and state changes
+    are done for the whole colony at once. Goals and paths are still chosen ant by ant, through one Gatherer and one
+    AdvancedScouter shared by all ants.
+    As ants update the board together, an ant does not see the blob dropped by the other ants during the same loop.
+    Knowledge used: same as BlobManager and FSMAnt
+    """
+
+    def __init__(self, board, knowledge):
+        """
+        :param board: A board class instance
+        :param knowledge: A json file with all knowledge used for blob managing
+        """
+        # Shared logic is created with the first ant, once knowledge is loaded
+        self.gatherer_logic = None
+        self.scouting_logic = None
+        self.planners = dict()  # Incremental planners of ants, by ant id and starving state
+
+        BlobManager.__init__(self, board, knowledge)
+
+    def new_colony(self):
+        """
+        :return: an empty colony of ants stored as arrays
+        """
+        return Colony()
+
+    def shared_logic(self):
+        """
+        Create (only once) the gathering and scouting logic used in turn by every ant
+        """
+        if self.gatherer_logic is None:
+            self.gatherer_logic = Gatherer(self.board, self.knowledge, 0, 0,
+                                           self.knowledge["Gathering"]["Diagonal Moves"],
+                                           self.knowledge["Gathering"]["Sightline"],
+                                           self.knowledge["Gathering"]["Light Compute"],
+                                           self.knowledge["Gathering"].get("Flow Field", False),
+                                           self.knowledge["Gathering"].get("Incremental Planning", False),
+                                           self.knowledge["Gathering"].get("Hierarchical Tile Size", 0),
+                                           self.knowledge["Gathering"].get("Hierarchical Quality", 1))
+            self.scouting_logic = AdvancedScouter(self.board, self.knowledge, 0, 0,
+                                                  self.knowledge["Scouting"]["Diagonal Moves"],
+                                                  self.knowledge["Scouting"]["Sightline"],
+                                                  self.knowledge["Scouting"]["Light Compute"],
+                                                  self.knowledge["Scouting"].get("Incremental Planning", False))
+
+    def colony_state(self):
+        """
+        :return: a dict of arrays with the colony arrays, the incremental planners of ants and the knowledge
+            computed on the fly, restored with restore_colony
+        """
+        colony = self.scouters
+        state = {field: getattr(colony, field).copy() for field in Colony.FIELDS}
+        state['paths'] = colony.paths.copy()
+        state['next_id'] = np.array(colony.next_id)
+        state['planning_denied'] = np.array(sorted(self.knowledge['planning_budget'].denied), dtype=np.int64)
+        for prefix, starving in (("gathering_", True), ("scouting_", False)):
+            keys = sorted(key for key in self.planners if key[1] == starving)
+            state[prefix + 'planner_ids'] = np.array([key[0] for key in keys], dtype=np.int64)
+            state.update({prefix + key: value
+                          for key, value in DStarLite.pack([self.planners[key] for key in keys]).items()})
+        return self.knowledge_state(state)
+
+    def restore_colony(self, state):
+        """
+        Replace the colony and the knowledge computed on the fly by the ones of a colony state
+        :param state: a dict of arrays given by colony_state
+        """
+        colony = self.new_colony()
+        for field, dtype in Colony.FIELDS.items():
+            setattr(colony, field, state[field].astype(dtype))
+        colony.paths = state['paths'].astype(int).reshape(-1, 2)
+        colony.next_id = int(state['next_id'])
+        self.scouters = colony
+        self.planners = dict()
+        for prefix, planners in self.restore_planners(state).items():
+            ids = state[prefix + 'planner_ids'].tolist() if len(planners) > 0 else []
+            self.planners.update({(ant_id, prefix == "gathering_"): planner for ant_id, planner in zip(ids, planners)})
+        self.knowledge['planning_budget'].denied = set(state['planning_denied'].tolist())
+        self.restore_knowledge(state)
+
+    def add_scouter(self):
+        """
+        Add a new scouter inside blob squares except if max has already been reached
+        """
+        if len(self.scouters) < self.knowledge['max_scouters']:
+            x, y = self.choose_spawn_square()
+            self.scouters.add(x, y, self.knowledge["Harvesting"]["Min"])
+        else:
+            print("Max scouters already reached !")
+
+    def add_scouters(self, count):
+        """
+        Add new scouters inside blob squares except beyond max_scouters, colony arrays being extended only once
+        :param count: number of scouters to add
+        """
+        added = max(0, min(count, self.knowledge['max_scouters'] - len(self.scouters)))
+        squares = [self.choose_spawn_square() for _ in range(added)]
+        if added > 0:
+            xs, ys = zip(*squares)
+            self.scouters.add_many(xs, ys, self.knowledge["Harvesting"]["Min"])
+        for _ in range(count - added):
+            print("Max scouters already reached !")
+
+    def remove_scouter(self):
+        """
+        Remove randomly a scouter
+        """
+        nbr = random.randrange(len(self.scouters))
+        del self.scouters[nbr]
+
+    def move(self):
+        """
+        Update all ants position, remove possible trapped ants and remove or add ants based on max_scouters capability
+        Finally decrease blob all over the board
+        """
+        colony = self.scouters
+        old_x, old_y = colony.x.copy(), colony.y.copy()
+
+        self.knowledge['planning_budget'].new_tick()
+        waiting = self.move_colony()
+        moved = (colony.x != old_x) | (colony.y != old_y)
+
+        # Discover foods in the ants order
+        with Profiler.phase("food_discovery"):
+            on_food = moved & (self.board.foods[colony.x, colony.y] > 0)
+            for x, y in zip(colony.x[on_food].tolist(), colony.y[on_food].tolist()):
+                if (x, y) not in self.knowledge['food']:
+                    self.food_discovered(x, y)
+
+        with Profiler.phase("update"):
+            self.update_colony(moved)
+        deads = colony.ids[~moved & ~waiting]
+
+        with Profiler.phase("max_scouters"):
+            self.update_max_scouters()
+
+        with Profiler.phase("respawn"):
+            alive = ~np.isin(colony.ids, deads)
+            respawns = len(colony) - np.count_nonzero(alive)
+            colony.keep(alive)
+            self.forget_planners()
+            self.add_scouters(respawns)
+
+        with Profiler.phase("manage_blob"):
+            self.board.manage_blob(self.knowledge["Global Decrease"], self.knowledge["Remaining Blob on Food"])
+
+    def forget_planners(self):
+        """
+        Drop incremental planners of ants no longer in the colony
+        """
+        if len(self.planners) != 0:
+            ids = set(self.scouters.ids.tolist())
+            self.planners = {key: planner for key, planner in self.planners.items() if key[0] in ids}
+
+    def move_colony(self):
+        """
+        Choose goals and paths of ants needing one and move all ants having a path by one square
+        Gatherers following the flow field move toward the nearest known food without goal nor path
+        :return: a boolean array set to True for ants waiting for a path search (see PlanningBudget)
+        """
+        self.shared_logic()
+        colony = self.scouters
+        flow = colony.starving & self.gatherer_logic.flow_field
+
+        # Scouters stepping on food search locally (see AdvancedScouter.move)
+        if self.knowledge["Scouting"]["Search Locally on Food"]:
+            on_food = self.board.foods[colony.x, colony.y] > 0
+            local = ~colony.starving & on_food & (colony.state == 1)
+            colony.clear_goals(local)
+            colony.state[local] = 0
+
+        # Gatherers aiming a food no longer known need a new goal (see Gatherer.move)
+        known = np.zeros((self.board.width, self.board.height), dtype=bool)
+        foods = self.knowledge['food'].to_array()
+        known[foods[:, 0], foods[:, 1]] = True
+        lost = colony.starving & colony.has_goal()
+        lost[lost] = ~known[colony.goal_x[lost], colony.goal_y[lost]]
+        colony.clear_goals(lost)
+
+        # Local goals of all scouters are searched at once, then drawn in turn (see SensingScouter.choose_goal)
+        choosing = np.flatnonzero(~colony.has_goal() & ~flow)
+        scouting = choosing[~colony.starving[choosing]]
+        with Profiler.phase("move_scouting"):
+            squares = self.scouting_logic.minimal_squares(colony.x[scouting], colony.y[scouting])
+        batch_index = 0
+        for i in choosing.tolist():
+            logic = self.gatherer_logic if colony.starving[i] else self.scouting_logic
+            logic.x, logic.y = int(colony.x[i]), int(colony.y[i])
+            if not colony.starving[i]:
+                logic.state = int(colony.state[i])
+                logic.batch = squares + (batch_index,)
+                batch_index += 1
+
+            with Profiler.phase("move_gathering" if colony.starving[i] else "move_scouting"):
+                goal = logic.choose_goal()
+
+            if not colony.starving[i]:
+                colony.state[i] = logic.state
+            if goal is not None:
+                colony.goal_x[i], colony.goal_y[i] = goal
+        self.scouting_logic.batch = None
+
+        light_compute = np.where(colony.starving, self.knowledge["Gathering"]["Light Compute"],
+                                 self.knowledge["Scouting"]["Light Compute"])
+        remaining = colony.remaining()
+        planning = colony.has_goal() & ((remaining == 0) | ~light_compute)
+        waiting = np.zeros(len(colony), dtype=bool)
+        budget = self.knowledge['planning_budget']
+        for i in budget.prioritized(np.flatnonzero(planning).tolist(), lambda ant: int(colony.ids[ant])):
+            logic = self.gatherer_logic if colony.starving[i] else self.scouting_logic
+            logic.x, logic.y = int(colony.x[i]), int(colony.y[i])
+            logic.goal = (int(colony.goal_x[i]), int(colony.goal_y[i]))
+            planner_key = (int(colony.ids[i]), bool(colony.starving[i]))
+            logic.planner = self.planners.get(planner_key)
+            with Profiler.phase("move_gathering" if colony.starving[i] else "move_scouting"):
+                searched = budget.search(int(colony.ids[i]), logic.best_way_to)
+            if not searched:
+                # No search left in this tick: follow the previous path or wait for the next tick
+                waiting[i] = remaining[i] == 0
+                continue
+            if logic.planner is not None:
+                self.planners[planner_key] = logic.planner
+
+            # No path found, search another goal next time
+            if len(logic.path) == 0:
+                logic.give_up_goal()
+                colony.clear_goals(i)
+            else:
+                colony.set_path(i, logic.path)
+
+        moving = colony.has_goal() & (colony.remaining() > 0)
+        colony.step(moving)
+
+        reached = moving & (colony.x == colony.goal_x) & (colony.y == colony.goal_y)
+        colony.clear_goals(reached)
+
+        if np.any(flow) and len(self.knowledge['food']) != 0:
+            with Profiler.phase("move_gathering"):
+                colony.x[flow], colony.y[flow] = self.gatherer_logic.get_flow_field().next_steps(colony.x[flow],
+                                                                                              colony.y[flow])
+        return waiting
+
+    def update_colony(self, ants):
+        """
+        Update squares where ants are, eat used values, collect food and update FSM states (see FSMAnt.update)
+        :param ants: a boolean array set to True for ants to update
+        """
+        colony = self.scouters
+        indices = np.flatnonzero(ants)
+        xs, ys = colony.x[indices], colony.y[indices]
+        harvesting = self.knowledge["Harvesting"]
+
+        # Update squares and eat used values
+        eat_ratio = harvesting["Eat"] * (Board.MAX_BLOB - self.board.dropped_blob[xs, ys]) / Board.MAX_BLOB
+        self.board.update_blob_many(xs, ys, self.knowledge["Scouters"]["Drop by eat"] * eat_ratio)
+
+        starving = colony.starving[indices]
+        stored = colony.stored[indices]
+        stored[~starving] = np.maximum(0, stored[~starving] - eat_ratio[~starving])
+
+        # Collect food if squares have any
+        eating = self.board.foods[xs, ys] > 0
+        if np.any(eating):
+            if len(self.knowledge['food']) == 1:
+                wanted = np.minimum(harvesting["Min"], harvesting["Max"] - stored[eating])
+            else:
+                wanted = np.minimum(harvesting["Collect"], harvesting["Max"] - stored[eating])
+
+            received, finished = self.board.eat_food_many(xs[eating], ys[eating], wanted)
+            stored[eating] += received
+
+            for square in dict.fromkeys(zip(xs[eating][finished].tolist(), ys[eating][finished].tolist())):
+                if square in self.knowledge['food']:
+                    self.knowledge['food'].remove(square)
+
+        colony.stored[indices] = stored
+
+        # Update FSM states
+        hungry = indices[(stored == 0) & ~starving]
+        colony.starving[hungry] = True
+        colony.clear_goals(hungry)
+
+        fed = indices[(stored >= harvesting["Min"]) & colony.starving[indices]]
+        colony.starving[fed] = False
+        colony.clear_goals(fed)
+
+    def reset_region(self, x0, y0, x1, y1):
+        """
+        Reset all information and potential ants inside a rectangle region
+        :param x0: the x coordinate of the up left corner of the region
+        :param y0: the y coordinate of the up left corner of the region
+        :param x1: the x coordinate following the bottom right corner of the region (excluded)
+        :param y1: the y coordinate following the bottom right corner of the region (excluded)
+        """
+        colony = self.scouters
+        colony.keep((colony.x < x0) | (colony.x >= x1) | (colony.y < y0) | (colony.y >= y1))
+        self.forget_foods(x0, y0, x1, y1)
@@ -0,0 +1,78 @@
+# Copyright (C) 2019 - UMons
+# 
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+# 
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+# 
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+import weakref
+import numpy as np
+
+
+class CostField:
+    """
+    Pathfinding cost matrix of a whole board, computed from blob quantities and touched squares.
+    A field is shared by all ants using the same cost function on the same board: it is computed once
+    and then only patched on squares logged as modified by the board, when it is read again.
+    """
+
+    FIELDS = weakref.WeakKeyDictionary()  # Fields of each board, by cost function
+
+    def __init__(self, costs):
+        """
+        :param costs: a vectorized function giving costs from arrays of blob quantities and touched flags
+        """
+        self.costs = costs
+        self.matrix = None
+        self.version = None
+        self.changes_start = None
+        self.changes_seen = 0
+
+    @staticmethod
+    def window(board, costs, x0, y0, x1, y1):
+        """
+        Return the up to date pathfinding matrix (indexed by [y, x]) in the rectangle given by (x0,y0) and (x1,y1)
+        The matrix is shared and must not be modified
+        :param board: A board class instance
+        :param costs: a vectorized function giving costs from arrays of blob quantities and touched flags
+        :param x0: the x coordinate of the up left corner of the rectangle
+        :param y0: the y coordinate of the up left corner of the rectangle
+        :param x1: the x coordinate of the bottom right corner of the rectangle (excluded)
+        :param y1: the y coordinate of the bottom right corner of the rectangle (excluded)
+        """
+        fields = CostField.FIELDS.setdefault(board, dict())
+        if costs not in fields:
+            fields[costs] = CostField(costs)
+
+        return fields[costs].update(board)[y0:y1, x0:x1]
+
+    def update(self, board):
+        """
+        Bring the matrix up to date with the board
+        :param board: A board class instance
+        :return: the whole board matrix, indexed by [y, x]
+        """
+        if self.version == board.version:
+            return self.matrix
+
+        if self.matrix is None or self.changes_start != board.changes_start \
+                or self.matrix.shape != (board.height, board.width):
+            self.matrix = np.ascontiguousarray(np.transpose(self.costs(board.dropped_blob, board.touched)),
+                                               dtype=float)
+        elif self.changes_seen < len(board.changes):
+            xs, ys = np.array(board.changes[self.changes_seen:], dtype=int).T
+            self.matrix[ys, xs] = self.costs(board.dropped_blob[xs, ys], board.touched[xs, ys])
+
+        self.version = board.version
+        self.changes_start = board.changes_start
+        self.changes_seen = len(board.changes)
+        return self.matrix
@@ -0,0 +1,422 @@
+# Copyright (C) 2019 - UMons
+# 
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+# 
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+# 
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+import heapq
+import math
+import numpy as np
+
+from simulation.board import Board
+from simulation.logic.astar import AStar
+from simulation.logic.cost_field import CostField
+
+
+class DStarLite:
+    """
+    Incremental path planner of one ant toward one goal (D* Lite), with the same cost model as AStar.
+    The search runs backward from the goal inside a fixed rectangle of the board. Between two plannings, the ant can
+    move and square weights can change: only the part of the search affected by changed squares is repaired.
+    As the global blob decrease slightly changes every weight on each loop, a square is considered as changed only
+    when its weight differs from the one used by the search by more than WEIGHT_TOLERANCE (or when it becomes
+    walkable or non walkable). Only squares logged as modified by the board since the last planning are read again,
+    or all squares of modified regions when the board log has been restarted (see Board.changed).
+    """
+
+    WEIGHT_TOLERANCE = 0.05  # Relative weight change needed to repair the search around a square
+    REPLAN_RATIO = 0.25  # Ratio of changed squares from which the search starts again from scratch
+    ARRAYS = ('rectangle', 'goal', 'start', 'km', 'weights', 'g', 'rhs', 'queue', 'keys')  # Saved by to_arrays
+
+    def __init__(self, board, costs, use_diagonal, x0, y0, x1, y1, goal):
+        """
+        :param board: A board class instance
+        :param costs: a vectorized function giving costs from arrays of blob quantities and touched flags
+        :param use_diagonal: boolean set to true if diagonal moves are available
+        :param x0: the x coordinate of the up left corner of the rectangle
+        :param y0: the y coordinate of the up left corner of the rectangle
+        :param x1: the x coordinate of the bottom right corner of the rectangle (excluded)
+        :param y1: the y coordinate of the bottom right corner of the rectangle (excluded)
+        :param goal: the x,y tuple coordinate of the goal on the board
+        """
+        self.board = board
+        self.costs = costs
+        self.use_diagonal = use_diagonal
+        self.moves = AStar.STRAIGHT_MOVES + AStar.DIAGONAL_MOVES if use_diagonal else AStar.STRAIGHT_MOVES
+        self.x0, self.y0, self.x1, self.y1 = x0, y0, x1, y1
+        self.width, self.height = x1 - x0, y1 - y0
+        self.goal = tuple(goal)
+        self.goal_index = (self.goal[1] - y0) * self.width + self.goal[0] - x0
+
+        self.weights = None  # Square weights used by the search, indexed by [y, x]
+        self.weights_list = None
+        self.version = None  # Board version and changes already read (see Board.changed)
+        self.changes_start = None
+        self.changes_seen = 0
+        self.g = None
+        self.rhs = None
+        self.queue = []
+        self.keys = dict()  # Current key of each queued square, outdated queue entries are skipped
+        self.km = 0
+        self.start = None
+        self.start_x, self.start_y = None, None
+        self.runs = 0  # Number of squares expanded by the last planning
+
+    def to_arrays(self):
+        """
+        :return: a dict of one dimensional float arrays with the rectangle, goal and start of the planner
+            and the state of its search, restored with from_arrays
+        """
+        searched = self.weights is not None
+        return {'rectangle': np.array([self.x0, self.y0, self.x1, self.y1], dtype=float),
+                'goal': np.array(self.goal, dtype=float),
+                'start': np.array([self.start_x, self.start_y] if self.start is not None else [], dtype=float),
+                'km': np.array([self.km], dtype=float),
+                'weights': self.weights.ravel().astype(float) if searched else np.zeros(0),
+                'g': np.array(self.g if searched else [], dtype=float),
+                'rhs': np.array(self.rhs if searched else [], dtype=float),
+                'queue': np.array(self.queue, dtype=float).ravel(),
+                'keys': np.array([(index,) + key for index, key in self.keys.items()], dtype=float).ravel()}
+
+    @staticmethod
+    def from_arrays(arrays, board, costs, use_diagonal):
+        """
+        Build again a planner saved with to_arrays, so that it repairs its search as the saved one would
+        :param arrays: a dict of arrays given by to_arrays
+        :param board: A board class instance
+        :param costs: a vectorized function giving costs from arrays of blob quantities and touched flags
+        :param use_diagonal: boolean set to true if diagonal moves are available
+        :return: the restored planner
+        """
+        x0, y0, x1, y1 = arrays['rectangle'].astype(int).tolist()
+        planner = DStarLite(board, costs, use_diagonal, x0, y0, x1, y1, arrays['goal'].astype(int).tolist())
+        if len(arrays['start']) > 0:
+            planner.start_x, planner.start_y = arrays['start'].astype(int).tolist()
+            planner.start = planner.start_y * planner.width + planner.start_x
+        planner.km = float(arrays['km'][0])
+        if len(arrays['weights']) > 0:
+            # The board version read last is unknown: all squares are read again by the next planning
+            planner.weights = arrays['weights'].astype(int).reshape(planner.height, planner.width)
+            planner.weights_list = planner.weights.ravel().tolist()
+            planner.g = arrays['g'].tolist()
+            planner.rhs = arrays['rhs'].tolist()
+            planner.queue = [(k1, k2, int(index)) for k1, k2, index in arrays['queue'].reshape(-1, 3).tolist()]
+            planner.keys = {int(index): (k1, k2) for index, k1, k2 in arrays['keys'].reshape(-1, 3).tolist()}
+        return planner
+
+    @staticmethod
+    def pack(planners):
+        """
+        :param planners: a list of planners
+        :return: a dict with the arrays of all planners (see to_arrays) put end to end in 'planners',
+            and their lengths in 'planner_lengths', restored with unpack
+        """
+        arrays = [planner.to_arrays() for planner in planners]
+        values = [planner_arrays[key] for planner_arrays in arrays for key in DStarLite.ARRAYS]
+        lengths = [[len(planner_arrays[key]) for key in DStarLite.ARRAYS] for planner_arrays in arrays]
+        return {'planners': np.concatenate(values) if len(values) > 0 else np.zeros(0),
+                'planner_lengths': np.array(lengths, dtype=np.int64).reshape(-1, len(DStarLite.ARRAYS))}
+
+    @staticmethod
+    def unpack(packed, board, costs, use_diagonal):
+        """
+        :param packed: a dict of arrays given by pack
+        :param board: A board class instance
+        :param costs: a vectorized function giving costs from arrays of blob quantities and touched flags
+        :param use_diagonal: boolean set to true if diagonal moves are available
+        :return: the list of restored planners
+        """
+        planners = []
+        parts = np.split(packed['planners'], np.cumsum(packed['planner_lengths'].ravel())[:-1])
+        for i in range(len(packed['planner_lengths'])):
+            arrays = dict(zip(DStarLite.ARRAYS, parts[i * len(DStarLite.ARRAYS):(i + 1) * len(DStarLite.ARRAYS)]))
+            planners.append(DStarLite.from_arrays(arrays, board, costs, use_diagonal))
+        return planners
+
+    def inside(self, x, y):
+        """
+        :param x: horizontal board position
+        :param y: vertical board position
+        :return: True if the position is inside the planner rectangle
+        """
+        return self.x0 <= x < self.x1 and self.y0 <= y < self.y1
+
+    def usable(self, goal, x, y):
+        """
+        :param goal: the x,y tuple coordinate of the wanted goal
+        :param x: current horizontal position of the ant
+        :param y: current vertical position of the ant
+        :return: True if the planner can be used to go from (x, y) to goal
+        """
+        return goal is not None and tuple(goal) == self.goal and self.inside(x, y)
+
+    def heuristic(self, x, y):
+        """
+        :param x: horizontal position of a square inside the rectangle
+        :param y: vertical position of a square inside the rectangle
+        :return: the estimated cost between the start square and this square
+        """
+        dx, dy = abs(x - self.start_x), abs(y - self.start_y)
+        if not self.use_diagonal:
+            return dx + dy
+        elif dx < dy:
+            return (AStar.SQRT2 - 1) * dx + dy
+        else:
+            return (AStar.SQRT2 - 1) * dy + dx
+
+    def key(self, index):
+        """
+        :param index: flat index of a square
+        :return: the priority of the square in the queue
+        """
+        value = min(self.g[index], self.rhs[index])
+        y, x = divmod(index, self.width)
+        return value + self.heuristic(x, y) + self.km, value
+
+    def best_rhs(self, index):
+        """
+        :param index: flat index of a square
+        :return: the best cost to the goal from this square through its neighbors
+        """
+        g, weights, width, height = self.g, self.weights_list, self.width, self.height
+        y, x = divmod(index, width)
+        best = math.inf
+        for dx, dy, step in self.moves:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < width and 0 <= ny < height:
+                neighbor = ny * width + nx
+                if weights[neighbor] >= 1:
+                    cost = step * weights[neighbor] + g[neighbor]
+                    if cost < best:
+                        best = cost
+        return best
+
+    def queue_update(self, index):
+        """
+        Queue a square with its current key if it is inconsistent, remove it from the queue otherwise
+        :param index: flat index of a square
+        """
+        self.keys.pop(index, None)
+        if self.g[index] != self.rhs[index]:
+            key = self.key(index)
+            self.keys[index] = key
+            heapq.heappush(self.queue, (key[0], key[1], index))
+
+    def update_predecessors(self, index, old_cost, new_cost):
+        """
+        Update squares from which a move enters the given square, after a change of this move cost
+        (cost of the square itself plus its weight)
+        :param index: flat index of a square
+        :param old_cost: previous cost to the goal through this square, without the move factor
+            (a tuple of weight and g value)
+        :param new_cost: new cost to the goal through this square, as a tuple of weight and g value
+        """
+        old_weight, old_g = old_cost
+        new_weight, new_g = new_cost
+        g, rhs, keys, queue = self.g, self.rhs, self.keys, self.queue
+        width, height, goal_index = self.width, self.height, self.goal_index
+        # Keys are computed inline (as in key and heuristic): this is the innermost loop of the search
+        start_x, start_y, km, diagonal = self.start_x, self.start_y, self.km, self.use_diagonal
+        y, x = divmod(index, width)
+        for dx, dy, step in self.moves:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < width and 0 <= ny < height:
+                neighbor = ny * width + nx
+                if neighbor == goal_index:
+                    continue
+
+                old = step * old_weight + old_g if old_weight >= 1 else math.inf
+                new = step * new_weight + new_g if new_weight >= 1 else math.inf
+                value = rhs[neighbor]
+                if new < value:
+                    rhs[neighbor] = value = new
+                elif old == value and new > old:
+                    rhs[neighbor] = value = self.best_rhs(neighbor)
+                else:
+                    continue
+
+                keys.pop(neighbor, None)
+                if g[neighbor] != value:
+                    value = min(g[neighbor], value)
+                    hx, hy = abs(nx - start_x), abs(ny - start_y)
+                    if not diagonal:
+                        k1 = value + (hx + hy) + km
+                    elif hx < hy:
+                        k1 = value + ((AStar.SQRT2 - 1) * hx + hy) + km
+                    else:
+                        k1 = value + ((AStar.SQRT2 - 1) * hy + hx) + km
+                    keys[neighbor] = (k1, value)
+                    heapq.heappush(queue, (k1, value, neighbor))
+
+    def reset(self):
+        """
+        Forget the search, keeping only the goal
+        """
+        size = self.width * self.height
+        self.g = [math.inf] * size
+        self.rhs = [math.inf] * size
+        self.queue = []
+        self.keys = dict()
+        self.km = 0
+
+        self.rhs[self.goal_index] = 0
+        key = self.key(self.goal_index)
+        self.keys[self.goal_index] = key
+        self.queue.append((key[0], key[1], self.goal_index))
+
+    def update_weights(self):
+        """
+        Read square weights from the board and repair the search around changed squares
+        """
+        matrix = CostField.window(self.board, self.costs, self.x0, self.y0, self.x1, self.y1)
+        if self.weights is None:
+            self.weights = matrix.astype(int)
+            self.weights_list = self.weights.ravel().tolist()
+            self.read_board()
+            self.reset()
+            return
+
+        used = self.weights.ravel()
+        changes = len(self.board.changes) - self.changes_seen
+        if self.changes_start == self.board.changes_start and changes <= self.width * self.height:
+            if changes == 0:
+                self.read_board()
+                return
+            xs, ys = np.array(self.board.changes[self.changes_seen:], dtype=int).T
+            inside = (xs >= self.x0) & (xs < self.x1) & (ys >= self.y0) & (ys < self.y1)
+            candidates = np.unique((ys[inside] - self.y0) * self.width + xs[inside] - self.x0)
+            current = matrix.ravel()[candidates] if matrix.flags.c_contiguous \
+                else matrix[candidates // self.width, candidates % self.width]
+        else:
+            # The log has been restarted: squares of all regions modified since the last planning are read again
+            size = Board.REGION_SIZE
+            rx0, ry0 = self.x0 // size, self.y0 // size
+            modified = None if self.version is None else \
+                self.board.region_versions[rx0:(self.x1 - 1) // size + 1, ry0:(self.y1 - 1) // size + 1] > self.version
+            if modified is not None and not modified.any():
+                self.read_board()
+                return
+            elif modified is None or modified.all():
+                candidates = None
+                current = matrix.ravel()
+            else:
+                mask = np.repeat(np.repeat(modified.T, size, axis=0), size, axis=1)
+                mask = mask[self.y0 - ry0 * size:self.y1 - ry0 * size, self.x0 - rx0 * size:self.x1 - rx0 * size]
+                candidates = np.flatnonzero(mask)
+                current = matrix[mask]
+        self.read_board()
+
+        current = current.astype(int)
+        previous = used if candidates is None else used[candidates]
+        differs = (np.abs(current - previous) > DStarLite.WEIGHT_TOLERANCE * previous) \
+            | ((current >= 1) != (previous >= 1))
+        changed = np.flatnonzero(differs) if candidates is None else candidates[differs]
+        if len(changed) == 0:
+            return
+
+        old_weights = used[changed].tolist()
+        used[changed] = current[differs]
+        if len(changed) > DStarLite.REPLAN_RATIO * self.width * self.height:
+            self.weights_list = used.tolist()
+            self.reset()
+            return
+
+        for index, old_weight in zip(changed.tolist(), old_weights):
+            self.weights_list[index] = int(used[index])
+            # Costs of moves entering the square are modified, it only matters if the search reached it
+            if self.g[index] != math.inf:
+                self.update_predecessors(index, (old_weight, self.g[index]), (self.weights_list[index], self.g[index]))
+
+    def read_board(self):
+        """
+        Remember the board state whose weights are used by the search
+        """
+        self.version = self.board.version
+        self.changes_start, self.changes_seen = self.board.changes_start, len(self.board.changes)
+
+    def compute_shortest_path(self):
+        """
+        Expand inconsistent squares until the start square cost is known
+        """
+        self.runs = 0
+        g, rhs, queue, keys, weights, start = self.g, self.rhs, self.queue, self.keys, self.weights_list, self.start
+        while len(queue) > 0:
+            k1, k2, index = queue[0]
+            if keys.get(index) != (k1, k2):
+                heapq.heappop(queue)
+                continue
+            if rhs[start] == g[start] and (k1, k2) > self.key(start):
+                break
+
+            heapq.heappop(queue)
+            self.runs += 1
+            new_key = self.key(index)
+            if (k1, k2) < new_key:
+                keys[index] = new_key
+                heapq.heappush(queue, (new_key[0], new_key[1], index))
+                continue
+
+            del keys[index]
+            weight = weights[index]
+            old_g = g[index]
+            if old_g > rhs[index]:
+                g[index] = rhs[index]
+                self.update_predecessors(index, (weight, old_g), (weight, g[index]))
+            else:
+                g[index] = math.inf
+                self.update_predecessors(index, (weight, old_g), (weight, math.inf))
+                if index != self.goal_index:
+                    rhs[index] = self.best_rhs(index)
+                self.queue_update(index)
+
+    def find_path(self, x, y):
+        """
+        :param x: current horizontal position of the ant
+        :param y: current vertical position of the ant
+        :return: the list of x,y tuple board coordinates to follow to reach the goal (start excluded),
+            empty if the goal can't be reached
+        """
+        if not (self.inside(x, y) and self.inside(self.goal[0], self.goal[1])):
+            return []
+
+        start_x, start_y = x - self.x0, y - self.y0
+        if self.start is not None and (start_x, start_y) != (self.start_x, self.start_y):
+            self.km += self.heuristic(start_x, start_y)
+        self.start_x, self.start_y = start_x, start_y
+        self.start = start_y * self.width + start_x
+
+        self.update_weights()
+        self.compute_shortest_path()
+        if self.rhs[self.start] == math.inf:
+            return []
+
+        # Follow the cheapest moves down to the goal
+        weights, g, width, height = self.weights_list, self.g, self.width, self.height
+        path = []
+        x, y = start_x, start_y
+        while y * width + x != self.goal_index:
+            best, best_cost = None, math.inf
+            for dx, dy, step in self.moves:
+                nx, ny = x + dx, y + dy
+                if 0 <= nx < width and 0 <= ny < height:
+                    neighbor = ny * width + nx
+                    if weights[neighbor] >= 1 and step * weights[neighbor] + g[neighbor] < best_cost:
+                        best, best_cost = (nx, ny), step * weights[neighbor] + g[neighbor]
+
+            if best is None or len(path) >= width * height:
+                return []
+
+            x, y = best
+            path.append((x + self.x0, y + self.y0))
+
+        return path
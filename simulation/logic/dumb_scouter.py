@@ -34,6 +34,7 @@ class DumbScouter:
         self.x = x
         self.y = y
         self.drop = self.knowledge["Scouters"]["Drop by eat"]
+        self.waiting = False  # True if the ant stayed in place waiting for a path search (see PlanningBudget)
 
     def move(self):
         """
@@ -0,0 +1,330 @@
+# Copyright (C) 2019 - UMons
+# 
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+# 
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+# 
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+import heapq
+import math
+import weakref
+import numpy as np
+
+from simulation.logic.astar import AStar
+from simulation.logic.cost_field import CostField
+
+
+class FlowField:
+    """
+    Distance to the nearest known food from every board square, computed by a multi-source Dijkstra
+    over a pathfinding cost field (same cost model as AStar), with the next square to move to from each square.
+    A field is shared by all ants using the same known foods, cost function and diagonal moves.
+    Appearing and disappearing foods only update the squares they change. The whole field is computed again
+    when a square becomes non walkable or when square weights have changed enough since the last computation,
+    these changes being followed from the squares logged as modified by the board (see Board.changed).
+    """
+
+    FIELDS = weakref.WeakKeyDictionary()  # Fields of each food registry, by cost function and diagonal moves
+    REFRESH_RATIO = 0.05  # Relative change of the walkable squares total weight needed to compute the field again
+
+    def __init__(self, costs, use_diagonal=True):
+        """
+        :param costs: a vectorized function giving costs from arrays of blob quantities and touched flags
+        :param use_diagonal: boolean set to true if diagonal moves are available
+        """
+        self.costs = costs
+        self.moves = AStar.STRAIGHT_MOVES + AStar.DIAGONAL_MOVES if use_diagonal else AStar.STRAIGHT_MOVES
+
+        # Square weights used by the field, indexed by [y, x], and as a list by flat index (y * width + x)
+        self.weights = None
+        self.weights_list = None
+        # By flat index: distance to the nearest food (inf if unreachable), next square toward it
+        # (-1 for foods and unreachable squares) and flat index of this food (-1 if unreachable)
+        self.distances = None
+        self.next = None
+        self.sources = None
+        self.next_array = None  # self.next as an array, built only when needed
+
+        self.foods = set()
+        self.board_version = None
+        self.foods_version = None
+
+        # Current square weights, indexed by [y, x], with the board changes they include, and their differences with
+        # the weights of the field: total change of walkable squares and number of walkable squares now blocked
+        self.current = None
+        self.changes_start = None
+        self.changes_seen = 0
+        self.drift = 0
+        self.blocked = 0
+        self.total = 0  # Total weight of walkable squares of the field
+
+    @staticmethod
+    def of(board, foods, costs, use_diagonal=True):
+        """
+        :param board: A board class instance
+        :param foods: the FoodRegistry of known foods
+        :param costs: a vectorized function giving costs from arrays of blob quantities and touched flags
+        :param use_diagonal: boolean set to true if diagonal moves are available
+        :return: the up to date flow field shared by ants with the same parameters
+        """
+        fields = FlowField.FIELDS.setdefault(foods, dict())
+        if (costs, use_diagonal) not in fields:
+            fields[(costs, use_diagonal)] = FlowField(costs, use_diagonal)
+
+        return fields[(costs, use_diagonal)].update(board, foods)
+
+    @staticmethod
+    def existing(foods, costs, use_diagonal=True):
+        """
+        :param foods: the FoodRegistry of known foods
+        :param costs: a vectorized function giving costs from arrays of blob quantities and touched flags
+        :param use_diagonal: boolean set to true if diagonal moves are available
+        :return: the field shared by ants with the same parameters as it is, None if it has not been computed yet
+        """
+        return FlowField.FIELDS.get(foods, dict()).get((costs, use_diagonal))
+
+    def to_arrays(self, board, foods):
+        """
+        :param board: A board class instance
+        :param foods: the FoodRegistry of known foods
+        :return: a dict of arrays with the square weights, distances, next squares, sources and foods of the field,
+            and whether it is up to date with the board and the known foods
+        """
+        return {'weights': self.weights.copy(), 'distances': np.array(self.distances, dtype=float),
+                'next': np.array(self.next, dtype=int), 'sources': np.array(self.sources, dtype=int),
+                'foods': np.array(sorted(self.foods), dtype=int).reshape(-1, 2),
+                'up_to_date': np.array(self.board_version == board.version and self.foods_version == foods.version)}
+
+    def restore(self, arrays, board, foods):
+        """
+        Replace the field by the one of a dict given by to_arrays, so that it is updated as the saved one would be
+        :param arrays: a dict of arrays given by to_arrays
+        :param board: A board class instance
+        :param foods: the FoodRegistry of known foods
+        """
+        self.weights = arrays['weights'].astype(int)
+        self.weights_list = self.weights.ravel().tolist()
+        self.distances = arrays['distances'].astype(float).tolist()
+        self.next = arrays['next'].astype(int).tolist()
+        self.sources = arrays['sources'].astype(int).tolist()
+        self.next_array = None
+        self.foods = set(tuple(square) for square in arrays['foods'].astype(int).reshape(-1, 2).tolist())
+
+        self.total = int(np.sum(self.weights[self.weights >= 1]))
+        self.current = None
+        self.track_weights(board)
+
+        up_to_date = bool(arrays['up_to_date'])
+        self.board_version = board.version if up_to_date else None
+        self.foods_version = foods.version if up_to_date else None
+
+    def update(self, board, foods):
+        """
+        Bring the field up to date with the board and the known foods
+        :param board: A board class instance
+        :param foods: the FoodRegistry of known foods
+        :return: the field itself
+        """
+        if self.board_version == board.version and self.foods_version == foods.version:
+            return self
+
+        if self.board_version != board.version:
+            self.track_weights(board)
+        outdated = self.weights is None or self.weights.shape != self.current.shape or self.blocked > 0 \
+            or self.drift > FlowField.REFRESH_RATIO * self.total
+
+        if outdated:
+            self.compute(self.current.copy(), set(foods))
+        elif self.foods_version != foods.version:
+            known = set(foods)
+            if known != self.foods:
+                self.remove_sources(self.foods - known)
+                self.add_sources(known - self.foods)
+                self.foods = known
+
+        self.board_version = board.version
+        self.foods_version = foods.version
+        return self
+
+    def track_weights(self, board):
+        """
+        Bring the current square weights up to date with the board, only reading the squares logged as modified
+        since the last call (all squares when the log has been restarted)
+        :param board: A board class instance
+        """
+        matrix = CostField.window(board, self.costs, 0, 0, board.width, board.height)
+        if self.current is None or self.changes_start != board.changes_start or self.current.shape != matrix.shape:
+            self.current = matrix.astype(int)
+            if self.weights is not None and self.weights.shape == self.current.shape:
+                walkable = self.weights >= 1
+                self.drift = int(np.sum(np.abs(self.current - self.weights)[walkable]))
+                self.blocked = int(np.count_nonzero(walkable & (self.current < 1)))
+        elif self.changes_seen < len(board.changes):
+            xs, ys = np.array(board.changes[self.changes_seen:], dtype=int).T
+            indices = np.unique(ys * board.width + xs)
+            weights = self.weights.ravel()[indices]
+            walkable = weights >= 1
+            old, new = self.current.ravel()[indices], matrix.ravel()[indices].astype(int)
+
+            self.drift += int(np.sum(np.abs(new - weights)[walkable]) - np.sum(np.abs(old - weights)[walkable]))
+            self.blocked += int(np.count_nonzero(walkable & (new < 1)) - np.count_nonzero(walkable & (old < 1)))
+            self.current.ravel()[indices] = new
+
+        self.changes_start = board.changes_start
+        self.changes_seen = len(board.changes)
+
+    def compute(self, weights, foods):
+        """
+        Compute the whole field from all foods at once
+        :param weights: integer square weights, indexed by [y, x]
+        :param foods: set of x,y tuple coordinates of known foods
+        """
+        size = weights.size
+        self.weights = weights
+        self.weights_list = weights.ravel().tolist()
+        self.total = int(np.sum(weights[weights >= 1]))
+        self.drift = 0
+        self.blocked = 0
+        self.distances = [math.inf] * size
+        self.next = [-1] * size
+        self.sources = [-1] * size
+        self.foods = set()
+
+        self.add_sources(foods)
+        self.foods = foods
+
+    def add_sources(self, foods):
+        """
+        Update squares getting closer to one of the new foods
+        :param foods: iterable of x,y tuple coordinates of new foods
+        """
+        width = self.weights.shape[1]
+        frontier = []
+        for x, y in foods:
+            index = y * width + x
+            if self.weights_list[index] >= 1 and self.distances[index] != 0:
+                self.distances[index] = 0
+                self.next[index] = -1
+                self.sources[index] = index
+                frontier.append((0, index))
+
+        self.propagate(frontier)
+
+    def remove_sources(self, foods):
+        """
+        Update squares whose nearest food was one of the removed foods, from the border of their area
+        :param foods: iterable of x,y tuple coordinates of removed foods
+        """
+        height, width = self.weights.shape
+        removed = [y * width + x for x, y in foods]
+        if len(removed) == 0:
+            return
+
+        invalid = np.flatnonzero(np.isin(np.array(self.sources), removed)).tolist()
+        for index in invalid:
+            self.distances[index] = math.inf
+            self.next[index] = -1
+            self.sources[index] = -1
+
+        frontier = []
+        for index in invalid:
+            y, x = divmod(index, width)
+            for dx, dy, step in self.moves:
+                nx, ny = x + dx, y + dy
+                if 0 <= nx < width and 0 <= ny < height:
+                    neighbor = ny * width + nx
+                    score = self.distances[neighbor] + step * self.weights_list[neighbor]
+                    if score < self.distances[index]:
+                        self.distances[index] = score
+                        self.next[index] = neighbor
+                        self.sources[index] = self.sources[neighbor]
+            if self.distances[index] < math.inf:
+                frontier.append((self.distances[index], index))
+
+        heapq.heapify(frontier)
+        self.propagate(frontier)
+
+    def propagate(self, frontier):
+        """
+        Dijkstra search walking moves backward, only lowering distances
+        :param frontier: a heap of (distance, flat index) tuples of squares whose distance has just been lowered
+        """
+        height, width = self.weights.shape
+        weights, distances, next_squares, sources = self.weights_list, self.distances, self.next, self.sources
+        self.next_array = None
+
+        while len(frontier) > 0:
+            distance, index = heapq.heappop(frontier)
+            if distance > distances[index]:
+                continue
+
+            y, x = divmod(index, width)
+            weight = weights[index]
+            source = sources[index]
+            for dx, dy, step in self.moves:
+                nx, ny = x + dx, y + dy
+                if 0 <= nx < width and 0 <= ny < height:
+                    neighbor = ny * width + nx
+                    if weights[neighbor] >= 1:
+                        # Moving from the neighbor to this square costs this square weight
+                        score = distance + step * weight
+                        if score < distances[neighbor]:
+                            distances[neighbor] = score
+                            next_squares[neighbor] = index
+                            sources[neighbor] = source
+                            heapq.heappush(frontier, (score, neighbor))
+
+    def next_step(self, x, y):
+        """
+        :param x: current horizontal position of the ant
+        :param y: current vertical position of the ant
+        :return: the x,y tuple coordinate of the next square toward the nearest food (or toward another square
+            with food when already on a food), None if no food can be reached
+        """
+        height, width = self.weights.shape
+        index = self.next[y * width + x]
+        if index >= 0:
+            y_next, x_next = divmod(index, width)
+            return x_next, y_next
+
+        # Foods and squares outside the field: best neighbor using its distance
+        best, best_distance = None, math.inf
+        for dx, dy, step in self.moves:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < width and 0 <= ny < height:
+                neighbor = ny * width + nx
+                if self.weights_list[neighbor] >= 1:
+                    distance = step * self.weights_list[neighbor] + self.distances[neighbor]
+                    if distance < best_distance:
+                        best, best_distance = (nx, ny), distance
+        return best
+
+    def next_steps(self, xs, ys):
+        """
+        Vectorized version of next_step
+        :param xs: array of horizontal positions of ants
+        :param ys: array of vertical positions of ants
+        :return: arrays of next horizontal and vertical positions, unchanged where no food can be reached
+        """
+        if self.next_array is None:
+            self.next_array = np.array(self.next, dtype=int)
+
+        width = self.weights.shape[1]
+        indices = self.next_array[ys * width + xs]
+        new_xs, new_ys = np.where(indices >= 0, indices % width, xs), np.where(indices >= 0, indices // width, ys)
+
+        for i in np.flatnonzero(indices < 0).tolist():
+            step = self.next_step(int(xs[i]), int(ys[i]))
+            if step is not None:
+                new_xs[i], new_ys[i] = step
+
+        return new_xs, new_ys
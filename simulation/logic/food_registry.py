@@ -0,0 +1,90 @@
+# Copyright (C) 2019 - UMons
+# 
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+# 
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+# 
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+import numpy as np
+
+
+class FoodRegistry:
+    """
+    Known food squares, used as the blob knowledge ["food"].
+    Squares are indexed by position for constant time membership test, insertion and removal,
+    and kept in a list for constant time random access (removal moves the last square to the removed place).
+    It can be used as the previous list of (x, y) tuples: len, in, iteration, indexing, append, remove and copy.
+    """
+
+    def __init__(self, squares=()):
+        """
+        :param squares: an iterable of (x, y) food positions
+        """
+        self.squares = []
+        self.indices = dict()
+        self.version = 0  # Incremented on each change
+
+        for square in squares:
+            self.append(square)
+
+    def __len__(self):
+        return len(self.squares)
+
+    def __contains__(self, square):
+        return tuple(square) in self.indices
+
+    def __iter__(self):
+        return iter(self.squares)
+
+    def __getitem__(self, index):
+        return self.squares[index]
+
+    def append(self, square):
+        """
+        Add a food position if it is not already known
+        :param square: a (x, y) food position
+        """
+        square = (int(square[0]), int(square[1]))
+        if square not in self.indices:
+            self.indices[square] = len(self.squares)
+            self.squares.append(square)
+            self.version += 1
+
+    def remove(self, square):
+        """
+        Remove a known food position
+        :param square: a (x, y) food position
+        Raise a ValueError if the position is not known
+        """
+        square = tuple(square)
+        if square not in self.indices:
+            raise ValueError(str(square) + " is not a known food")
+
+        index = self.indices.pop(square)
+        last = self.squares.pop()
+        if index < len(self.squares):
+            self.squares[index] = last
+            self.indices[last] = index
+
+        self.version += 1
+
+    def copy(self):
+        """
+        :return: a list copy of known food positions
+        """
+        return list(self.squares)
+
+    def to_array(self):
+        """
+        :return: an integer array of shape (number of foods, 2) with known food positions
+        """
+        return np.array(self.squares, dtype=int).reshape(-1, 2)
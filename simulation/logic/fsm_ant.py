@@ -33,6 +33,13 @@ class FSMAnt(DumbScouter):
         - ["Harvesting"]["Eat"]: (float) Value an ant eat to do a step
         - ["Harvesting"]["Collect"]: (float) Value an ant collect by stepping on food
         - ["Gathering"]/["Scouting"]["Diagonal Moves"]: (bool) Allow ants to use diagonals to travel
+        - ["Gathering"]["Flow Field"]: (bool, optional) Gatherers follow a flow field toward the nearest known food
+        - ["Gathering"]/["Scouting"]["Incremental Planning"]: (bool, optional) Ants repair their path search
+            instead of starting it again (useful without Light Compute)
+        - ["Gathering"]["Hierarchical Tile Size"]: (int, optional) Tile size of the hierarchical search used by
+            gatherers when their sightline covers the whole board (0 to disable it)
+        - ["Gathering"]["Hierarchical Quality"]: (int, optional) Number of tiles added around hierarchical paths
+            to refine them
     """
 
     def __init__(self, board, knowledge, x, y):
@@ -45,10 +52,15 @@ class FSMAnt(DumbScouter):
         DumbScouter.__init__(self, board, knowledge, x, y)
         self.gatherer_logic = Gatherer(board, knowledge, x, y, self.knowledge["Gathering"]["Diagonal Moves"],
                                        self.knowledge["Gathering"]["Sightline"],
-                                       self.knowledge["Gathering"]["Light Compute"])
+                                       self.knowledge["Gathering"]["Light Compute"],
+                                       self.knowledge["Gathering"].get("Flow Field", False),
+                                       self.knowledge["Gathering"].get("Incremental Planning", False),
+                                       self.knowledge["Gathering"].get("Hierarchical Tile Size", 0),
+                                       self.knowledge["Gathering"].get("Hierarchical Quality", 1))
         self.scouting_logic = AdvancedScouter(board, knowledge, x, y, self.knowledge["Scouting"]["Diagonal Moves"],
                                               self.knowledge["Scouting"]["Sightline"],
-                                              self.knowledge["Scouting"]["Light Compute"])
+                                              self.knowledge["Scouting"]["Light Compute"],
+                                              self.knowledge["Scouting"].get("Incremental Planning", False))
 
         self.stored = self.knowledge["Harvesting"]["Min"]
         self.starving = False
@@ -61,10 +73,12 @@ class FSMAnt(DumbScouter):
             self.gatherer_logic.move()
             self.x = self.gatherer_logic.x
             self.y = self.gatherer_logic.y
+            self.waiting = self.gatherer_logic.waiting
         else:
             self.scouting_logic.move()
             self.x = self.scouting_logic.x
             self.y = self.scouting_logic.y
+            self.waiting = self.scouting_logic.waiting
 
     def init_gathering(self):
         """
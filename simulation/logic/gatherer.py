@@ -17,12 +17,13 @@
 import random
 import numpy as np
 
-from pathfinding.core.diagonal_movement import DiagonalMovement
-from pathfinding.core.grid import Grid
-from pathfinding.finder.a_star import AStarFinder
-
 from simulation.board import Board
+from simulation.logic.cost_field import CostField
+from simulation.logic.dstar_lite import DStarLite
 from simulation.logic.dumb_scouter import DumbScouter
+from simulation.logic.flow_field import FlowField
+from simulation.logic.path_cache import PathCache
+from simulation.logic.unreachable_goals import UnreachableGoals
 
 
 class Gatherer(DumbScouter):
@@ -32,7 +33,8 @@ class Gatherer(DumbScouter):
     #  and by following only maximum blob quantity to hope find food.
     #  But this will likely lead to disconnection of blob from food to food...
 
-    def __init__(self, board, knowledge, x, y, use_diagonal=True, sightline=-1, light_compute=True):
+    def __init__(self, board, knowledge, x, y, use_diagonal=True, sightline=-1, light_compute=True,
+                 flow_field=False, incremental=False, tile_size=0, path_quality=1):
         """
         :param board: A board class instance
         :param knowledge: a dict containing all blob knowledge and set up
@@ -41,38 +43,48 @@ class Gatherer(DumbScouter):
         :param use_diagonal: boolean set to true if diagonal moves are available
         :param sightline: size of the ant sightline, used to compute goal decision
         :param light_compute: boolean set to true if path is computing only once and then memorized until reaching goal
+        :param flow_field: boolean set to true if the ant follows the flow field toward the nearest known food
+            instead of choosing a food and computing its own path
+        :param incremental: boolean set to true if the ant keeps an incremental planner (see DStarLite) for its goal
+            and repairs it instead of searching again its path from scratch
+        :param tile_size: if positive, size of the tiles used by the hierarchical search (see HPAStar) when the
+            sightline covers the whole board, 0 to search the whole board with AStar
+        :param path_quality: number of tiles added around the hierarchical abstract path to refine it
         """
         DumbScouter.__init__(self, board, knowledge, x, y)
 
         self.use_diagonal = use_diagonal
         self.light_compute = light_compute
+        self.flow_field = flow_field
+        self.incremental = incremental
+        self.tile_size = tile_size
+        self.path_quality = path_quality
         self.sightline = sightline if sightline > 0 else max(self.board.width, self.board.height)
 
         self.goal = None
         self.path = []
+        self.planner = None
+        self.whole_board = False  # True if the last path search covered the whole board
+
+    @staticmethod
+    def costs(blob, touched):
+        """
+        :param blob: array of blob quantities
+        :param touched: array of touched flags
+        :return: array of pathfinding costs for these squares
+        """
+        return np.where(blob > 0, 1 + (Board.MAX_BLOB - blob), np.where(touched, Board.MAX_BLOB * 2, 0))
 
     def get_matrix(self, x0, y0, x1, y1):
         """
-        Compute and return a pathfinding matrix filled with board squares values
-        in the rectangle given by (x0,y0) and (x1,y1)
+        Return a pathfinding matrix filled with board squares values
+        in the rectangle given by (x0,y0) and (x1,y1), sliced from the cost field shared by all ants
         :param x0: the x coordinate of the up left corner of the rectangle
         :param y0: the y coordinate of the up left corner of the rectangle
         :param x1: the x coordinate of the bottom right corner of the rectangle
         :param y1: the x coordinate of the bottom right corner of the rectangle
         """
-        width = x1 - x0
-        height = y1 - y0
-        matrix = np.zeros((width, height))
-        for y in range(height):
-            for x in range(width):
-                if self.board.get_blob(x0 + x, y0 + y) > 0:
-                    matrix[x, y] = 1 + (Board.MAX_BLOB - self.board.get_blob(x0 + x, y0 + y))
-                else:
-                    if self.board.is_touched(x0 + x, y0 + y):
-                        matrix[x, y] = Board.MAX_BLOB * 2
-                    else:
-                        matrix[x, y] = 0
-        return np.transpose(matrix)
+        return CostField.window(self.board, self.costs, x0, y0, x1, y1)
 
     def compute_sight_see_goal(self, x0, y0, x1, y1):
         """
@@ -108,42 +120,49 @@ class Gatherer(DumbScouter):
         else:
             t = min(t_x, t_y)
 
-        # First hit square by projection
-        symb_goal = (int(self.goal[0] + t * delta_x), int(self.goal[1] + t * delta_y))
+        # Sample t parameter from the first hit square by projection up to the ant (and one step further),
+        # with the same sequential additions as a step by step walk
+        inc = 1 / (self.board.width + self.board.height)
+        steps = max(0, int((1 - t) / inc)) + 3
+        ts = np.cumsum(np.concatenate(([t], np.full(steps, inc))))
+        ts = ts[:np.argmax(ts > 1) + 1]
+        xs = (self.goal[0] + ts * delta_x).astype(int)
+        ys = (self.goal[1] + ts * delta_y).astype(int)
 
-        # Iterate over t parameter until a touched square is found
-        found = self.board.is_touched(symb_goal[0], symb_goal[1])
-        while not found and t <= 1:
-            inc = 1 / (self.board.width + self.board.height)
-            t += inc
-            symb_goal = (int(self.goal[0] + t * delta_x), int(self.goal[1] + t * delta_y))
-            found = self.board.is_touched(symb_goal[0], symb_goal[1])
+        # First touched square along the projection, or the last sampled square if there is none
+        inside = (xs >= 0) & (xs < self.board.width) & (ys >= 0) & (ys < self.board.height)
+        found = np.zeros(len(ts), dtype=bool)
+        found[inside] = self.board.touched[xs[inside], ys[inside]]
+        i = np.argmax(found) if np.any(found) else len(ts) - 1
 
-        return symb_goal[0] - x0, symb_goal[1] - y0
+        return int(xs[i]) - x0, int(ys[i]) - y0
 
     def best_way_to(self):
         """
-        Inside sightline, compute pathfinding matrix, set local goal, compute and store path
+        Inside sightline, set local goal, find (or get back from the shared PathCache) and store path.
+        Searches covering the whole board go through the hierarchical search if tile size is set
         """
         x0, y0 = max(0, self.x - self.sightline), max(0, self.y - self.sightline)
         x1, y1 = min(self.board.width, self.x + self.sightline + 1), min(self.board.height, self.y + self.sightline + 1)
 
-        grid = Grid(matrix=self.get_matrix(x0, y0, x1, y1))
-
         x_goal, y_goal = self.compute_sight_see_goal(x0, y0, x1, y1)
 
-        start = grid.node(self.x - x0, self.y - y0)
-        end = grid.node(x_goal, y_goal)
+        if self.incremental:
+            local_goal = (x_goal + x0, y_goal + y0)
+            if self.planner is None or not self.planner.usable(local_goal, self.x, self.y):
+                self.planner = DStarLite(self.board, self.costs, self.use_diagonal, x0, y0, x1, y1, local_goal)
+            self.path = self.planner.find_path(self.x, self.y)
+            self.whole_board = (self.planner.x0, self.planner.y0, self.planner.x1, self.planner.y1) \
+                == (0, 0, self.board.width, self.board.height)
+            return
 
-        if self.use_diagonal:
-            finder = AStarFinder(diagonal_movement=DiagonalMovement.always)
-        else:
-            finder = AStarFinder(diagonal_movement=DiagonalMovement.never)
+        start = (self.x - x0, self.y - y0)
+        end = (x_goal, y_goal)
 
-        self.path, runs = finder.find_path(start, end, grid)
-        self.path = self.path[1:]
-        for i, step in enumerate(self.path):
-            self.path[i] = (step[0] + x0, step[1] + y0)
+        path = PathCache.of(self.board).find_path(self.board, self.costs, self.use_diagonal, x0, y0, x1, y1,
+                                                  start, end, self.tile_size, self.path_quality)
+        self.path = [(step[0] + x0, step[1] + y0) for step in path[1:]]
+        self.whole_board = (x0, y0, x1, y1) == (0, 0, self.board.width, self.board.height)
 
     def reached(self, goal):
         """
@@ -154,8 +173,14 @@ class Gatherer(DumbScouter):
 
     def choose_goal(self):
         """
-        :return: a new goal for ant, based on unreached known food
+        :return: a new goal for ant, based on unreached known food (and not known as unreachable from the ant)
         """
+        unreachable = UnreachableGoals.of(self.board, self.costs, self.use_diagonal).from_square(self.x, self.y)
+        if len(unreachable) != 0:
+            foods = [food for food in self.knowledge['food']
+                     if tuple(food) not in unreachable and not self.reached(food)]
+            return foods[random.randrange(len(foods))] if len(foods) > 0 else None
+
         if len(self.knowledge['food']) == 0:
             return None
         elif len(self.knowledge['food']) == 1:
@@ -169,12 +194,39 @@ class Gatherer(DumbScouter):
                 i = random.randrange(len(self.knowledge['food']))
             return self.knowledge['food'][i]
 
+    def give_up_goal(self):
+        """
+        Drop the current goal, remembered as unreachable from the ant region (see UnreachableGoals) if the failed
+        search covered the whole board
+        """
+        if self.whole_board:
+            UnreachableGoals.of(self.board, self.costs, self.use_diagonal).add(self.x, self.y, self.goal)
+        self.goal = None
+
+    def get_flow_field(self):
+        """
+        :return: the up to date flow field toward known foods, shared by all gatherers
+        """
+        return FlowField.of(self.board, self.knowledge['food'], self.costs, self.use_diagonal)
+
+    def follow_flow(self):
+        """
+        Move the ant by one square toward the nearest known food (or away from its food square toward another one)
+        """
+        if len(self.knowledge['food']) == 0:
+            return
+
+        step = self.get_flow_field().next_step(self.x, self.y)
+        if step is not None:
+            self.x, self.y = step
+
     def reset(self):
         """
         Reset the ant including goal, path and position
         """
         self.goal = None
         self.path = []
+        self.planner = None
         self.x = 0
         self.y = 0
 
@@ -182,6 +234,10 @@ class Gatherer(DumbScouter):
         """
         Move ant towards set goal or compute a new goal if needed
         """
+        self.waiting = False
+        if self.flow_field:
+            self.follow_flow()
+            return
 
         # Scouter has no more goal
         if self.goal is None or self.goal not in self.knowledge['food']:
@@ -196,11 +252,18 @@ class Gatherer(DumbScouter):
         # TODO Light compute could be integrated by only checking if next move is an autorized move
         #  and otherwise recalculate
         if len(self.path) == 0 or not self.light_compute:
-            self.best_way_to()
+            budget = self.knowledge.get('planning_budget')
+            if budget is None:
+                self.best_way_to()
+            elif not budget.search(self, self.best_way_to):
+                # No search left in this tick: follow the previous path or wait for the next tick
+                self.waiting = len(self.path) == 0
+                if self.waiting:
+                    return
 
             # No path found, search another goal next time
             if len(self.path) == 0:
-                self.goal = None
+                self.give_up_goal()
                 return
 
         # Move the ant by one square
@@ -0,0 +1,498 @@
+# Copyright (C) 2019 - UMons
+# 
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+# 
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+# 
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+import heapq
+import math
+import weakref
+import numpy as np
+
+from simulation.board import Board
+from simulation.logic.astar import AStar
+from simulation.logic.cost_field import CostField
+
+
+class HPAStar:
+    """
+    Hierarchical path search on a whole board (HPA*), with the same cost model as AStar.
+    The board is cut into square tiles. Entrances are placed on walkable runs of tile borders and the costs between
+    entrances of a same tile are precomputed. A search first goes through this abstract graph, then refines the path
+    with AStar inside the corridor of tiles it crosses, widened by a number of tiles given as path quality.
+    Tiles are refreshed only when the sum of their square weights changes has reached WEIGHT_TOLERANCE of their
+    total weight, or when one of their squares has become walkable or non walkable, only tiles of board regions
+    modified since the last refresh being checked (see Board.region_versions). Costs between entrances of a
+    refreshed tile are computed again only when a search goes through it.
+    A search is shared by all ants with the same parameters.
+    """
+
+    SEARCHES = weakref.WeakKeyDictionary()  # Searches of each board, by cost function, diagonal moves and tile size
+    WEIGHT_TOLERANCE = 0.05  # Relative tile weight change needed to refresh a tile
+    ENTRANCE_SPLIT = 6  # Length of a border run from which two entrances are placed (at both ends) instead of one
+
+    def __init__(self, board, costs, use_diagonal=True, tile_size=16):
+        """
+        :param board: A board class instance
+        :param costs: a vectorized function giving costs from arrays of blob quantities and touched flags
+        :param use_diagonal: boolean set to true if diagonal moves are available
+        :param tile_size: width and height of the tiles, in board squares
+        """
+        self.board = board
+        self.costs = costs
+        self.use_diagonal = use_diagonal
+        self.moves = AStar.STRAIGHT_MOVES + AStar.DIAGONAL_MOVES if use_diagonal else AStar.STRAIGHT_MOVES
+        self.tile_size = tile_size
+
+        self.weights = None  # Square weights used by the abstract graph, indexed by [y, x]
+        self.weights_list = None
+        self.board_version = None
+        self.region_versions = None  # Board region versions at the last refresh
+        self.borders = dict()  # Transitions (square pairs) between a tile and its right or bottom neighbor tile
+        self.nodes = dict()  # Entrance squares of each tile
+        self.partners = dict()  # Squares reached from an entrance square by crossing a tile border
+        self.maps = dict()  # Costs from each entrance square of a tile to every square of the tile (see tile_maps)
+        self.edges = dict()  # Costs from an entrance square to the other entrances of its tile, read from tile maps
+        self.indexes = dict()  # Flat index of each entrance square inside its tile
+
+    @staticmethod
+    def of(board, costs, use_diagonal=True, tile_size=16):
+        """
+        :param board: A board class instance
+        :param costs: a vectorized function giving costs from arrays of blob quantities and touched flags
+        :param use_diagonal: boolean set to true if diagonal moves are available
+        :param tile_size: width and height of the tiles, in board squares
+        :return: the hierarchical search shared by ants with the same parameters
+        """
+        searches = HPAStar.SEARCHES.setdefault(board, dict())
+        if (costs, use_diagonal, tile_size) not in searches:
+            searches[(costs, use_diagonal, tile_size)] = HPAStar(board, costs, use_diagonal, tile_size)
+        return searches[(costs, use_diagonal, tile_size)]
+
+    def tiles_shape(self):
+        """
+        :return: the number of tiles along board width and height
+        """
+        return -(-self.board.width // self.tile_size), -(-self.board.height // self.tile_size)
+
+    def tile_of(self, square):
+        """
+        :param square: a x,y tuple coordinate
+        :return: the tx,ty tuple coordinate of the tile containing the square
+        """
+        return square[0] // self.tile_size, square[1] // self.tile_size
+
+    def tile_bounds(self, tile):
+        """
+        :param tile: a tx,ty tuple coordinate of a tile
+        :return: the x0, y0, x1, y1 rectangle of the tile (x1 and y1 excluded)
+        """
+        x0, y0 = tile[0] * self.tile_size, tile[1] * self.tile_size
+        return x0, y0, min(self.board.width, x0 + self.tile_size), min(self.board.height, y0 + self.tile_size)
+
+    def tiles_sum(self, values):
+        """
+        :param values: an array indexed by [y, x] with board shape
+        :return: the array of value sums over each tile, indexed by [ty, tx]
+        """
+        tiles = np.add.reduceat(values, np.arange(0, self.board.height, self.tile_size), axis=0)
+        return np.add.reduceat(tiles, np.arange(0, self.board.width, self.tile_size), axis=1)
+
+    def tiles_of(self, mask):
+        """
+        :param mask: a boolean array indexed by [y, x] with board shape
+        :return: the set of tiles having at least one True square in mask
+        """
+        return {(tx, ty) for ty, tx in np.argwhere(self.tiles_sum(mask.astype(int)) > 0).tolist()}
+
+    def refresh(self):
+        """
+        Bring the abstract graph up to date with the board, only on changed tiles
+        """
+        if self.board_version == self.board.version:
+            return
+        self.board_version = self.board.version
+
+        matrix = CostField.window(self.board, self.costs, 0, 0, self.board.width, self.board.height)
+        if self.weights is None or self.weights.shape != matrix.shape:
+            self.weights = matrix.astype(int)
+            width, height = self.tiles_shape()
+            dirty = {(tx, ty) for tx in range(width) for ty in range(height)}
+            walkability = set(dirty)
+            self.borders, self.nodes, self.partners = dict(), dict(), dict()
+            self.maps, self.edges, self.indexes = dict(), dict(), dict()
+        else:
+            # Tiles outside modified regions keep the weights checked at the last refresh
+            tiles = self.tiles_of_regions(self.board.region_versions != self.region_versions)
+            if len(tiles) == 0:
+                self.region_versions = self.board.region_versions.copy()
+                return
+
+            dirty, walkability = self.changed_tiles(matrix, tiles)
+            for tile in dirty:
+                x0, y0, x1, y1 = self.tile_bounds(tile)
+                self.weights[y0:y1, x0:x1] = matrix[y0:y1, x0:x1]
+        self.region_versions = self.board.region_versions.copy()
+        if len(dirty) == 0:
+            return
+        self.weights_list = self.weights.ravel().tolist()
+
+        # Entrances only depend on walkability, they change on borders of tiles whose walkability changed
+        width, height = self.tiles_shape()
+        changed_borders = set()
+        for tx, ty in walkability:
+            for border in (((tx - 1, ty), (tx, ty)), ((tx, ty), (tx + 1, ty)),
+                           ((tx, ty - 1), (tx, ty)), ((tx, ty), (tx, ty + 1))):
+                if all(0 <= bx < width and 0 <= by < height for bx, by in border):
+                    changed_borders.add(border)
+        for border in changed_borders:
+            self.borders[border] = self.find_transitions(*border)
+
+        for tile in {tile for border in changed_borders for tile in border}:
+            self.update_nodes(tile)
+
+        # Costs inside changed tiles are computed again only when a search needs them
+        for tile in dirty:
+            self.forget_costs(tile)
+
+    def tiles_of_regions(self, regions):
+        """
+        :param regions: a boolean array with the shape of board regions (see Board.regions_shape)
+        :return: the set of tiles overlapping a True region
+        """
+        width, height = self.tiles_shape()
+        tiles = set()
+        for rx, ry in np.argwhere(regions).tolist():
+            x0, y0 = rx * Board.REGION_SIZE // self.tile_size, ry * Board.REGION_SIZE // self.tile_size
+            x1 = min(width, ((rx + 1) * Board.REGION_SIZE - 1) // self.tile_size + 1)
+            y1 = min(height, ((ry + 1) * Board.REGION_SIZE - 1) // self.tile_size + 1)
+            tiles.update((tx, ty) for tx in range(x0, x1) for ty in range(y0, y1))
+        return tiles
+
+    def changed_tiles(self, matrix, tiles):
+        """
+        :param matrix: the up to date pathfinding matrix of the board, indexed by [y, x]
+        :param tiles: the set of tiles to check
+        :return: the set of tiles to refresh among them, and the set of tiles among those whose walkability changed
+        """
+        width, height = self.tiles_shape()
+        if 4 * len(tiles) > width * height:
+            # Most tiles are checked, all at once
+            current = matrix.astype(int)
+            walkable_changes = (current >= 1) != (self.weights >= 1)
+            changes = self.tiles_sum(np.abs(current - self.weights)) > HPAStar.WEIGHT_TOLERANCE * self.tiles_sum(
+                self.weights)
+            walkability = self.tiles_of(walkable_changes) & tiles
+            return walkability | {(tx, ty) for ty, tx in np.argwhere(changes).tolist()} & tiles, walkability
+
+        dirty, walkability = set(), set()
+        for tile in tiles:
+            x0, y0, x1, y1 = self.tile_bounds(tile)
+            current, weights = matrix[y0:y1, x0:x1].astype(int), self.weights[y0:y1, x0:x1]
+            if np.any((current >= 1) != (weights >= 1)):
+                walkability.add(tile)
+                dirty.add(tile)
+            elif np.sum(np.abs(current - weights)) > HPAStar.WEIGHT_TOLERANCE * np.sum(weights):
+                dirty.add(tile)
+        return dirty, walkability
+
+    def find_transitions(self, tile_a, tile_b):
+        """
+        :param tile_a: the tx,ty tuple coordinate of a tile
+        :param tile_b: the tx,ty tuple coordinate of its right or bottom neighbor tile
+        :return: the list of square pairs (one in each tile) placed on walkable runs of the shared border,
+            with diagonal pairs too if diagonal moves are available
+        """
+        ax0, ay0, ax1, ay1 = self.tile_bounds(tile_a)
+        bx0, by0, bx1, by1 = self.tile_bounds(tile_b)
+        if tile_a[1] == tile_b[1]:
+            sides = [((ax1 - 1, y), (bx0, y)) for y in range(ay0, ay1)]
+        else:
+            sides = [((x, ay1 - 1), (x, by0)) for x in range(ax0, ax1)]
+
+        def walkable(square):
+            return self.weights[square[1], square[0]] >= 1
+
+        offsets = (-1, 0, 1) if self.use_diagonal else (0,)
+        transitions = []
+        run = []
+        for i in range(len(sides) + 1):
+            pairs = []
+            if i < len(sides) and walkable(sides[i][0]):
+                pairs = [(sides[i][0], sides[i + offset][1]) for offset in offsets
+                         if 0 <= i + offset < len(sides) and walkable(sides[i + offset][1])]
+            if len(pairs) > 0:
+                run.append(pairs)
+            elif len(run) > 0:
+                if len(run) >= HPAStar.ENTRANCE_SPLIT:
+                    transitions.extend(run[0] + run[-1])
+                else:
+                    transitions.extend(run[len(run) // 2])
+                run = []
+        return transitions
+
+    def update_nodes(self, tile):
+        """
+        Compute again entrance squares of a tile and their partners, from the transitions on its borders
+        :param tile: the tx,ty tuple coordinate of a tile
+        """
+        tx, ty = tile
+        for node in self.nodes.get(tile, ()):
+            self.partners.pop(node, None)
+
+        nodes = []
+        for border in (((tx - 1, ty), tile), (tile, (tx + 1, ty)), ((tx, ty - 1), tile), (tile, (tx, ty + 1))):
+            for square_a, square_b in self.borders.get(border, ()):
+                node, partner = (square_a, square_b) if border[0] == tile else (square_b, square_a)
+                if node not in self.partners:
+                    self.partners[node] = []
+                    nodes.append(node)
+                self.partners[node].append(partner)
+
+        # Costs are computed from each entrance of the tile, they are computed again if entrances changed
+        if nodes != self.nodes.get(tile):
+            self.forget_costs(tile)
+        for node in self.nodes.get(tile, ()):
+            if node not in self.partners:
+                self.indexes.pop(node, None)
+        for node in nodes:
+            self.indexes[node] = self.local_index(node)
+        self.nodes[tile] = nodes
+
+    def forget_costs(self, tile):
+        """
+        Drop costs computed inside a tile
+        :param tile: the tx,ty tuple coordinate of a tile
+        """
+        self.maps.pop(tile, None)
+        for node in self.nodes.get(tile, ()):
+            self.edges.pop(node, None)
+
+    def tile_maps(self, tile):
+        """
+        Costs from all entrance squares of a tile at once, relaxing every move over the whole tile until no cost
+        decreases (the same costs as tile_costs, computed with array operations)
+        :param tile: the tx,ty tuple coordinate of a tile
+        :return: an array of costs indexed by [entrance, y - y0, x - x0], entrances being in the tile nodes order
+        """
+        if tile in self.maps:
+            return self.maps[tile]
+
+        x0, y0, x1, y1 = self.tile_bounds(tile)
+        width, height = x1 - x0, y1 - y0
+        weights = self.weights[y0:y1, x0:x1]
+        nodes = self.nodes.get(tile, ())
+
+        costs = np.full((len(nodes), height, width), math.inf)
+        for i, (x, y) in enumerate(nodes):
+            costs[i, y - y0, x - x0] = 0
+
+        # Moving by (dx, dy) costs the step times the weight of the entered square
+        entering = np.where(weights >= 1, weights, math.inf)
+        moves = [(costs[:, max(0, -dy):height - max(0, dy), max(0, -dx):width - max(0, dx)],
+                  costs[:, max(0, dy):height + min(0, dy), max(0, dx):width + min(0, dx)],
+                  step * entering[max(0, dy):height + min(0, dy), max(0, dx):width + min(0, dx)])
+                 for dx, dy, step in self.moves]
+        previous = np.full_like(costs, math.nan)
+        while len(nodes) > 0 and not np.array_equal(previous, costs):
+            previous[...] = costs
+            for sources, destinations, step_costs in moves:
+                np.minimum(destinations, sources + step_costs, out=destinations)
+
+        self.maps[tile] = costs
+        return costs
+
+    def node_edges(self, node):
+        """
+        :param node: a x,y tuple coordinate of an entrance square
+        :return: the list of (entrance square, cost) tuples from the entrance square to the other entrances
+            of its tile, kept until the tile is refreshed
+        """
+        if node not in self.edges:
+            tile = self.tile_of(node)
+            nodes = self.nodes[tile]
+            costs = self.tile_maps(tile)[nodes.index(node)].ravel().tolist()
+            self.edges[node] = [(other, costs[self.indexes[other]]) for other in nodes if other != node]
+        return self.edges[node]
+
+    def node_cost(self, node, index):
+        """
+        :param node: a x,y tuple coordinate of an entrance square
+        :param index: the flat index of a square inside the tile of the entrance (see local_index)
+        :return: the cost from the entrance square to this square
+        """
+        tile = self.tile_of(node)
+        return float(self.tile_maps(tile)[self.nodes[tile].index(node)].ravel()[index])
+
+    def tile_costs(self, square, targets=None):
+        """
+        Dijkstra search restricted to the tile of a square
+        :param square: a x,y tuple coordinate
+        :param targets: tile flat indices of the squares whose costs are needed, None for all squares of the tile
+        :return: the list of costs from the square to every square of its tile, by tile flat index
+            ((y - y0) * tile width + x - x0), only exact for targets (the search stops once they are all reached)
+        """
+        x0, y0, x1, y1 = self.tile_bounds(self.tile_of(square))
+        width, height = x1 - x0, y1 - y0
+        board_width = self.board.width
+        weights = self.weights_list
+
+        costs = [math.inf] * (width * height)
+        start = (square[1] - y0) * width + square[0] - x0
+        costs[start] = 0
+        frontier = [(0, start)]
+        remaining = None if targets is None else set(targets)
+        while len(frontier) > 0:
+            cost, index = heapq.heappop(frontier)
+            if cost > costs[index]:
+                continue
+            if remaining is not None:
+                remaining.discard(index)
+                if len(remaining) == 0:
+                    break
+
+            y, x = divmod(index, width)
+            for dx, dy, step in self.moves:
+                nx, ny = x + dx, y + dy
+                if 0 <= nx < width and 0 <= ny < height:
+                    weight = weights[(ny + y0) * board_width + nx + x0]
+                    if weight >= 1 and cost + step * weight < costs[ny * width + nx]:
+                        costs[ny * width + nx] = cost + step * weight
+                        heapq.heappush(frontier, (cost + step * weight, ny * width + nx))
+        return costs
+
+    def local_index(self, square):
+        """
+        :param square: a x,y tuple coordinate
+        :return: the flat index of the square inside its tile
+        """
+        x0, y0, x1, y1 = self.tile_bounds(self.tile_of(square))
+        return (square[1] - y0) * (x1 - x0) + square[0] - x0
+
+    def heuristic(self, a, b):
+        """
+        :param a: a x,y tuple coordinate
+        :param b: another x,y tuple coordinate
+        :return: the estimated cost between both squares
+        """
+        dx, dy = abs(a[0] - b[0]), abs(a[1] - b[1])
+        if not self.use_diagonal:
+            return dx + dy
+        elif dx < dy:
+            return (AStar.SQRT2 - 1) * dx + dy
+        else:
+            return (AStar.SQRT2 - 1) * dy + dx
+
+    def abstract_path(self, start, end):
+        """
+        Search the abstract graph of entrances between start and end squares
+        :param start: the x,y tuple coordinate of the start square
+        :param end: the x,y tuple coordinate of the end square
+        :return: the list of squares of the abstract path (start and end included), None if there is none
+        """
+        start_tile, end_tile = self.tile_of(start), self.tile_of(end)
+        end_index = self.local_index(end)
+        targets = [self.indexes[node] for node in self.nodes.get(start_tile, ())]
+        start_costs = self.tile_costs(start, targets + [end_index] if start_tile == end_tile else targets)
+        start_edges = [(node, start_costs[self.indexes[node]]) for node in self.nodes.get(start_tile, ())
+                       if node != start]
+
+        def neighbors(square):
+            if square == start:
+                tile, edges = start_tile, start_edges
+            else:
+                tile, edges = self.tile_of(square), self.node_edges(square)
+            for partner in self.partners.get(square, ()):
+                step = 1 if partner[0] == square[0] or partner[1] == square[1] else AStar.SQRT2
+                yield partner, step * self.weights_list[partner[1] * self.board.width + partner[0]]
+            yield from edges
+            if tile == end_tile:
+                yield end, start_costs[end_index] if square == start else self.node_cost(square, end_index)
+
+        g_scores = {start: 0}
+        parents = {start: None}
+        closed = set()
+        frontier = [(self.heuristic(start, end), 0, start)]
+        pushed = 1
+        while len(frontier) > 0:
+            square = heapq.heappop(frontier)[2]
+            if square in closed:
+                continue
+            closed.add(square)
+
+            if square == end:
+                path = []
+                while square is not None:
+                    path.append(square)
+                    square = parents[square]
+                return path[::-1]
+
+            for neighbor, cost in neighbors(square):
+                score = g_scores[square] + cost
+                if cost < math.inf and neighbor not in closed and score < g_scores.get(neighbor, math.inf):
+                    g_scores[neighbor] = score
+                    parents[neighbor] = square
+                    heapq.heappush(frontier, (score + self.heuristic(neighbor, end), pushed, neighbor))
+                    pushed += 1
+        return None
+
+    def refine(self, tiles, start, end, quality):
+        """
+        Search the path with AStar inside a corridor of tiles
+        :param tiles: the set of tx,ty tuple coordinates of the corridor tiles
+        :param start: the x,y tuple coordinate of the start square
+        :param end: the x,y tuple coordinate of the end square
+        :param quality: number of tiles added around the corridor
+        :return: the list of x,y tuple coordinates from start to end (both included), empty if there is none
+        """
+        width, height = self.tiles_shape()
+        corridor = np.zeros((height, width), dtype=bool)
+        for tx, ty in tiles:
+            corridor[max(0, ty - quality):ty + quality + 1, max(0, tx - quality):tx + quality + 1] = True
+        squares = np.repeat(np.repeat(corridor, self.tile_size, axis=0), self.tile_size, axis=1)
+        squares = squares[:self.board.height, :self.board.width]
+
+        # Search only inside the corridor bounding box
+        ys, xs = np.nonzero(corridor)
+        x0, y0 = int(xs.min()) * self.tile_size, int(ys.min()) * self.tile_size
+        x1, y1 = (int(xs.max()) + 1) * self.tile_size, (int(ys.max()) + 1) * self.tile_size
+        matrix = CostField.window(self.board, self.costs, x0, y0, min(x1, self.board.width), min(y1, self.board.height))
+        window = np.where(squares[y0:y1, x0:x1], matrix, 0)
+        path = AStar(self.use_diagonal).find_path(window, (start[0] - x0, start[1] - y0), (end[0] - x0, end[1] - y0))
+        return [(x + x0, y + y0) for x, y in path]
+
+    def find_path(self, start, end, quality=1):
+        """
+        :param start: the x,y tuple coordinate of the start square
+        :param end: the x,y tuple coordinate of the end square
+        :param quality: number of tiles added around the abstract path corridor to refine it
+            (0 for the fastest search, higher values give paths closer to the shortest one)
+        :return: the list of x,y tuple coordinates from start to end (both included), empty if end can't be reached
+        """
+        start, end = tuple(start), tuple(end)
+        start_tile, end_tile = self.tile_of(start), self.tile_of(end)
+
+        # Close squares don't need the abstract graph, unless the path has to go around
+        if abs(start_tile[0] - end_tile[0]) <= 1 and abs(start_tile[1] - end_tile[1]) <= 1:
+            path = self.refine({start_tile, end_tile}, start, end, quality)
+            if len(path) > 0:
+                return path
+
+        self.refresh()
+        abstract = self.abstract_path(start, end)
+        if abstract is None:
+            # Abstract graph ignores diagonal moves across tile corners, check without it
+            matrix = CostField.window(self.board, self.costs, 0, 0, self.board.width, self.board.height)
+            return AStar(self.use_diagonal).find_path(matrix, start, end)
+
+        return self.refine({self.tile_of(square) for square in abstract}, start, end, quality)
@@ -0,0 +1,102 @@
+# Copyright (C) 2019 - UMons
+# 
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+# 
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+# 
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+import collections
+import weakref
+
+from simulation.logic.astar import AStar
+from simulation.logic.cost_field import CostField
+from simulation.logic.hpa_star import HPAStar
+
+
+class PathCache:
+    """
+    Bounded LRU cache of paths found by AStar (or HPAStar for whole board searches) on a board, shared by all ants.
+    A path is keyed by its start, goal, search window, cost function, diagonal moves and hierarchical search
+    parameters, and stays valid as long as no board region overlapping its window has been modified
+    (see Board.region_version).
+    """
+
+    CACHES = weakref.WeakKeyDictionary()  # Cache of each board
+    MAX_SIZE = 4096  # Number of paths kept
+
+    def __init__(self, max_size=MAX_SIZE):
+        """
+        :param max_size: number of paths kept, the least recently used ones are dropped first
+        """
+        self.max_size = max_size
+        self.paths = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def of(board):
+        """
+        :param board: A board class instance
+        :return: the path cache shared by all ants on this board
+        """
+        if board not in PathCache.CACHES:
+            PathCache.CACHES[board] = PathCache()
+        return PathCache.CACHES[board]
+
+    def find_path(self, board, costs, use_diagonal, x0, y0, x1, y1, start, end, tile_size=0, path_quality=1):
+        """
+        Return the path found by AStar in the rectangle given by (x0,y0) and (x1,y1), from the cache if still valid.
+        Searches in the whole board go through HPAStar if a tile size is given
+        :param board: A board class instance
+        :param costs: a vectorized function giving costs from arrays of blob quantities and touched flags
+        :param use_diagonal: boolean set to true if diagonal moves are available
+        :param x0: the x coordinate of the up left corner of the rectangle
+        :param y0: the y coordinate of the up left corner of the rectangle
+        :param x1: the x coordinate of the bottom right corner of the rectangle (excluded)
+        :param y1: the y coordinate of the bottom right corner of the rectangle (excluded)
+        :param start: the x,y tuple coordinate of the start square, relative to the rectangle
+        :param end: the x,y tuple coordinate of the end square, relative to the rectangle
+        :param tile_size: width and height of the HPAStar tiles, 0 to search with AStar only
+        :param path_quality: number of tiles added around the HPAStar corridor (see HPAStar.find_path)
+        :return: the list of x,y tuple coordinates (relative to the rectangle) from start to end, both included
+            (empty if end can't be reached). The list is shared and must not be modified
+        """
+        hierarchical = tile_size > 0 and (x0, y0, x1, y1) == (0, 0, board.width, board.height)
+        key = (tuple(start), tuple(end), x0, y0, x1, y1, costs, use_diagonal,
+               (tile_size, path_quality) if hierarchical else None)
+        version = board.region_version(x0, y0, x1, y1)
+
+        entry = self.paths.get(key)
+        if entry is not None and entry[0] == version:
+            self.paths.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        if hierarchical:
+            path = HPAStar.of(board, costs, use_diagonal, tile_size).find_path(start, end, path_quality)
+        else:
+            path = AStar(use_diagonal).find_path(CostField.window(board, costs, x0, y0, x1, y1), start, end)
+
+        self.paths[key] = (version, path)
+        self.paths.move_to_end(key)
+        if len(self.paths) > self.max_size:
+            self.paths.popitem(last=False)
+
+        return path
+
+    def hit_ratio(self):
+        """
+        :return: the ratio of paths found in the cache since its creation (0 if no path has been asked)
+        """
+        total = self.hits + self.misses
+        return self.hits / total if total > 0 else 0
@@ -0,0 +1,84 @@
+# Copyright (C) 2019 - UMons
+# 
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+# 
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+# 
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+import time
+
+
+class PlanningBudget:
+    """
+    Budget of path searches shared by all ants of a colony for one tick, to bound the tick duration when many ants
+    need a new path at once. The budget is a number of searches and/or a duration (0 for no limit).
+    Ants denied a search during a tick are served first during the next one: managers move them before the other
+    ants (see prioritized).
+    """
+
+    def __init__(self, searches=0, milliseconds=0):
+        """
+        :param searches: maximum number of path searches in a tick, 0 for no limit
+        :param milliseconds: maximum time spent in path searches in a tick (a started search always ends),
+            0 for no limit
+        """
+        self.searches = searches
+        self.milliseconds = milliseconds
+
+        self.done = 0  # Searches done in the current tick
+        self.elapsed = 0  # Seconds spent in searches in the current tick
+        self.priority = set()  # Ants denied a search during the previous tick
+        self.denied = set()  # Ants denied a search during the current tick
+
+    def new_tick(self):
+        """
+        Renew the budget for a new tick
+        """
+        self.done = 0
+        self.elapsed = 0
+        self.priority = self.denied
+        self.denied = set()
+
+    def exhausted(self):
+        """
+        :return: True if no search is left in the current tick
+        """
+        return (self.searches > 0 and self.done >= self.searches) \
+            or (self.milliseconds > 0 and self.elapsed * 1000 >= self.milliseconds)
+
+    def prioritized(self, ants, key):
+        """
+        :param ants: a list of ants
+        :param key: a function giving the key used by an ant to ask for a search
+        :return: the ants denied a search during the previous tick first, then the other ones, in the given order
+        """
+        if len(self.priority) == 0:
+            return ants
+        first = [ant for ant in ants if key(ant) in self.priority]
+        return first + [ant for ant in ants if key(ant) not in self.priority]
+
+    def search(self, ant, function):
+        """
+        Run a path search if the budget allows it
+        :param ant: a hashable key of the ant asking for a search
+        :param function: a function without parameters doing the search
+        :return: True if the search has been done, False if the ant has to wait for the next tick
+        """
+        if self.exhausted():
+            self.denied.add(ant)
+            return False
+
+        start = time.perf_counter()
+        function()
+        self.elapsed += time.perf_counter() - start
+        self.done += 1
+        return True
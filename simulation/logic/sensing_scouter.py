@@ -16,18 +16,19 @@
 
 import numpy as np
 
-from pathfinding.core.diagonal_movement import DiagonalMovement
-from pathfinding.core.grid import Grid
-from pathfinding.finder.a_star import AStarFinder
-
 from simulation.board import Board
+from simulation.logic.cost_field import CostField
+from simulation.logic.dstar_lite import DStarLite
 from simulation.logic.dumb_scouter import DumbScouter
+from simulation.logic.path_cache import PathCache
+from simulation.logic.unreachable_goals import UnreachableGoals
 
 
 class SensingScouter(DumbScouter):
     """ An ant with goal is to explore unknown (or non-touched) square """
 
-    def __init__(self, board, knowledge, x, y, use_diagonal=False, sightline=-1, light_compute=True):
+    def __init__(self, board, knowledge, x, y, use_diagonal=False, sightline=-1, light_compute=True,
+                 incremental=False):
         """
         :param board: A board class instance
         :param knowledge: a dict containing all blob knowledge and set up
@@ -36,60 +37,115 @@ class SensingScouter(DumbScouter):
         :param use_diagonal: boolean set to true if diagonal moves are available
         :param sightline: size of the ant sightline, used to compute goal decision
         :param light_compute: boolean set to true if path is computing only once and then memorized until reaching goal
+        :param incremental: boolean set to true if the ant keeps an incremental planner (see DStarLite) for its goal
+            and repairs it instead of searching again its path from scratch
         """
         DumbScouter.__init__(self, board, knowledge, x, y)
 
         self.use_diagonal = use_diagonal
         self.sightline = sightline if sightline > 0 else 1
         self.light_compute = light_compute
+        self.incremental = incremental
         self.goal = None
         self.path = []
+        self.planner = None
+        self.whole_board = False  # True if the last path search covered the whole board
+        self.batch = None  # Minimal squares of a batch of ants (see minimal_squares) and index of the ant inside it
+
+    @staticmethod
+    def costs(blob, touched):
+        """
+        :param blob: array of blob quantities
+        :param touched: array of touched flags
+        :return: array of pathfinding costs for these squares
+        """
+        return np.where(blob > 0, (1 + Board.MAX_BLOB - blob) * 1.5, np.where(touched, Board.MAX_BLOB * 2, 1))
 
     def get_matrix(self, x0, y0, x1, y1):
         """
-        Compute and return a pathfinding matrix filled with board squares values
-        in the rectangle given by (x0,y0) and (x1,y1)
+        Return a pathfinding matrix filled with board squares values
+        in the rectangle given by (x0,y0) and (x1,y1), sliced from the cost field shared by all ants
         :param x0: the x coordinate of the up left corner of the rectangle
         :param y0: the y coordinate of the up left corner of the rectangle
         :param x1: the x coordinate of the bottom right corner of the rectangle
         :param y1: the x coordinate of the bottom right corner of the rectangle
         """
-        width = x1 - x0
-        height = y1 - y0
-        matrix = np.zeros((width, height))
-
-        for y in range(height):
-            for x in range(width):
-                if self.board.get_blob(x0 + x, y0 + y) > 0:
-                    matrix[x, y] = (1 + Board.MAX_BLOB - self.board.get_blob(x0 + x, y0 + y)) * 1.5
-                elif self.board.is_touched(x0 + x, y0 + y):
-                    matrix[x, y] = Board.MAX_BLOB * 2
-                else:
-                    matrix[x, y] = 1
+        return CostField.window(self.board, self.costs, x0, y0, x1, y1)
 
-        return np.transpose(matrix)
+    def minimal_squares(self, xs, ys):
+        """
+        Batched search of the squares with minimal blob quantity inside the sightline of several ants
+        (the square of an ant excluded)
+        :param xs: array of horizontal positions of ants
+        :param ys: array of vertical positions of ants
+        :return: arrays of x and y coordinates of minimal squares of all ants, one ant after the other
+            (ordered by x then y for each ant), and the array of indices where squares of each ant start
+            (with one more index at the end)
+        """
+        xs, ys = np.asarray(xs, dtype=int), np.asarray(ys, dtype=int)
+        offsets = np.arange(-self.sightline, self.sightline + 1)
+        window_xs = xs[:, None] + offsets
+        window_ys = ys[:, None] + offsets
+        inside = ((window_xs >= 0) & (window_xs < self.board.width))[:, :, None] \
+            & ((window_ys >= 0) & (window_ys < self.board.height))[:, None, :]
+        inside[:, self.sightline, self.sightline] = False
+
+        # Gather all windows at once, squares outside board or under ants are never minimal
+        blob = self.board.dropped_blob[np.clip(window_xs, 0, self.board.width - 1)[:, :, None],
+                                       np.clip(window_ys, 0, self.board.height - 1)[:, None, :]]
+        blob = np.where(inside, blob, np.inf)
+        minimal = inside & (blob == np.min(blob, axis=(1, 2), keepdims=True))
+
+        ants, dx, dy = np.nonzero(minimal)
+        starts = np.concatenate(([0], np.cumsum(np.bincount(ants, minlength=len(xs)))))
+        return xs[ants] + offsets[dx], ys[ants] + offsets[dy], starts
 
     def choose_goal(self):
         """
-        :return: a new goal for ant, based on unreached known food
+        :return: a new goal for ant, based on unreached known food (and not known as unreachable from the ant)
+        """
+        if self.batch is None:
+            squares_x, squares_y, starts = self.minimal_squares([self.x], [self.y])
+            i = 0
+        else:
+            squares_x, squares_y, starts, i = self.batch
+
+        choices = range(starts[i], starts[i + 1])
+        unreachable = UnreachableGoals.of(self.board, self.costs, self.use_diagonal).from_square(self.x, self.y)
+        if len(unreachable) != 0:
+            choices = [j for j in choices if (int(squares_x[j]), int(squares_y[j])) not in unreachable]
+
+        if len(choices) == 0:
+            # Every minimal square is known as unreachable, the next best squares are tried instead
+            return self.reachable_minimal_square(unreachable)
+        else:
+            j = choices[np.random.randint(len(choices))]
+            return squares_x[j], squares_y[j]
+
+    def reachable_minimal_square(self, unreachable):
+        """
+        :param unreachable: set of x,y tuple coordinates of goals known as unreachable from the ant
+        :return: a square with minimal blob quantity inside the sightline of the ant among the squares not known as
+            unreachable (the square of the ant excluded), None if there is none
         """
         x0, y0 = max(0, self.x - self.sightline), max(0, self.y - self.sightline)
         x1, y1 = min(self.board.width, self.x + self.sightline + 1), min(self.board.height, self.y + self.sightline + 1)
 
-        mask = np.zeros((x1 - x0, y1 - y0), dtype=bool)
-        mask[self.x - x0, self.y - y0] = True
-        see = np.ma.masked_where(mask, self.board.dropped_blob[x0:x1, y0:y1])
-        min_indices = np.ma.where(see == np.min(see))
+        blob = self.board.dropped_blob[x0:x1, y0:y1].astype(float)
+        blob[self.x - x0, self.y - y0] = np.inf
+        for x, y in unreachable:
+            if x0 <= x < x1 and y0 <= y < y1:
+                blob[x - x0, y - y0] = np.inf
 
-        if len(min_indices[0]) == 0:
+        if np.all(np.isinf(blob)):
             return None
-        else:
-            i = np.random.randint(len(min_indices[0]))
-            return min_indices[0][i] + x0, min_indices[1][i] + y0
+        xs, ys = np.nonzero(blob == np.min(blob))
+        j = np.random.randint(len(xs))
+        return int(xs[j]) + x0, int(ys[j]) + y0
 
     def best_way_to(self):
         """
-        Inside sightline, compute pathfinding matrix, set local goal, compute and store path
+        Inside sightline, set local goal, find (or get back from the shared PathCache) and store path
         """
         if self.sightline > 0:
             x0, y0 = max(0, self.x - self.sightline), max(0, self.y - self.sightline)
@@ -99,20 +155,31 @@ class SensingScouter(DumbScouter):
             x0, y0 = 0, 0
             x1, y1 = self.board.width, self.board.height
 
-        grid = Grid(matrix=self.get_matrix(x0, y0, x1, y1))
+        if self.incremental:
+            # The planner keeps the rectangle used for the first path to its goal
+            if self.planner is None or not self.planner.usable(self.goal, self.x, self.y):
+                self.planner = DStarLite(self.board, self.costs, self.use_diagonal, x0, y0, x1, y1, self.goal)
+            self.path = self.planner.find_path(self.x, self.y)
+            self.whole_board = (self.planner.x0, self.planner.y0, self.planner.x1, self.planner.y1) \
+                == (0, 0, self.board.width, self.board.height)
+            return
 
-        start = grid.node(self.x - x0, self.y - y0)
-        end = grid.node(self.goal[0] - x0, self.goal[1] - y0)
+        start = (self.x - x0, self.y - y0)
+        end = (self.goal[0] - x0, self.goal[1] - y0)
 
-        if self.use_diagonal:
-            finder = AStarFinder(diagonal_movement=DiagonalMovement.always)
-        else:
-            finder = AStarFinder(diagonal_movement=DiagonalMovement.never)
+        path = PathCache.of(self.board).find_path(self.board, self.costs, self.use_diagonal, x0, y0, x1, y1,
+                                                  start, end)
+        self.path = [(step[0] + x0, step[1] + y0) for step in path[1:]]
+        self.whole_board = (x0, y0, x1, y1) == (0, 0, self.board.width, self.board.height)
 
-        self.path, runs = finder.find_path(start, end, grid)
-        self.path = self.path[1:]
-        for i, step in enumerate(self.path):
-            self.path[i] = (step[0] + x0, step[1] + y0)
+    def give_up_goal(self):
+        """
+        Drop the current goal, remembered as unreachable from the ant region (see UnreachableGoals) if the failed
+        search covered the whole board
+        """
+        if self.whole_board:
+            UnreachableGoals.of(self.board, self.costs, self.use_diagonal).add(self.x, self.y, self.goal)
+        self.goal = None
 
     def reached(self, goal):
         """
@@ -125,27 +192,36 @@ class SensingScouter(DumbScouter):
         """
         Move ant towards set goal or compute a new goal if needed
         """
+        self.waiting = False
 
         # Scouter has no more goal
         if self.goal is None:  # or self.board.get_blob(self.goal[0], self.goal[1]) != 0:
             self.goal = self.choose_goal()
-            if self.goal[0] == self.x and self.goal[1] == self.y:
-                print("Shouldn't happen")
             self.path = []
 
             # No new goal found
             if self.goal is None:
                 return
 
+            if self.reached(self.goal):
+                print("Shouldn't happen")
+
         # Scouter has no more path to goal
         # TODO Light compute could be integrated by only checking if next move is an autorized move
         #  and otherwise recalculate
         if len(self.path) == 0 or not self.light_compute:
-            self.best_way_to()
+            budget = self.knowledge.get('planning_budget')
+            if budget is None:
+                self.best_way_to()
+            elif not budget.search(self, self.best_way_to):
+                # No search left in this tick: follow the previous path or wait for the next tick
+                self.waiting = len(self.path) == 0
+                if self.waiting:
+                    return
 
             # No path found, search another goal next time
             if len(self.path) == 0:
-                self.goal = None
+                self.give_up_goal()
                 return
 
         # Move the ant by one square
@@ -166,5 +242,6 @@ class SensingScouter(DumbScouter):
         """
         self.goal = None
         self.path = []
+        self.planner = None
         self.x = 0
         self.y = 0
@@ -0,0 +1,89 @@
+# Copyright (C) 2019 - UMons
+# 
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+# 
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+# 
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+import weakref
+import numpy as np
+
+
+class SummedArea:
+    """
+    Summed-area tables (integral images) of the blob quantities inside a rectangle of a board, giving the blob sum
+    of any rectangle inside it with four lookups.
+    Tables of a whole board are shared by all ants on this board and computed again only when the board version has
+    changed. Small rectangles get their own tables when the shared ones are not up to date.
+    Sums are computed with float64 and may be rounded (see max_error), while non empty squares counts are exact.
+    """
+
+    TABLES = weakref.WeakKeyDictionary()  # Whole board tables of each board
+    SHARE_RATIO = 0.25  # Part of the board from which a rectangle uses the whole board tables
+
+    def __init__(self, board, x0, y0, x1, y1):
+        """
+        :param board: A board class instance
+        :param x0: the x coordinate of the up left corner of the rectangle
+        :param y0: the y coordinate of the up left corner of the rectangle
+        :param x1: the x coordinate of the bottom right corner of the rectangle (excluded)
+        :param y1: the y coordinate of the bottom right corner of the rectangle (excluded)
+        """
+        blob = board.dropped_blob[x0:x1, y0:y1]
+        self.x0, self.y0 = x0, y0
+        self.version = board.version
+        self.sums = SummedArea.integral(blob.astype(float))
+        self.counts = SummedArea.integral((blob != 0).astype(int))
+        self.max_error = 4 * (blob.shape[0] + blob.shape[1]) * np.finfo(float).eps \
+            * float(np.sum(np.abs(blob), dtype=float))
+
+    @staticmethod
+    def of(board, x0, y0, x1, y1):
+        """
+        :param board: A board class instance
+        :param x0: the x coordinate of the up left corner of the rectangle
+        :param y0: the y coordinate of the up left corner of the rectangle
+        :param x1: the x coordinate of the bottom right corner of the rectangle (excluded)
+        :param y1: the y coordinate of the bottom right corner of the rectangle (excluded)
+        :return: up to date summed-area tables covering the rectangle
+        """
+        tables = SummedArea.TABLES.get(board)
+        if tables is not None and tables.version == board.version \
+                and (tables.sums.shape[0] - 1, tables.sums.shape[1] - 1) == (board.width, board.height):
+            return tables
+        elif (x1 - x0) * (y1 - y0) < SummedArea.SHARE_RATIO * board.width * board.height:
+            return SummedArea(board, x0, y0, x1, y1)
+
+        SummedArea.TABLES[board] = SummedArea(board, 0, 0, board.width, board.height)
+        return SummedArea.TABLES[board]
+
+    @staticmethod
+    def integral(values):
+        """
+        :param values: a 2D array
+        :return: its summed-area table, with a leading row and column of zeros
+        """
+        table = np.zeros((values.shape[0] + 1, values.shape[1] + 1), dtype=values.dtype)
+        table[1:, 1:] = np.cumsum(np.cumsum(values, axis=0), axis=1)
+        return table
+
+    def lookup(self, table, x0, y0, x1, y1):
+        """
+        :param table: one of the tables (sums or counts)
+        :param x0: array (or value) of x coordinates of the up left corners of rectangles
+        :param y0: array (or value) of y coordinates of the up left corners of rectangles
+        :param x1: array (or value) of x coordinates of the bottom right corners of rectangles (excluded)
+        :param y1: array (or value) of y coordinates of the bottom right corners of rectangles (excluded)
+        :return: the sums of the table values inside rectangles (coordinates arrays are broadcast together)
+        """
+        x0, y0, x1, y1 = x0 - self.x0, y0 - self.y0, x1 - self.x0, y1 - self.y0
+        return table[x1, y1] - table[x0, y1] - table[x1, y0] + table[x0, y0]
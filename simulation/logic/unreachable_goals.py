@@ -0,0 +1,103 @@
+# Copyright (C) 2019 - UMons
+# 
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+# 
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+# 
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+import weakref
+import numpy as np
+
+from simulation.board import Board
+
+
+class UnreachableGoals:
+    """
+    Goals for which no path has been found by a search over the whole board, remembered for the board region of
+    the ant which searched (a search limited to a rectangle may fail only because of the rectangle).
+    Walkable squares of ants only depend on touched flags, so a goal stays unreachable from a region until touched
+    flags change on the board (see Board.touched_version).
+    Goals are shared by all ants using the same costs and moves on the same board.
+    """
+
+    CACHES = weakref.WeakKeyDictionary()  # Goals of each board, by cost function and diagonal moves
+
+    def __init__(self, board):
+        """
+        :param board: A board class instance
+        """
+        self.board = board
+        self.goals = dict()  # Unreachable goals of each region, with the rectangle and touched version to check
+
+    @staticmethod
+    def of(board, costs, use_diagonal):
+        """
+        :param board: A board class instance
+        :param costs: a vectorized function giving costs from arrays of blob quantities and touched flags
+        :param use_diagonal: boolean set to true if diagonal moves are available
+        :return: the unreachable goals shared by ants with the same costs and moves
+        """
+        caches = UnreachableGoals.CACHES.setdefault(board, dict())
+        if (costs, use_diagonal) not in caches:
+            caches[(costs, use_diagonal)] = UnreachableGoals(board)
+        return caches[(costs, use_diagonal)]
+
+    def add(self, x, y, goal):
+        """
+        Remember a goal as unreachable from the region of an ant, after a failed search over the whole board
+        :param x: horizontal position of the ant
+        :param y: vertical position of the ant
+        :param goal: a x,y tuple coordinate of the goal
+        """
+        region = (x // Board.REGION_SIZE, y // Board.REGION_SIZE)
+        x0, y0, x1, y1 = 0, 0, self.board.width, self.board.height
+
+        goals = self.goals.setdefault(region, dict())
+        goals[(int(goal[0]), int(goal[1]))] = (x0, y0, x1, y1, self.board.touched_version(x0, y0, x1, y1))
+
+    def from_square(self, x, y):
+        """
+        :param x: horizontal position of an ant
+        :param y: vertical position of an ant
+        :return: the set of goals still unreachable from the region of the ant
+        """
+        region = (x // Board.REGION_SIZE, y // Board.REGION_SIZE)
+        goals = self.goals.get(region)
+        if goals is None:
+            return set()
+
+        for goal, (x0, y0, x1, y1, version) in list(goals.items()):
+            if self.board.touched_version(x0, y0, x1, y1) != version:
+                del goals[goal]
+        if len(goals) == 0:
+            del self.goals[region]
+        return set(goals)
+
+    def to_array(self):
+        """
+        :return: an integer array with one (region x, region y, goal x, goal y, x0, y0, x1, y1) row for each goal
+            still unreachable, x0, y0, x1, y1 being the rectangle checked for changes
+        """
+        rows = [region + goal + (x0, y0, x1, y1) for region, goals in self.goals.items()
+                for goal, (x0, y0, x1, y1, version) in goals.items()
+                if self.board.touched_version(x0, y0, x1, y1) == version]
+        return np.array(rows, dtype=int).reshape(-1, 8)
+
+    def restore(self, rows):
+        """
+        Replace remembered goals by the ones of an array given by to_array, as unreachable on the current board
+        :param rows: an integer array with one (region x, region y, goal x, goal y, x0, y0, x1, y1) row per goal
+        """
+        self.goals = dict()
+        for rx, ry, gx, gy, x0, y0, x1, y1 in np.asarray(rows, dtype=int).reshape(-1, 8).tolist():
+            goals = self.goals.setdefault((rx, ry), dict())
+            goals[(gx, gy)] = (x0, y0, x1, y1, self.board.touched_version(x0, y0, x1, y1))
@@ -148,9 +148,7 @@ class Player:
         else:
             y_offset = int(self.board.height/2)
 
-        for x in range(self.board.width):
-            for y in range(y_range):
-                self.board.reset(x, y_offset + y)
-                self.blob.reset(x, y_offset + y)
+        self.board.reset_region(0, y_offset, self.board.width, y_offset + y_range)
+        self.blob.reset_region(0, y_offset, self.board.width, y_offset + y_range)
 
         self.clean_top = not self.clean_top
@@ -0,0 +1,180 @@
+# Copyright (C) 2019 - UMons
+# 
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+# 
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+# 
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+import csv
+import json
+import time
+import numpy as np
+
+
+class PhaseTimer:
+    """ Context manager adding its duration to a phase of a profiler """
+
+    def __init__(self, profiler, name):
+        """
+        :param profiler: a Profiler instance
+        :param name: the name of the timed phase
+        """
+        self.profiler = profiler
+        self.name = name
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.add(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class TickTimer(PhaseTimer):
+    """ Context manager timing a whole tick of a profiler, phases timed meanwhile being summed over the tick """
+
+    def __init__(self, profiler):
+        """
+        :param profiler: a Profiler instance
+        """
+        PhaseTimer.__init__(self, profiler, "tick")
+
+    def __enter__(self):
+        self.profiler.current = dict()
+        return PhaseTimer.__enter__(self)
+
+    def __exit__(self, *exc):
+        self.profiler.end_tick(time.perf_counter() - self.start)
+        return False
+
+
+class NoTimer:
+    """ Context manager doing nothing, used when no profiler is active """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class Profiler:
+    """
+    Timers of the simulation phases. The active profiler (if any) is Profiler.ACTIVE, and the simulation code marks
+    its phases with "with Profiler.phase(name):" and its ticks with "with Profiler.tick():", which cost a function
+    call when no profiler is active.
+    Phases timed inside a tick are summed over the tick and give one sample per tick where they ran ("untimed" being
+    the rest of the tick), phases timed outside ticks (drawings, saves) give one sample per call.
+    """
+
+    ACTIVE = None  # Profiler used by the simulation code, None when profiling is disabled
+    NO_TIMER = NoTimer()
+    PERCENTILES = (50, 90, 99)
+
+    def __init__(self):
+        self.samples = dict()  # Durations in seconds of each phase
+        self.current = None  # Durations of the phases in the current tick, None outside ticks
+        self.tick_names = set()  # Names of the phases timed inside ticks
+
+    @staticmethod
+    def enable():
+        """
+        Start profiling the simulation with a new active profiler
+        :return: the new profiler
+        """
+        Profiler.ACTIVE = Profiler()
+        return Profiler.ACTIVE
+
+    @staticmethod
+    def disable():
+        """
+        Stop profiling the simulation
+        """
+        Profiler.ACTIVE = None
+
+    @staticmethod
+    def phase(name):
+        """
+        :param name: the name of a simulation phase
+        :return: a context manager timing the phase with the active profiler, if any
+        """
+        if Profiler.ACTIVE is None:
+            return Profiler.NO_TIMER
+        return PhaseTimer(Profiler.ACTIVE, name)
+
+    @staticmethod
+    def tick():
+        """
+        :return: a context manager timing a whole simulation loop with the active profiler, if any
+        """
+        if Profiler.ACTIVE is None:
+            return Profiler.NO_TIMER
+        return TickTimer(Profiler.ACTIVE)
+
+    def add(self, name, duration):
+        """
+        Add a duration to a phase
+        :param name: the name of the phase
+        :param duration: a duration in seconds
+        """
+        if self.current is not None:
+            self.current[name] = self.current.get(name, 0) + duration
+        else:
+            self.samples.setdefault(name, []).append(duration)
+
+    def end_tick(self, duration):
+        """
+        Store the samples of the phases timed during a tick
+        :param duration: the duration of the whole tick in seconds
+        """
+        current, self.current = self.current, None
+        current["untimed"] = max(0, duration - sum(current.values()))
+        current["tick"] = duration
+        for name, phase_duration in current.items():
+            self.add(name, phase_duration)
+        self.tick_names.update(current)
+
+    def stats(self):
+        """
+        :return: a dict giving for each phase its number of samples, total, mean, max and percentiles in seconds,
+            and for phases of ticks their share of the total ticks duration
+        """
+        ticks_total = sum(self.samples.get("tick", []))
+        stats = dict()
+        for name, samples in self.samples.items():
+            samples = np.array(samples)
+            stats[name] = {'Count': len(samples), 'Total': float(np.sum(samples)), 'Mean': float(np.mean(samples)),
+                           'Max': float(np.max(samples))}
+            for percentile, value in zip(Profiler.PERCENTILES, np.percentile(samples, Profiler.PERCENTILES)):
+                stats[name]['P' + str(percentile)] = float(value)
+        for name in self.tick_names:
+            stats[name]['Share'] = stats[name]['Total'] / ticks_total if ticks_total > 0 else 0
+        return stats
+
+    def save(self, filename):
+        """
+        Write phase statistics to a file, as csv if its extension is .csv and as json otherwise
+        :param filename: the name of the file to write
+        """
+        stats = self.stats()
+        if filename.endswith(".csv"):
+            columns = ['Count', 'Total', 'Mean'] + ['P' + str(p) for p in Profiler.PERCENTILES] + ['Max', 'Share']
+            with open(filename, 'w', newline='') as file:
+                writer = csv.writer(file)
+                writer.writerow(['Phase'] + columns)
+                for name, values in stats.items():
+                    writer.writerow([name] + [values.get(column, '') for column in columns])
+        else:
+            with open(filename, 'w') as file:
+                json.dump(stats, file, indent=4, sort_keys=True)
@@ -0,0 +1,307 @@
+# Copyright (C) 2019 - UMons
+# 
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+# 
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+# 
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+import datetime
+import glob
+import json
+import os
+import random
+import tempfile
+import time
+import numpy as np
+from os.path import exists, join, splitext
+
+from simulation.board import Board
+from simulation.player import Player
+from simulation.logic.blob_manager import BlobManager
+from simulation.logic.colony_manager import ColonyManager
+from simulation.profiler import Profiler
+
+
+class Simulation:
+    """
+    A blob simulation (board, blob manager and player) run without any interface.
+    It imports neither pygame nor cv2, so it can be embedded in scripts and batch runs; play.py is its graphical
+    wrapper.
+    """
+
+    OBJECTS_ENGINE = "objects"
+    ARRAYS_ENGINE = "arrays"
+    ENGINES = {OBJECTS_ENGINE: BlobManager, ARRAYS_ENGINE: ColonyManager}
+
+    DEFAULT_DIR = "simulation/default"
+
+    def __init__(self, board, blob, player):
+        """
+        :param board: A board instance
+        :param blob: A blob manager instance (BlobManager or ColonyManager)
+        :param player: A player instance
+        """
+        self.board = board
+        self.blob = blob
+        self.player = player
+
+        self.loops = 0  # Number of blob moves done
+        self.infos = dict()  # Origin and initial foods of the simulation, reported in results
+        self.checkpoints = None  # Directory, period in loops and number of files kept of periodic checkpoints
+
+    @staticmethod
+    def load(board_file=None, width=100, height=40, engine=OBJECTS_ENGINE, check_board=False, dtype=None,
+             default_dir=DEFAULT_DIR, blob_file=None):
+        """
+        Create a simulation from a saved board or from an empty one.
+        Blob and player configurations are the ones saved next to the board, or the default ones.
+        :param board_file: a board filename (.board extension), or None to start from an empty board
+        :param width: width of the empty board (unused if board_file is given)
+        :param height: height of the empty board (unused if board_file is given)
+        :param engine: name of the ants colony engine (see Simulation.ENGINES)
+        :param check_board: set to True to check board running totals against a full recount each time they are used
+        :param dtype: dtype used to store blob and food quantities, None to keep the one of the loaded board
+            (or float64 for an empty board)
+        :param default_dir: directory of the default blob and player configurations
+        :param blob_file: a blob configuration file to use instead of the saved or default one
+        :return: a new Simulation instance
+        """
+        player_file = join(default_dir, "player.json")
+        forced_blob_file = blob_file
+        blob_file = join(default_dir, "blob.json")
+        infos = dict()
+
+        if board_file is not None:
+            assert exists(board_file)
+            root_name = splitext(board_file)[0]
+            infos['From'] = root_name
+
+            board = Board(width, height, check_board)
+            board.load(board_file)
+            if dtype is not None:
+                board.set_dtype(dtype)
+
+            if exists(root_name + ".player.json"):
+                player_file = root_name + ".player.json"
+
+            if exists(root_name + ".blob.json"):
+                blob_file = root_name + ".blob.json"
+        else:
+            board = Board(width, height, check_board, dtype or 'float64')
+
+        blob = Simulation.ENGINES[engine](board, forced_blob_file or blob_file)
+        simulation = Simulation(board, blob, Player(board, blob, player_file))
+        simulation.infos.update(infos)
+        return simulation
+
+    def init_foods(self, qt):
+        """
+        Put foods at random in one of the half-board, the one which is not cleaned by the player
+        :param qt: number of foods to put
+        :return: the list of random food positions used
+        """
+        foods = self.player.set_random_food(qt, not self.player.clean_top)
+        self.infos['Init_foods'] = foods
+        return foods
+
+    def step(self, n=1):
+        """
+        Move the blob n times
+        :param n: number of loops to compute
+        :return: the total number of loops done
+        """
+        for _ in range(n):
+            with Profiler.tick():
+                self.blob.move()
+            self.loops += 1
+
+            if self.checkpoints is not None and self.loops % self.checkpoints[1] == 0:
+                self.rotate_checkpoint()
+        return self.loops
+
+    def run_until(self, condition, max_loops=-1):
+        """
+        Move the blob until a condition is met
+        :param condition: a function taking the simulation and returning True when it must stop
+        :param max_loops: maximum number of loops to compute, negative for no limit
+        :return: True if the condition has been met, False if the maximum number of loops has been reached first
+        """
+        while not condition(self):
+            if max_loops == 0:
+                return False
+            self.step()
+            max_loops -= 1
+        return True
+
+    def covering(self):
+        """
+        :return: a dict with the blob covering percentage of the whole board, of its top half and of its bottom half
+        """
+        up_size_percent, down_size_percent = self.player.check_blob_cover()
+        return {'Total': (up_size_percent + down_size_percent) / 2, 'Top': up_size_percent, 'Bottom': down_size_percent}
+
+    def snapshot(self):
+        """
+        :return: a dict with copies of the current board arrays, ant positions and known foods
+        """
+        return {
+            'Loops': self.loops,
+            'Blob': self.board.dropped_blob.copy(),
+            'Foods': self.board.foods.copy(),
+            'Touched': self.board.touched.copy(),
+            'Ants': [(int(ant.x), int(ant.y)) for ant in self.blob.scouters],
+            'Known_foods': [(int(food[0]), int(food[1])) for food in self.blob.knowledge['food']]
+        }
+
+    def results(self):
+        """
+        :return: a dict with the origin, initial foods, number of loops and blob covering of the simulation
+        """
+        results = dict(self.infos)
+        results['Loops'] = self.loops
+        results['Covering'] = self.covering()
+        return results
+
+    def save(self, save_dir, name=None, binary_board=False):
+        """
+        Store save files of the current state in given save directory
+        :param save_dir: the save directory to use
+        :param name: name used to save files, if none, use timestamp
+        :param binary_board: set to True to save the board file with the binary format instead of the text one
+        :return: the name used
+        """
+        if name is None:
+            name = datetime.datetime.fromtimestamp(time.time()).strftime('%Y-%m-%d_%H.%M.%S')
+
+        print("Data saved at " + name)
+        with Profiler.phase("save"):
+            if binary_board:
+                self.board.save_binary(join(save_dir, name + ".board"))
+            else:
+                with open(join(save_dir, name + ".board"), 'w') as file:
+                    file.write(self.board.save())
+
+            with open(join(save_dir, name + ".blob.json"), 'w') as file:
+                file.write(self.blob.save())
+
+            with open(join(save_dir, name + ".player.json"), 'w') as file:
+                file.write(self.player.save())
+
+        return name
+
+    def save_checkpoint(self, filename):
+        """
+        Store the complete state of the simulation in a compressed numpy archive: board arrays, ants state (positions,
+        stored food, states, goals and paths), knowledge, player, loops and random generators state.
+        The file is written aside and then moved, so an interrupted save never replaces a valid checkpoint.
+        :param filename: the name of the file to write (.npz extension)
+        """
+        with Profiler.phase("checkpoint"):
+            state = {'checkpoint_' + key: value for key, value in self.blob.colony_state().items()}
+            py_version, py_state, py_gauss = random.getstate()
+            np_name, np_keys, np_pos, np_has_gauss, np_gauss = np.random.get_state()
+
+            tmp_filename = filename + ".tmp"
+            with open(tmp_filename, 'wb') as file:
+                np.savez_compressed(file,
+                                    engine=np.array(self.engine()), loops=np.array(self.loops),
+                                    infos=np.array(json.dumps(self.infos)),
+                                    knowledge=np.array(self.blob.save()), player=np.array(self.player.save()),
+                                    dtype=np.array(self.board.dtype), foods=np.asarray(self.board.foods),
+                                    dropped_blob=np.asarray(self.board.dropped_blob),
+                                    touched=np.asarray(self.board.touched),
+                                    random_version=np.array(py_version),
+                                    random_state=np.array(py_state, dtype=np.uint64),
+                                    random_gauss=np.array([] if py_gauss is None else [py_gauss], dtype=float),
+                                    np_random_keys=np_keys, np_random_pos=np.array([np_pos, np_has_gauss]),
+                                    np_random_gauss=np.array(np_gauss), **state)
+            os.replace(tmp_filename, filename)
+
+    @staticmethod
+    def load_checkpoint(filename, check_board=False):
+        """
+        Restore a simulation saved with save_checkpoint, computing the next loops as the saved simulation would have.
+        The random generators of random and numpy modules are restored too.
+        :param filename: the name of a checkpoint file
+        :param check_board: set to True to check board running totals against a full recount each time they are used
+        :return: a new Simulation instance
+        """
+        with np.load(filename) as data:
+            foods = data['foods']
+            board = Board(foods.shape[0], foods.shape[1], check_board, str(data['dtype']))
+            board.foods = foods.astype(board.dtype)
+            board.dropped_blob = data['dropped_blob'].astype(board.dtype)
+            board.touched = data['touched'].astype(bool)
+            board.recount()
+
+            with tempfile.TemporaryDirectory() as directory:
+                files = dict()
+                for key in ('knowledge', 'player'):
+                    files[key] = join(directory, key + ".json")
+                    with open(files[key], 'w') as file:
+                        file.write(str(data[key]))
+
+                blob = Simulation.ENGINES[str(data['engine'])](board, files['knowledge'])
+                simulation = Simulation(board, blob, Player(board, blob, files['player']))
+
+            blob.restore_colony({key[len('checkpoint_'):]: data[key] for key in data.files
+                                 if key.startswith('checkpoint_')})
+            simulation.loops = int(data['loops'])
+            simulation.infos = json.loads(str(data['infos']))
+
+            gauss = data['random_gauss'].tolist()
+            random.setstate((int(data['random_version']), tuple(data['random_state'].tolist()),
+                             gauss[0] if len(gauss) != 0 else None))
+            np_pos, np_has_gauss = data['np_random_pos'].tolist()
+            np.random.set_state(('MT19937', data['np_random_keys'], np_pos, np_has_gauss,
+                                 float(data['np_random_gauss'])))
+        return simulation
+
+    def engine(self):
+        """
+        :return: the name of the ants colony engine used (see Simulation.ENGINES)
+        """
+        for name, manager in Simulation.ENGINES.items():
+            if type(self.blob) is manager:
+                return name
+        raise ValueError("Unknown blob manager " + type(self.blob).__name__)
+
+    def checkpoint_every(self, directory, period, keep=3):
+        """
+        Save a checkpoint every period loops done by step, only the last ones being kept
+        :param directory: the directory where checkpoints are stored
+        :param period: number of loops between two checkpoints, 0 to stop checkpointing
+        :param keep: number of checkpoints kept, the oldest ones are removed
+        """
+        if period > 0:
+            os.makedirs(directory, exist_ok=True)
+            self.checkpoints = (directory, period, keep)
+        else:
+            self.checkpoints = None
+
+    def rotate_checkpoint(self):
+        """
+        Save a periodic checkpoint and remove the oldest ones
+        """
+        directory, period, keep = self.checkpoints
+        self.save_checkpoint(join(directory, "checkpoint_{:09d}.npz".format(self.loops)))
+        filenames = Simulation.list_checkpoints(directory)
+        for filename in filenames[:max(0, len(filenames) - keep)]:
+            os.remove(filename)
+
+    @staticmethod
+    def list_checkpoints(directory):
+        """
+        :param directory: a directory of periodic checkpoints
+        :return: the checkpoint files of the directory, oldest first
+        """
+        return sorted(glob.glob(join(directory, "checkpoint_*.npz")))
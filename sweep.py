@@ -0,0 +1,217 @@
+# Copyright (C) 2019 - UMons
+# 
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+# 
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+# 
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+import argparse
+import contextlib
+import csv
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import tempfile
+import numpy as np
+from os.path import basename, exists, join, splitext
+
+from simulation.board import Board
+from simulation.simulation import Simulation
+
+
+def parse_param(text):
+    """
+    :param text: a "Key/Sub Key=value1,value2" string, values being json values (lists and objects included)
+    :return: the (key path, values) tuple of the parameter
+    """
+    key, values = text.split('=', 1)
+
+    # Values are decoded one after the other, so commas inside lists, objects and strings are kept
+    decoder = json.JSONDecoder()
+    parsed = []
+    i = 0
+    while True:
+        while values[i:i + 1].isspace():
+            i += 1
+        try:
+            value, i = decoder.raw_decode(values, i)
+        except ValueError:
+            raise argparse.ArgumentTypeError("invalid json value at position {} of {}".format(i, repr(values)))
+        parsed.append(value)
+
+        while values[i:i + 1].isspace():
+            i += 1
+        if i == len(values):
+            return tuple(key.split('/')), parsed
+        if values[i] != ',':
+            raise argparse.ArgumentTypeError("expected a comma at position {} of {}".format(i, repr(values)))
+        i += 1
+
+
+def apply_overrides(knowledge, overrides):
+    """
+    :param knowledge: a knowledge dict, as loaded from a blob.json file
+    :param overrides: a list of (key path, value) tuples
+    :return: a copy of knowledge with the given values
+    """
+    knowledge = json.loads(json.dumps(knowledge))
+    for path, value in overrides:
+        d = knowledge
+        for key in path[:-1]:
+            d = d.setdefault(key, dict())
+        d[path[-1]] = value
+    return knowledge
+
+
+def run_name(settings, overrides, seed):
+    """
+    :param settings: a dict of the sweep settings shared by all runs (board, base knowledge, loops, ...)
+    :param overrides: a list of (key path, value) tuples
+    :param seed: the seed of the run
+    :return: a name identifying the run, stable between sweeps with the same settings
+    """
+    key = json.dumps([settings, [['/'.join(path), value] for path, value in overrides]], sort_keys=True)
+    return "run_" + hashlib.sha1(key.encode()).hexdigest()[:12] + "_seed" + str(seed)
+
+
+def run(task):
+    """
+    Compute one simulation of the sweep and store its results
+    :param task: a (board file, knowledge, overrides, seed, results file, arguments) tuple
+    :return: the results dict of the run
+    """
+    board_file, knowledge, overrides, seed, results_file, args = task
+    random.seed(seed)
+    np.random.seed(seed)
+
+    with tempfile.NamedTemporaryFile('w', suffix=".blob.json", delete=False) as file:
+        json.dump(apply_overrides(knowledge, overrides), file)
+    # Ants count printed on each loop by the blob manager are not shown
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        try:
+            simulation = Simulation.load(board_file, engine=args.engine, blob_file=file.name)
+        finally:
+            os.remove(file.name)
+
+        if args.init_foods > 0:
+            simulation.init_foods(args.init_foods)
+        simulation.step(args.loops)
+
+    results = simulation.results()
+    results['Seed'] = seed
+    results['Overrides'] = {'/'.join(path): value for path, value in overrides}
+
+    # Written aside and then moved, so an interrupted run is never taken as done
+    with open(results_file + ".tmp", 'w') as file:
+        json.dump(results, file, indent=4, sort_keys=True)
+    os.replace(results_file + ".tmp", results_file)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run simulations over a grid or a random sample of knowledge values "
+                                                 "and several seeds, and gather their covering in one table.")
+    parser.add_argument('input', metavar="INPUT", type=str, help="initial board file (.board extension)")
+    parser.add_argument('-p', '--param', type=parse_param, action='append', default=[],
+                        help='knowledge values to sweep, as "Key/Sub Key=value1,value2" with json values '
+                             '(e.g. "Scouting/Global Explore Probability=0.01,0.02"), can be repeated')
+    parser.add_argument('--random', type=int, default=0,
+                        help='number of combinations drawn at random from the grid (default: 0, the whole grid)')
+    parser.add_argument('--seeds', type=int, default=1, help='number of seeds run for each combination (default: 1)')
+    parser.add_argument('--loops', type=int, default=100, help='number of loops of each run (default: 100)')
+    parser.add_argument('--init_foods', type=int, default=10,
+                        help='quantity of foods initialized in one of the half-board (default: 10)')
+    parser.add_argument('--engine', type=str, choices=list(Simulation.ENGINES), default=Simulation.OBJECTS_ENGINE,
+                        help="ants colony engine (default: {})".format(Simulation.OBJECTS_ENGINE))
+    parser.add_argument('--blob', type=str, default=None,
+                        help='knowledge file the values are applied to (default: the one saved with the input board '
+                             'or the default one)')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(),
+                        help='number of worker processes (default: number of cores)')
+    parser.add_argument('--save', type=str, default="sweep/",
+                        help="directory where results are stored (default: sweep/)")
+    parser.add_argument('-o', '--output', type=str, default=None,
+                        help="csv file of the gathered results (default: sweep.csv in the save directory)")
+    args = parser.parse_args()
+
+    assert exists(args.input)
+    os.makedirs(args.save, exist_ok=True)
+    root_name = splitext(args.input)[0]
+
+    blob_file = args.blob
+    if blob_file is None:
+        blob_file = root_name + ".blob.json"
+        if not exists(blob_file):
+            blob_file = join(Simulation.DEFAULT_DIR, "blob.json")
+    with open(blob_file, 'r') as file:
+        knowledge = json.load(file)
+
+    # Workers map a binary board, so the initial board is read from disk once and its pages are shared
+    board_file = args.input
+    if not Board.is_binary(board_file):
+        board = Board(0, 0)
+        board.load(board_file)
+        board_file = join(args.save, splitext(basename(args.input))[0] + ".shared.board")
+        board.save_binary(board_file)
+        if exists(root_name + ".player.json"):
+            with open(root_name + ".player.json", 'r') as file:
+                player = file.read()
+            with open(splitext(board_file)[0] + ".player.json", 'w') as file:
+                file.write(player)
+
+    # Runs are only taken as done if they were computed with the same board, knowledge and options
+    with open(args.input, 'rb') as file:
+        board_digest = hashlib.sha1(file.read()).hexdigest()
+    settings = {'Board': board_digest, 'Knowledge': knowledge, 'Loops': args.loops, 'Init Foods': args.init_foods,
+                'Engine': args.engine}
+
+    keys = [path for path, _ in args.param]
+    grid = list(itertools.product(*[values for _, values in args.param]))
+    if 0 < args.random < len(grid):
+        grid = random.Random(0).sample(grid, args.random)
+
+    tasks = []
+    names = []
+    for values in grid:
+        overrides = list(zip(keys, values))
+        for seed in range(args.seeds):
+            name = run_name(settings, overrides, seed)
+            names.append(name)
+            results_file = join(args.save, name + ".results.json")
+            if not exists(results_file):
+                tasks.append((board_file, knowledge, overrides, seed, results_file, args))
+
+    print("{} runs, {} already done".format(len(names), len(names) - len(tasks)))
+    if len(tasks) > 0:
+        with multiprocessing.Pool(min(args.jobs, len(tasks))) as pool:
+            for i, results in enumerate(pool.imap_unordered(run, tasks)):
+                print("{}/{} runs - covering {:.2f}% with {}".format(i + 1, len(tasks), results['Covering']['Total'],
+                                                                    results['Overrides']))
+
+    output = args.output or join(args.save, "sweep.csv")
+    columns = ['/'.join(path) for path in keys]
+    with open(output, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(["Name", "Seed"] + columns + ["Loops", "Total", "Top", "Bottom"])
+        for name in names:
+            with open(join(args.save, name + ".results.json"), 'r') as results_file:
+                results = json.load(results_file)
+            writer.writerow([name, results['Seed']] + [json.dumps(results['Overrides'][column]) for column in columns]
+                            + [results['Loops']] + [results['Covering'][key] for key in ("Total", "Top", "Bottom")])
+    print("Results gathered in " + output)
+
+
+if __name__ == "__main__":
+    main()
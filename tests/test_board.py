@@ -0,0 +1,129 @@
+# Copyright (C) 2019 - UMons
+# 
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+# 
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+# 
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+import os
+import random
+import struct
+import tempfile
+import unittest
+import numpy as np
+
+from simulation.board import Board
+
+
+class TestBoard(unittest.TestCase):
+
+    def test_eat_food_many_as_sequential(self):
+        xs, ys = [1, 2, 1, 1, 3, 2], [1, 2, 1, 1, 3, 2]
+        wanted = [2, 1, 2, 3, 1, 5]
+        sequential, batched = Board(5, 5), Board(5, 5)
+        for board in (sequential, batched):
+            board.set_food(1, 1, 5)
+            board.set_food(2, 2, 3)
+
+        expected = [sequential.eat_food(x, y, value) for x, y, value in zip(xs, ys, wanted)]
+        received, finished = batched.eat_food_many(xs, ys, wanted)
+
+        self.assertEqual(received.tolist(), [float(value) for value, _ in expected])
+        self.assertEqual(finished.tolist(), [bool(done) for _, done in expected])
+        self.assertEqual(finished.tolist(), [False, False, False, True, True, True])
+        np.testing.assert_array_equal(batched.foods, sequential.foods)
+
+
+class TestBinaryBoard(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.directory.name, "board.bin")
+        rng = random.Random(0)
+        self.board = Board(13, 7)
+        for _ in range(40):
+            self.board.update_blob(rng.randrange(13), rng.randrange(7), rng.uniform(1, Board.MAX_BLOB))
+        for _ in range(5):
+            self.board.set_food(rng.randrange(13), rng.randrange(7), rng.uniform(1, Board.INIT_FOOD))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def assertSameBoard(self, board, expected):
+        self.assertEqual((board.width, board.height, board.dtype), (expected.width, expected.height, expected.dtype))
+        np.testing.assert_array_equal(board.foods, expected.foods)
+        np.testing.assert_array_equal(board.dropped_blob, expected.dropped_blob)
+        np.testing.assert_array_equal(board.touched, expected.touched)
+        self.assertEqual((board.touched_count, board.touched_top_count),
+                         (expected.touched_count, expected.touched_top_count))
+        self.assertAlmostEqual(board.blob_sum, expected.blob_sum)
+
+    def test_round_trip(self):
+        for dtype in Board.STORAGE_DTYPES:
+            self.board.set_dtype(dtype)
+            for pack_touched in (False, True):
+                self.board.save_binary(self.filename, pack_touched)
+                self.assertTrue(Board.is_binary(self.filename))
+                for lazy in (False, True):
+                    board = Board(1, 1)
+                    board.load(self.filename, lazy)
+                    self.assertSameBoard(board, self.board)
+
+    def test_text_file(self):
+        with open(self.filename, 'w') as file:
+            file.write(self.board.save())
+        self.assertFalse(Board.is_binary(self.filename))
+
+    def write_header(self, magic=Board.BINARY_MAGIC, version=Board.BINARY_VERSION, foods_code=0, blob_code=0):
+        self.board.save_binary(self.filename)
+        with open(self.filename, 'r+b') as file:
+            file.write(struct.pack(Board.BINARY_HEADER, magic, version, self.board.width, self.board.height,
+                                   foods_code, blob_code, False))
+
+    def test_header_check(self):
+        for header in (dict(magic=b'NOTABRD\x00'), dict(version=0), dict(version=Board.BINARY_VERSION + 1),
+                       dict(foods_code=0, blob_code=1), dict(foods_code=len(Board.STORAGE_DTYPES),
+                                                             blob_code=len(Board.STORAGE_DTYPES))):
+            self.write_header(**header)
+            with self.assertRaises(ValueError):
+                Board(1, 1).load_binary(self.filename)
+
+    def test_copy_on_write(self):
+        self.board.save_binary(self.filename)
+        with open(self.filename, 'rb') as file:
+            content = file.read()
+
+        board = Board(1, 1)
+        board.load(self.filename)
+        self.assertIsInstance(board.dropped_blob.base, np.memmap)
+        board.update_blob(0, 0, 10)
+        board.set_food(12, 6)
+        board.manage_blob(1)
+
+        # Changes are only made in memory, the file and other boards mapped on it are unchanged
+        with open(self.filename, 'rb') as file:
+            self.assertEqual(file.read(), content)
+        other = Board(1, 1)
+        other.load(self.filename)
+        self.assertSameBoard(other, self.board)
+
+        # A board mapped on a file stays valid when the file is saved again
+        expected = board.dropped_blob.copy()
+        self.board.update_blob(1, 1, 20)
+        self.board.save_binary(self.filename)
+        np.testing.assert_array_equal(board.dropped_blob, expected)
+        other.load(self.filename)
+        self.assertSameBoard(other, self.board)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+# Copyright (C) 2019 - UMons
+# 
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+# 
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+# 
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+import math
+import random
+import unittest
+import numpy as np
+
+from simulation.board import Board
+from simulation.logic.astar import AStar
+from simulation.logic.cost_field import CostField
+from simulation.logic.dstar_lite import DStarLite
+from simulation.logic.gatherer import Gatherer
+
+
+class TestDStarLite(unittest.TestCase):
+
+    def setUp(self):
+        self.tolerance = DStarLite.WEIGHT_TOLERANCE
+        DStarLite.WEIGHT_TOLERANCE = 0  # Every weight change is repaired, paths must be as short as AStar ones
+        self.random = random.Random(0)
+        self.board = Board(24, 18)
+        for x in range(self.board.width):
+            for y in range(self.board.height):
+                if self.random.random() < 0.8:
+                    self.board.update_blob(x, y, self.random.randint(1, int(Board.MAX_BLOB)))
+
+    def tearDown(self):
+        DStarLite.WEIGHT_TOLERANCE = self.tolerance
+
+    def cost(self, path):
+        weights = CostField.window(self.board, Gatherer.costs, 0, 0, self.board.width, self.board.height).astype(int)
+        total = 0
+        for (x0, y0), (x1, y1) in zip(path, path[1:]):
+            self.assertGreaterEqual(weights[y1, x1], 1)
+            total += (AStar.SQRT2 if x0 != x1 and y0 != y1 else 1) * weights[y1, x1]
+        return total
+
+    def edit(self):
+        for _ in range(15):
+            x, y = self.random.randrange(self.board.width), self.random.randrange(self.board.height)
+            if self.random.random() < 0.3:
+                # Make the square a wall again
+                self.board.dropped_blob[x, y] = 0
+                self.board.touched[x, y] = False
+                self.board.changed(x, y, touched=True)
+            else:
+                self.board.update_blob(x, y, self.random.randint(-int(Board.MAX_BLOB) // 2, int(Board.MAX_BLOB) // 2))
+        if self.random.random() < 0.3:
+            self.board.manage_blob(1)
+
+    def check_paths(self, use_diagonal):
+        goal = (self.board.width - 2, self.board.height - 3)
+        planner = DStarLite(self.board, Gatherer.costs, use_diagonal, 0, 0, self.board.width, self.board.height, goal)
+        x, y = 1, 2
+        for _ in range(25):
+            path = planner.find_path(x, y)
+            matrix = CostField.window(self.board, Gatherer.costs, 0, 0, self.board.width, self.board.height)
+            expected = AStar(use_diagonal).find_path(matrix, (x, y), goal)
+            self.assertEqual(len(path) > 0, len(expected) > 0)
+            if len(path) > 0:
+                self.assertEqual(path[-1], goal)
+                self.assertAlmostEqual(self.cost([(x, y)] + path), self.cost(expected), places=6)
+                if len(path) > 1:
+                    x, y = path[0]
+            self.edit()
+
+    def test_straight_moves(self):
+        self.check_paths(False)
+
+    def test_diagonal_moves(self):
+        self.check_paths(True)
+
+
+if __name__ == '__main__':
+    unittest.main()
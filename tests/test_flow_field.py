@@ -0,0 +1,108 @@
+# Copyright (C) 2019 - UMons
+# 
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+# 
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+# 
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+import heapq
+import math
+import random
+import unittest
+import numpy as np
+
+from simulation.board import Board
+from simulation.logic.astar import AStar
+from simulation.logic.cost_field import CostField
+from simulation.logic.flow_field import FlowField
+from simulation.logic.food_registry import FoodRegistry
+from simulation.logic.gatherer import Gatherer
+
+
+class TestFlowField(unittest.TestCase):
+
+    def setUp(self):
+        self.random = random.Random(0)
+        self.board = Board(26, 19)
+        for x in range(self.board.width):
+            for y in range(self.board.height):
+                if self.random.random() < 0.75:
+                    self.board.update_blob(x, y, self.random.randint(1, int(Board.MAX_BLOB)))
+        self.walkable = [(x, y) for x in range(self.board.width) for y in range(self.board.height)
+                         if self.board.touched[x, y]]
+
+    @staticmethod
+    def dijkstra(weights, foods, use_diagonal):
+        """
+        :return: the distance from every square (by flat index) to the nearest food, searched from all foods at once
+        """
+        height, width = weights.shape
+        moves = AStar.STRAIGHT_MOVES + AStar.DIAGONAL_MOVES if use_diagonal else AStar.STRAIGHT_MOVES
+        distances = [math.inf] * weights.size
+        frontier = []
+        for x, y in foods:
+            if weights[y, x] >= 1:
+                distances[y * width + x] = 0
+                frontier.append((0, y * width + x))
+
+        heapq.heapify(frontier)
+        while len(frontier) > 0:
+            distance, index = heapq.heappop(frontier)
+            if distance > distances[index]:
+                continue
+            y, x = divmod(index, width)
+            for dx, dy, step in moves:
+                nx, ny = x + dx, y + dy
+                if 0 <= nx < width and 0 <= ny < height and weights[ny, nx] >= 1:
+                    # Moving from the neighbor to this square costs this square weight
+                    score = distance + step * int(weights[y, x])
+                    if score < distances[ny * width + nx]:
+                        distances[ny * width + nx] = score
+                        heapq.heappush(frontier, (score, ny * width + nx))
+        return distances
+
+    def check_distances(self, foods, use_diagonal):
+        field = FlowField.of(self.board, foods, Gatherer.costs, use_diagonal)
+        weights = CostField.window(self.board, Gatherer.costs, 0, 0, self.board.width, self.board.height)
+        np.testing.assert_array_equal(field.weights, weights.astype(int))
+        np.testing.assert_allclose(field.distances, self.dijkstra(weights, list(foods), use_diagonal))
+
+    def check_food_changes(self, use_diagonal):
+        foods = FoodRegistry(self.random.sample(self.walkable, 3))
+        self.check_distances(foods, use_diagonal)
+        for _ in range(12):
+            if len(foods) > 1 and self.random.random() < 0.5:
+                foods.remove(foods[self.random.randrange(len(foods))])
+            else:
+                foods.append(self.random.choice(self.walkable))
+            self.check_distances(foods, use_diagonal)
+
+        # A square becoming a wall computes the whole field again, before the next food changes
+        x, y = self.random.choice([square for square in self.walkable if square not in foods])
+        self.board.dropped_blob[x, y] = 0
+        self.board.touched[x, y] = False
+        self.board.changed(x, y, touched=True)
+        self.walkable.remove((x, y))
+        foods.append(self.random.choice(self.walkable))
+        self.check_distances(foods, use_diagonal)
+        foods.remove(foods[0])
+        self.check_distances(foods, use_diagonal)
+
+    def test_straight_moves(self):
+        self.check_food_changes(False)
+
+    def test_diagonal_moves(self):
+        self.check_food_changes(True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+# Copyright (C) 2019 - UMons
+# 
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+# 
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+# 
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+import random
+import unittest
+
+from simulation.board import Board
+from simulation.logic.astar import AStar
+from simulation.logic.cost_field import CostField
+from simulation.logic.gatherer import Gatherer
+from simulation.logic.hpa_star import HPAStar
+
+
+class TestHPAStar(unittest.TestCase):
+
+    def walls_board(self, width, height, walkable, seed):
+        """
+        :return: a board whose squares are walkable with the given probability, other squares being walls
+        """
+        rng = random.Random(seed)
+        board = Board(width, height)
+        for x in range(width):
+            for y in range(height):
+                if rng.random() < walkable:
+                    board.update_blob(x, y, rng.randint(1, int(Board.MAX_BLOB)))
+        return board
+
+    def check_path(self, board, path, start, end, use_diagonal):
+        matrix = CostField.window(board, Gatherer.costs, 0, 0, board.width, board.height)
+        self.assertEqual(path[0], start)
+        self.assertEqual(path[-1], end)
+        for (x0, y0), (x1, y1) in zip(path, path[1:]):
+            self.assertLessEqual(max(abs(x1 - x0), abs(y1 - y0)), 1)
+            if not use_diagonal:
+                self.assertLessEqual(abs(x1 - x0) + abs(y1 - y0), 1)
+            self.assertGreaterEqual(int(matrix[y1, x1]), 1)
+
+    def check_reached(self, board, hpa, use_diagonal, rng):
+        walkable = [(x, y) for x in range(board.width) for y in range(board.height) if board.touched[x, y]]
+        for _ in range(40):
+            start, end = rng.choice(walkable), rng.choice(walkable)
+            matrix = CostField.window(board, Gatherer.costs, 0, 0, board.width, board.height)
+            expected = AStar(use_diagonal).find_path(matrix, start, end)
+            path = hpa.find_path(start, end)
+            self.assertEqual(len(path) > 0, len(expected) > 0, (start, end))
+            if len(path) > 0:
+                self.check_path(board, path, start, end, use_diagonal)
+
+    def test_same_squares_reached(self):
+        for seed, use_diagonal in ((0, False), (1, True), (2, True)):
+            rng = random.Random(seed)
+            board = self.walls_board(30, 22, 0.6, seed)
+            hpa = HPAStar(board, Gatherer.costs, use_diagonal, tile_size=4)
+            self.check_reached(board, hpa, use_diagonal, rng)
+
+            # Open and close walls, tiles of modified regions are refreshed
+            for _ in range(40):
+                x, y = rng.randrange(board.width), rng.randrange(board.height)
+                if board.touched[x, y]:
+                    board.dropped_blob[x, y] = 0
+                    board.touched[x, y] = False
+                    board.changed(x, y, touched=True)
+                else:
+                    board.update_blob(x, y, rng.randint(1, int(Board.MAX_BLOB)))
+            self.check_reached(board, hpa, use_diagonal, rng)
+
+    def test_diagonal_across_tile_corner(self):
+        # The only way out of the first tile is a diagonal move across its corner, unknown to the abstract graph
+        board = Board(16, 8)
+        squares = [(x, y) for x in range(4) for y in range(4)] + [(x, y) for x in range(4, 8) for y in range(4, 8)] \
+            + [(x, 5) for x in range(8, 16)]
+        for x, y in squares:
+            board.update_blob(x, y, Board.MAX_BLOB)
+
+        hpa = HPAStar(board, Gatherer.costs, True, tile_size=4)
+        path = hpa.find_path((0, 0), (15, 5))
+        self.check_path(board, path, (0, 0), (15, 5), True)
+        self.assertIn((4, 4), path)
+
+        self.assertEqual(HPAStar(board, Gatherer.costs, False, tile_size=4).find_path((0, 0), (15, 5)), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
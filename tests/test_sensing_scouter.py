@@ -0,0 +1,82 @@
+# Copyright (C) 2019 - UMons
+# 
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+# 
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+# 
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+import unittest
+
+from simulation.board import Board
+from simulation.logic.advanced_scouter import AdvancedScouter
+from simulation.logic.unreachable_goals import UnreachableGoals
+
+
+class TestSensingScouter(unittest.TestCase):
+
+    def setUp(self):
+        self.board = Board(10, 10)
+        for x in range(10):
+            for y in range(10):
+                if (x, y) != (7, 5):
+                    self.board.update_blob(x, y, 1)
+        self.knowledge = {"Scouters": {"Drop by eat": 0},
+                          "Scouting": {"Global Explore Probability": 0, "Search Locally on Food": False}}
+
+    def test_every_minimal_goal_unreachable(self):
+        scouter = AdvancedScouter(self.board, self.knowledge, 5, 5, sightline=3, light_compute=False)
+        UnreachableGoals.of(self.board, scouter.costs, scouter.use_diagonal).add(5, 5, (7, 5))
+
+        scouter.move()
+
+        # The next best squares of the sightline are tried instead
+        self.assertIsNotNone(scouter.goal)
+        self.assertNotEqual(scouter.goal, (7, 5))
+        self.assertNotEqual((scouter.x, scouter.y), (5, 5))
+
+    def test_unreachable_global_goal(self):
+        self.knowledge["Scouting"]["Global Explore Probability"] = 1
+        scouter = AdvancedScouter(self.board, self.knowledge, 5, 5, sightline=1)
+        unreachable = UnreachableGoals.of(self.board, scouter.costs, scouter.use_diagonal)
+        scouter.state = 1
+        goal = scouter.choose_global_goal()
+        unreachable.add(5, 5, goal)
+
+        for _ in range(10):
+            self.assertNotEqual(scouter.choose_global_goal(), goal)
+
+        for x in range(4, 7):
+            for y in range(4, 7):
+                unreachable.add(5, 5, (x, y))
+        self.assertIsNone(scouter.choose_global_goal())
+
+    def test_window_failure_not_remembered(self):
+        scouter = AdvancedScouter(self.board, self.knowledge, 5, 5, sightline=3, light_compute=False)
+        scouter.goal = (9, 5)  # Outside the search rectangle of the ant
+
+        scouter.move()
+
+        self.assertIsNone(scouter.goal)
+        unreachable = UnreachableGoals.of(self.board, scouter.costs, scouter.use_diagonal)
+        self.assertEqual(unreachable.from_square(5, 5), set())
+
+    def test_reachable_goal(self):
+        scouter = AdvancedScouter(self.board, self.knowledge, 5, 5, sightline=3, light_compute=False)
+
+        scouter.move()
+
+        self.assertEqual(scouter.goal, (7, 5))
+        self.assertEqual((scouter.x, scouter.y), (6, 5))
+
+
+if __name__ == '__main__':
+    unittest.main()